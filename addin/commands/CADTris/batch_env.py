@@ -0,0 +1,291 @@
+"""Vectorized version of the TetrisGame rules which runs many games of the same size at once.
+This module is not used by the addin itself and requires numpy (pip install -e .[sim]).
+"""
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from ... import config
+from .logic_model import Figure
+
+NOOP = 0
+MOVE_LEFT = 1
+MOVE_RIGHT = 2
+ROTATE_RIGHT = 3
+ROTATE_LEFT = 4
+DROP = 5
+
+
+def _create_rotation_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Converts the rotation table of the Figure class into arrays.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The x offsets and y offsets of the elements with
+            shape (n_shapes, 4, 4) indexed by [shape, rotation, element] and the number of rotations
+            per shape. Shapes with less than 4 rotations are padded with repetitions.
+    """
+    n_shapes = len(Figure.rotations)
+    offsets_x = np.zeros((n_shapes, 4, 4), dtype=np.int64)
+    offsets_y = np.zeros((n_shapes, 4, 4), dtype=np.int64)
+    n_rotations = np.zeros(n_shapes, dtype=np.int64)
+    for shape_id, rotations in enumerate(Figure.rotations):
+        n_rotations[shape_id] = len(rotations)
+        for rotation_index in range(4):
+            coords = rotations[rotation_index % len(rotations)].coords
+            offsets_x[shape_id, rotation_index] = [c[0] for c in coords]
+            offsets_y[shape_id, rotation_index] = [c[1] for c in coords]
+    return offsets_x, offsets_y, n_rotations
+
+
+_OFFSETS_X, _OFFSETS_Y, _N_ROTATIONS = _create_rotation_tables()
+
+
+class BatchTetris:
+    def __init__(self, seeds: Sequence[int], width: int, height: int):
+        """Runs one game per passed seed. All games are stored in numpy arrays and all actions are
+        applied to all games at once. The rules (collision, freezing, line clearing, scoring and
+        levels) are the same as in TetrisGame and a game with the same seed creates the same figures
+        as a TetrisGame with this seed. All games start in the running state.
+
+        Args:
+            seeds (Sequence[int]): The seeds of the games. The number of seeds determines the batch size.
+            width (int): The width of all games.
+            height (int): The height of all games.
+        """
+        self.width = width
+        self.height = height
+        self.n_games = len(seeds)
+
+        # 4 additional rows for figures which freeze above the height
+        self.cells = np.zeros((self.n_games, height + 4, width), dtype=np.uint8)
+        self.rng_states = np.array(
+            [s & ((1 << 64) - 1) for s in seeds], dtype=np.uint64
+        )
+
+        self.shape_ids = np.zeros(self.n_games, dtype=np.int64)
+        self.rotation_indices = np.zeros(self.n_games, dtype=np.int64)
+        self.xs = np.zeros(self.n_games, dtype=np.int64)
+        self.ys = np.zeros(self.n_games, dtype=np.int64)
+        self.color_codes = np.zeros(self.n_games, dtype=np.uint8)
+
+        self.scores = np.zeros(self.n_games, dtype=np.int64)
+        self.lines = np.zeros(self.n_games, dtype=np.int64)
+        self.levels = np.ones(self.n_games, dtype=np.int64)
+        self.pieces = np.zeros(self.n_games, dtype=np.int64)
+        self.gameover = np.zeros(self.n_games, dtype=bool)
+
+        self._indices = np.arange(self.n_games)
+        self._new_figures(np.ones(self.n_games, dtype=bool))
+
+    def _randbelow(self, mask: np.ndarray, n: int) -> np.ndarray:
+        """Vectorized version of RandomGenerator.randbelow which advances only the masked generators.
+
+        Args:
+            mask (np.ndarray): Boolean mask of the games whose generator is used.
+            n (int): The exclusive upper bound.
+
+        Returns:
+            np.ndarray: The random integers of the masked games.
+        """
+        with np.errstate(over="ignore"):
+            state = self.rng_states[mask] + np.uint64(0x9E3779B97F4A7C15)
+            self.rng_states[mask] = state
+            z = (state ^ (state >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            z = z ^ (z >> np.uint64(31))
+            # (z * n) >> 64 without 128 bit integers
+            n = np.uint64(n)
+            high = (z >> np.uint64(32)) * n
+            low = (z & np.uint64(0xFFFFFFFF)) * n
+            return ((high + (low >> np.uint64(32))) >> np.uint64(32)).astype(np.int64)
+
+    def _figure_coords(
+        self, mask: np.ndarray, dx: int = 0, dy: int = 0, rotation_indices=None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the coordinates of the figures of the masked games.
+
+        Args:
+            mask (np.ndarray): Boolean mask of the games.
+            dx (int, optional): Offset in x direction. Defaults to 0.
+            dy (int, optional): Offset in y direction. Defaults to 0.
+            rotation_indices (np.ndarray, optional): Rotation indices of the masked games to use
+                instead of the current ones. Defaults to None.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The x and y coordinates with shape (n_masked, 4).
+        """
+        shape_ids = self.shape_ids[mask]
+        if rotation_indices is None:
+            rotation_indices = self.rotation_indices[mask]
+        xs = _OFFSETS_X[shape_ids, rotation_indices] + (self.xs[mask] + dx)[:, None]
+        ys = _OFFSETS_Y[shape_ids, rotation_indices] + (self.ys[mask] + dy)[:, None]
+        return xs, ys
+
+    def _intersects(
+        self, mask: np.ndarray, xs: np.ndarray, ys: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized version of TetrisGame._intersects.
+
+        Args:
+            mask (np.ndarray): Boolean mask of the games.
+            xs (np.ndarray): The x coordinates of the elements of the masked games (n_masked, 4).
+            ys (np.ndarray): The y coordinates of the elements of the masked games (n_masked, 4).
+
+        Returns:
+            np.ndarray: Whether the masked games intersect.
+        """
+        outside = (xs < 0) | (xs >= self.width) | (ys < 0)
+        occupied = (
+            self.cells[
+                self._indices[mask][:, None],
+                np.clip(ys, 0, self.height + 3),
+                np.clip(xs, 0, self.width - 1),
+            ]
+            != 0
+        )
+        return (outside | occupied).any(axis=1)
+
+    def _new_figures(self, mask: np.ndarray):
+        """Spawns new figures in the masked games and sets the games to gameover if the new figure
+        intersects.
+
+        Args:
+            mask (np.ndarray): Boolean mask of the games which get a new figure.
+        """
+        self.shape_ids[mask] = self._randbelow(mask, len(Figure.rotations))
+        self.color_codes[mask] = 1 + self._randbelow(
+            mask, len(config.CADTRIS_TETRONIMO_COLORS)
+        )
+        self.rotation_indices[mask] = 0
+        self.xs[mask] = self.width // 2 - 1
+        self.ys[mask] = self.height
+        self.gameover[mask] = self._intersects(mask, *self._figure_coords(mask))
+
+    def _freeze(self, mask: np.ndarray) -> np.ndarray:
+        """Vectorized version of TetrisGame._freeze for the masked games.
+
+        Args:
+            mask (np.ndarray): Boolean mask of the games whose figure gets frozen.
+
+        Returns:
+            np.ndarray: The number of broken lines for every game (0 for unmasked games).
+        """
+        broken_lines = np.zeros(self.n_games, dtype=np.int64)
+        if not mask.any():
+            return broken_lines
+
+        xs, ys = self._figure_coords(mask)
+        self.cells[self._indices[mask][:, None], ys, xs] = self.color_codes[mask][
+            :, None
+        ]
+        self.pieces[mask] += 1
+
+        cells = self.cells[mask]
+        full = np.zeros(cells.shape[:2], dtype=bool)
+        full[:, : self.height] = (cells[:, : self.height] != 0).all(axis=2)
+        n_full = full.sum(axis=1)
+        if n_full.any():
+            # move the full rows to the top by a stable sort and empty them afterwards
+            order = np.argsort(full, axis=1, kind="stable")
+            cells = np.take_along_axis(cells, order[:, :, None], axis=1)
+            cells[
+                np.arange(cells.shape[1])[None, :] >= cells.shape[1] - n_full[:, None]
+            ] = 0
+            self.cells[mask] = cells
+        broken_lines[mask] = n_full
+
+        self.lines[mask] += n_full
+        self.scores[mask] += n_full**2
+        self.levels[mask] = np.minimum(
+            self.lines[mask] // config.CADTRIS_LINES_PER_LEVEL + 1,
+            config.CADTRIS_MAX_LEVEL,
+        )
+
+        self._new_figures(mask)
+        return broken_lines
+
+    def _move(self, mask: np.ndarray, dx: int):
+        """Moves the figures of the masked games horizontally if the field is free.
+
+        Args:
+            mask (np.ndarray): Boolean mask of the games.
+            dx (int): The number of steps to move.
+        """
+        valid = ~self._intersects(mask, *self._figure_coords(mask, dx=dx))
+        self.xs[self._indices[mask][valid]] += dx
+
+    def _rotate(self, mask: np.ndarray, n: int):
+        """Rotates the figures of the masked games n times if the field is free.
+
+        Args:
+            mask (np.ndarray): Boolean mask of the games.
+            n (int): The number of 90 degree rotations.
+        """
+        rotation_indices = (self.rotation_indices[mask] - n) % _N_ROTATIONS[
+            self.shape_ids[mask]
+        ]
+        valid = ~self._intersects(
+            mask, *self._figure_coords(mask, rotation_indices=rotation_indices)
+        )
+        self.rotation_indices[self._indices[mask][valid]] = rotation_indices[valid]
+
+    def _drop(self, mask: np.ndarray) -> np.ndarray:
+        """Moves the figures of the masked games down as far as possible and freezes them.
+
+        Args:
+            mask (np.ndarray): Boolean mask of the games.
+
+        Returns:
+            np.ndarray: The number of broken lines for every game.
+        """
+        falling = mask.copy()
+        while falling.any():
+            blocked = self._intersects(falling, *self._figure_coords(falling, dy=-1))
+            falling_indices = self._indices[falling]
+            self.ys[falling_indices[~blocked]] -= 1
+            falling[falling_indices[blocked]] = False
+        return self._freeze(mask)
+
+    def _gravity(self, mask: np.ndarray) -> np.ndarray:
+        """Moves the figures of the masked games one step down and freezes them if they can not move.
+
+        Args:
+            mask (np.ndarray): Boolean mask of the games.
+
+        Returns:
+            np.ndarray: The number of broken lines for every game.
+        """
+        blocked = self._intersects(mask, *self._figure_coords(mask, dy=-1))
+        indices = self._indices[mask]
+        self.ys[indices[~blocked]] -= 1
+        freeze_mask = np.zeros(self.n_games, dtype=bool)
+        freeze_mask[indices[blocked]] = True
+        return self._freeze(freeze_mask)
+
+    def step(self, actions: np.ndarray, gravity: bool = True) -> np.ndarray:
+        """Applies one action per game followed by a gravity step. Games which are over are ignored.
+
+        Args:
+            actions (np.ndarray): One action code per game (NOOP, MOVE_LEFT, MOVE_RIGHT,
+                ROTATE_RIGHT, ROTATE_LEFT, DROP).
+            gravity (bool, optional): Whether to execute a gravity step after the actions.
+                Defaults to True.
+
+        Returns:
+            np.ndarray: The score gained by every game in this step.
+        """
+        actions = np.asarray(actions)
+        scores_before = self.scores.copy()
+        running = ~self.gameover
+
+        self._move(running & (actions == MOVE_LEFT), -1)
+        self._move(running & (actions == MOVE_RIGHT), 1)
+        self._rotate(running & (actions == ROTATE_RIGHT), 1)
+        self._rotate(running & (actions == ROTATE_LEFT), -1)
+        self._drop(running & (actions == DROP))
+
+        if gravity:
+            self._gravity(~self.gameover)
+
+        return self.scores - scores_before
@@ -0,0 +1,281 @@
+"""Voxel world which reuses the bodies of removed voxels. Instead of deleting the body of a removed
+voxel, the body gets hidden and kept in a pool. New voxels take a body from the pool, move it to
+their position and change its appearance if needed. Voxels can also be moved directly, e.g. when
+rows of the game collapse, so their bodies do not need to be recreated at all.
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+import adsk.core, adsk.fusion  # pylint:disable=import-error
+
+from ... import config
+from .merged_bodies import create_temporary_body, get_appearance
+
+
+class BodyPool:
+    def __init__(
+        self,
+        grid_size: float,
+        component: adsk.fusion.Component,
+        offset: Tuple[float, float, float] = (0, 0, 0),
+        max_pooled: int = None,
+    ):
+        """Shows voxels as one body per voxel like the voxler VoxelWorld and can be used instead of
+        it. The voxel (x,y,z) is a cube with the side length grid_size whose center is
+        ((x, y, z) + offset) * grid_size. Only cubes are supported. The component must be in a
+        direct design.
+
+        Args:
+            grid_size (float): The side length of a voxel.
+            component (adsk.fusion.Component): The component in which the bodies are created.
+            offset (Tuple[float, float, float], optional): The offset of the voxels in voxels.
+                Defaults to (0, 0, 0).
+            max_pooled (int, optional): The maximum number of hidden bodies which are kept for
+                reuse. Defaults to None (config.CADTRIS_MAX_POOLED_BODIES).
+        """
+        self.grid_size = grid_size
+        self.component = component
+        self._offset = offset
+        self._max_pooled = (
+            config.CADTRIS_MAX_POOLED_BODIES if max_pooled is None else max_pooled
+        )
+        self._voxels = {}  # {voxel coord: description}
+        self._bodies = {}  # {voxel coord: adsk.fusion.BRepBody}
+        # hidden bodies which can be reused [(adsk.fusion.BRepBody, voxel coord, description)]
+        self._pool = []
+        self._appearances = {}  # {(appearance, color): adsk.core.Appearance}
+
+    @property
+    def voxels(self) -> Dict[Tuple[int, int, int], Dict]:
+        """The descriptions of all shown voxels. {(x_voxel,y_voxel,z_voxel):description}"""
+        return dict(self._voxels)
+
+    @property
+    def n_pooled(self) -> int:
+        """The number of hidden bodies which are kept for reuse."""
+        return len(self._pool)
+
+    def add_voxel(
+        self,
+        coord: Tuple[int, int, int],
+        shape: str,
+        color: Tuple[int, int, int, int],
+        appearance: str,
+        name: str,
+    ):
+        """Shows a voxel. A pooled body is reused if possible. An existing voxel at the coordinate
+        gets replaced.
+
+        Args:
+            coord (Tuple[int, int, int]): The voxel coordinate.
+            shape (str): The shape of the voxel, must be "cube".
+            color (Tuple[int, int, int, int]): The rgbo tuple or None to use the appearance as it is.
+            appearance (str): The id of the library appearance.
+            name (str): The name of the body.
+
+        Raises:
+            ValueError: If the shape is not supported.
+        """
+        if shape != "cube":
+            raise ValueError("Invalid voxel shape.")
+        if coord in self._voxels:
+            self.remove_voxel(coord)
+
+        description = {
+            "shape": shape,
+            "color": color,
+            "appearance": appearance,
+            "name": name,
+        }
+        body = self._take_pooled_body(coord, description)
+        if body is None:
+            body = self.component.bRepBodies.add(
+                create_temporary_body([coord], self.grid_size, self._offset)
+            )
+            self._describe_body(body, description)
+        self._bodies[coord] = body
+        self._voxels[coord] = description
+
+    def remove_voxel(self, coord: Tuple[int, int, int]):
+        """Removes a voxel. Its body is hidden and kept for reuse as long as the pool is not full.
+
+        Args:
+            coord (Tuple[int, int, int]): The voxel coordinate.
+        """
+        body = self._bodies.pop(coord)
+        description = self._voxels.pop(coord)
+        if len(self._pool) < self._max_pooled:
+            body.isLightBulbOn = False
+            self._pool.append((body, coord, description))
+        else:
+            body.deleteMe()
+
+    def move_voxels(
+        self, coords: Iterable[Tuple[int, int, int]], offset: Tuple[int, int, int]
+    ):
+        """Moves the given voxels together by the same offset. All bodies are moved by a single
+        move feature.
+
+        Args:
+            coords (Iterable[Tuple[int, int, int]]): The coordinates of the voxels to move.
+            offset (Tuple[int, int, int]): The offset in voxels.
+
+        Raises:
+            ValueError: If a voxel would be moved onto a voxel which is not moved.
+        """
+        coords = set(coords)
+        targets = {
+            tuple(c + o for c, o in zip(coord, offset)): coord for coord in coords
+        }
+        if any(target in self._voxels for target in targets.keys() - coords):
+            raise ValueError("Invalid move, the target voxel exists already.")
+
+        moved = {
+            coord: (self._bodies.pop(coord), self._voxels.pop(coord))
+            for coord in coords
+        }
+        self._move_bodies([body for body, _ in moved.values()], offset)
+        for target, coord in targets.items():
+            self._bodies[target], self._voxels[target] = moved[coord]
+
+    def update(
+        self,
+        voxels: Dict[Tuple[int, int, int], Dict],
+        progressbar: adsk.core.ProgressDialog = None,
+        changes_for_dialog: int = None,
+    ):
+        """Shows exactly the given voxels. Voxels are removed before new ones are added, so the
+        bodies of the removed voxels can be reused.
+
+        Args:
+            voxels (Dict[Tuple[int, int, int], Dict]): The voxels and their descriptions.
+                {(x_voxel,y_voxel,z_voxel):description}
+            progressbar (adsk.core.ProgressDialog, optional): Dialog which shows the progress.
+                Defaults to None.
+            changes_for_dialog (int, optional): The minimum number of changed voxels for which
+                the progressbar is shown. Defaults to None
+                (config.CADTRIS_VOXEL_CHANGES_FOR_DIALOG).
+        """
+        removed = [
+            coord
+            for coord, description in self._voxels.items()
+            if voxels.get(coord) != description
+        ]
+        added = [
+            (coord, description)
+            for coord, description in voxels.items()
+            if self._voxels.get(coord) != description
+        ]
+
+        if changes_for_dialog is None:
+            changes_for_dialog = config.CADTRIS_VOXEL_CHANGES_FOR_DIALOG
+        show_progress = (
+            progressbar is not None and len(removed) + len(added) >= changes_for_dialog
+        )
+        if show_progress:
+            progressbar.show(
+                progressbar.title, progressbar.message, 0, len(removed) + len(added)
+            )
+        for i, coord in enumerate(removed):
+            self.remove_voxel(coord)
+            if show_progress:
+                progressbar.progressValue = i + 1
+        for i, (coord, description) in enumerate(added, len(removed)):
+            self.add_voxel(coord, **description)
+            if show_progress:
+                progressbar.progressValue = i + 1
+        if show_progress:
+            progressbar.hide()
+
+    def set_grid_size(
+        self, grid_size: float, progressbar: adsk.core.ProgressDialog = None
+    ):
+        """Changes the size of the voxels and recreates all bodies.
+
+        Args:
+            grid_size (float): The new side length of a voxel.
+            progressbar (adsk.core.ProgressDialog, optional): Dialog which shows the progress.
+                Defaults to None.
+        """
+        voxels = self._voxels
+        self.clear()
+        self.grid_size = grid_size
+        self.update(voxels, progressbar)
+
+    def clear(self):
+        """Removes all voxels and deletes all bodies including the pooled ones."""
+        for body in self._bodies.values():
+            if body.isValid:
+                body.deleteMe()
+        self._bodies = {}
+        self._voxels = {}
+        self.clear_pool()
+
+    def clear_pool(self):
+        """Deletes the hidden bodies which are kept for reuse."""
+        for body, _, _ in self._pool:
+            if body.isValid:
+                body.deleteMe()
+        self._pool = []
+
+    def _take_pooled_body(
+        self, coord: Tuple[int, int, int], description: Dict
+    ) -> adsk.fusion.BRepBody:
+        """Takes a body from the pool and prepares it for the given voxel. Bodies which already
+        have the needed description are preferred.
+
+        Args:
+            coord (Tuple[int, int, int]): The voxel coordinate.
+            description (Dict): The description of the voxel.
+
+        Returns:
+            adsk.fusion.BRepBody: The body or None if the pool is empty.
+        """
+        if not self._pool:
+            return None
+        index = next(
+            (i for i, pooled in enumerate(self._pool) if pooled[2] == description),
+            len(self._pool) - 1,
+        )
+        body, pooled_coord, pooled_description = self._pool.pop(index)
+        self._move_bodies([body], tuple(c - p for c, p in zip(coord, pooled_coord)))
+        if pooled_description != description:
+            self._describe_body(body, description)
+        body.isLightBulbOn = True
+        return body
+
+    def _move_bodies(
+        self, bodies: List[adsk.fusion.BRepBody], offset: Tuple[int, int, int]
+    ):
+        """Moves the bodies by a single move feature.
+
+        Args:
+            bodies (List[adsk.fusion.BRepBody]): The bodies to move.
+            offset (Tuple[int, int, int]): The offset in voxels.
+        """
+        if not bodies or not any(offset):
+            return
+        collection = adsk.core.ObjectCollection.create()
+        for body in bodies:
+            collection.add(body)
+        transform = adsk.core.Matrix3D.create()
+        transform.translation = adsk.core.Vector3D.create(
+            *(o * self.grid_size for o in offset)
+        )
+        move_features = self.component.features.moveFeatures
+        move_input = move_features.createInput2(collection)
+        move_input.defineAsFreeMove(transform)
+        move_features.add(move_input)
+
+    def _describe_body(self, body: adsk.fusion.BRepBody, description: Dict):
+        """Sets the name and the appearance of a body according to the voxel description.
+
+        Args:
+            body (adsk.fusion.BRepBody): The body.
+            description (Dict): The description of the voxel.
+        """
+        body.name = description["name"]
+        key = (description["appearance"], description["color"])
+        if key not in self._appearances:
+            self._appearances[key] = get_appearance(self.component.parentDesign, *key)
+        body.appearance = self._appearances[key]
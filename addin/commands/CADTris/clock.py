@@ -0,0 +1,311 @@
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Callable
+
+
+class _Timer:
+    def __init__(self, callback: Callable[[int], None], delay: float, interval: float):
+        """Second schedule of a clock which runs independently from the gravity steps.
+
+        Args:
+            callback (Callable[[int], None]): The function which is called with the number of
+                elapsed timer steps.
+            delay (float): The time until the first step in seconds.
+            interval (float): The time between the following steps in seconds.
+        """
+        self.callback = callback
+        self.interval = interval
+        self.remaining = delay  # time until the next step while the clock is paused
+        self.deadline = None  # time of the next step while the clock is running
+
+
+class GameClock(ABC):
+    def __init__(self, interval: float = 1):
+        """Base class for the clocks which drive the gravity of a game. A running clock calls its
+        callback with the number of gravity steps which elapsed since the last call. The step
+        times are derived from a fixed schedule (a deadline per step) so the time needed by the
+        callback does not shift the following steps.
+        The clock starts paused and without a callback.
+        Additionally a clock can run a timer with its own schedule, e.g. for repeating the moves
+        of a held key, so no further thread is needed for it.
+
+        Args:
+            interval (float, optional): The time between two gravity steps in seconds. Defaults to 1.
+        """
+        self._interval = interval
+        self._callback = None
+        self._running = False
+        self._remaining = interval  # time until the next step while paused
+        self._timer = None
+
+    def attach(self, callback: Callable[[int], None]):
+        """Sets the function which is called with the number of elapsed gravity steps.
+
+        Args:
+            callback (Callable[[int], None]): The function to call.
+        """
+        self._callback = callback
+
+    @property
+    def interval(self) -> float:
+        """The time between two gravity steps in seconds. A changed interval is used from the
+        next step on."""
+        return self._interval
+
+    @interval.setter
+    def interval(self, new_interval: float):
+        self._interval = new_interval
+
+    @property
+    def running(self) -> bool:
+        """Whether the clock is currently running."""
+        return self._running
+
+    @abstractmethod
+    def now(self) -> float:
+        """Returns the current time of the clock in seconds.
+
+        Returns:
+            float: The current time.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def start(self):
+        """Starts or continues the clock. The time until the next step which was left when the
+        clock got paused is kept."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def pause(self):
+        """Pauses the clock. No steps are executed until the clock gets started again."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def reset(self):
+        """Restarts the current step, i.e. the next step happens a full interval from now."""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def start_timer(
+        self, callback: Callable[[int], None], delay: float, interval: float
+    ):
+        """Starts the timer of the clock which calls the callback with the number of elapsed timer
+        steps. The first step happens after the delay, the following ones every interval. The
+        timer only advances while the clock is running. A running timer gets replaced.
+
+        Args:
+            callback (Callable[[int], None]): The function to call.
+            delay (float): The time until the first step in seconds.
+            interval (float): The time between the following steps in seconds.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def stop_timer(self):
+        """Stops the timer of the clock. Does nothing if no timer is running."""
+        raise NotImplementedError()
+
+    def stop(self):
+        """Pauses the clock and releases all its resources. The clock can not be used afterwards."""
+        self.pause()
+
+    def _elapsed_steps(
+        self, deadline: float, now: float, interval: float = None
+    ) -> int:
+        """Calculates the number of steps which were due until now.
+
+        Args:
+            deadline (float): The time of the next step.
+            now (float): The current time.
+            interval (float, optional): The time between two steps. Defaults to None (the
+                interval of the gravity steps).
+
+        Returns:
+            int: The number of due steps (0 if the deadline has not been reached).
+        """
+        if now < deadline:
+            return 0
+        return 1 + int((now - deadline) // (interval or self._interval))
+
+
+class VirtualClock(GameClock):
+    def __init__(self, interval: float = 1):
+        """Clock whose time only advances by calling advance. All steps are executed
+        synchronously within advance, which makes games reproducible and allows to simulate games
+        faster than real time. A clock which is never advanced never executes any step, so the game
+        is only moved down by explicit ticks.
+
+        Args:
+            interval (float, optional): The time between two gravity steps in seconds. Defaults to 1.
+        """
+        super().__init__(interval)
+        self._now = 0.0
+        self._deadline = None  # time of the next step while running
+
+    def now(self) -> float:
+        return self._now
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._deadline = self._now + self._remaining
+            if self._timer is not None:
+                self._timer.deadline = self._now + self._timer.remaining
+
+    def pause(self):
+        if self._running:
+            self._running = False
+            self._remaining = self._deadline - self._now
+            if self._timer is not None:
+                self._timer.remaining = self._timer.deadline - self._now
+
+    def reset(self):
+        self._remaining = self._interval
+        self._deadline = self._now + self._interval
+
+    def start_timer(
+        self, callback: Callable[[int], None], delay: float, interval: float
+    ):
+        self._timer = _Timer(callback, delay, interval)
+        self._timer.deadline = self._now + delay
+
+    def stop_timer(self):
+        self._timer = None
+
+    def advance(self, seconds: float):
+        """Advances the time of the clock and calls the callback for every step which is due.
+        Every step is executed at its deadline, so the current interval (which might get changed by
+        the callback) is used for the following steps. The steps of the timer are executed in the
+        same way, at equal deadlines the gravity step comes first.
+
+        Args:
+            seconds (float): The time to advance in seconds.
+        """
+        end = self._now + seconds
+        while self._running:
+            timer = self._timer
+            if timer is not None and timer.deadline < self._deadline:
+                if timer.deadline > end:
+                    break
+                self._now = timer.deadline
+                timer.deadline += timer.interval
+                timer.callback(1)
+                continue
+            if self._deadline > end:
+                break
+            self._now = self._deadline
+            self._deadline += self._interval
+            if self._callback is not None:
+                self._callback(1)
+        self._now = end
+
+
+class RealTimeClock(GameClock):
+    def __init__(self, interval: float = 1):
+        """Clock which executes the steps from a background thread in real time. The deadlines
+        are calculated from time.monotonic. If the callback takes longer than an interval, the
+        missed steps are passed together in the next call instead of being delayed.
+
+        Args:
+            interval (float, optional): The time between two gravity steps in seconds. Defaults to 1.
+        """
+        super().__init__(interval)
+        self._deadline = None
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def start(self):
+        with self._condition:
+            if self._running or self._stopped:
+                return
+            self._running = True
+            self._deadline = self.now() + self._remaining
+            if self._timer is not None:
+                self._timer.deadline = self.now() + self._timer.remaining
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def pause(self):
+        with self._condition:
+            if self._running:
+                self._running = False
+                self._remaining = max(self._deadline - self.now(), 0)
+                if self._timer is not None:
+                    self._timer.remaining = max(self._timer.deadline - self.now(), 0)
+                self._condition.notify()
+
+    def reset(self):
+        with self._condition:
+            self._remaining = self._interval
+            self._deadline = self.now() + self._interval
+            self._condition.notify()
+
+    def start_timer(
+        self, callback: Callable[[int], None], delay: float, interval: float
+    ):
+        with self._condition:
+            self._timer = _Timer(callback, delay, interval)
+            self._timer.deadline = self.now() + delay
+            self._condition.notify()
+
+    def stop_timer(self):
+        with self._condition:
+            self._timer = None
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _next_deadline(self) -> float:
+        """Returns the earliest deadline of the gravity steps and the timer.
+
+        Returns:
+            float: The time of the next step.
+        """
+        if self._timer is not None:
+            return min(self._deadline, self._timer.deadline)
+        return self._deadline
+
+    def _run(self):
+        """Waits for the next deadline and calls the callbacks with the number of due steps until
+        the clock gets stopped."""
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._running:
+                        timeout = self._next_deadline() - self.now()
+                        if timeout <= 0:
+                            break
+                        self._condition.wait(timeout)
+                    else:
+                        self._condition.wait()
+                if self._stopped:
+                    return
+                now = self.now()
+                n_steps = self._elapsed_steps(self._deadline, now)
+                self._deadline += n_steps * self._interval
+                callback = self._callback
+                timer = self._timer
+                n_timer_steps = 0
+                if timer is not None:
+                    n_timer_steps = self._elapsed_steps(
+                        timer.deadline, now, timer.interval
+                    )
+                    timer.deadline += n_timer_steps * timer.interval
+            # the callbacks are executed without holding the condition so they can use the clock
+            if callback is not None and n_steps:
+                callback(n_steps)
+            if n_timer_steps:
+                timer.callback(n_timer_steps)
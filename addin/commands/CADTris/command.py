@@ -1,16 +1,22 @@
-from queue import Queue
+from collections import deque
 import threading
 import functools
 from typing import Callable
 import logging
 from pathlib import Path
+import time
 
 import adsk.core, adsk.fusion  # pylint:disable=import-error
 
 from ...libs.fusion_addin_framework import fusion_addin_framework as faf
 from ... import config
 from .logic_model import TetrisGame
-from .ui import InputsWindow, InputIds, FusionDisplay
+from .ui import InputsWindow, InputIds, create_fusion_display
+from .clock import RealTimeClock
+from .controls import AutoShift, KeyboardControls
+from .replay import ReplayRecorder
+from .highscores import HighscoreStore
+from . import instrumentation
 
 
 class CADTrisCommand(faf.AddinCommandBase):
@@ -28,20 +34,34 @@ class CADTrisCommand(faf.AddinCommandBase):
             tooltip=config.CADTRIS_TOOLTIP,
         )
 
+        # created once so the highscore file is only read once per session
+        self.highscores = HighscoreStore()
         self.game = None
         self.display = None
-
-        self.execution_queue = Queue()
+        self.controls = None
+        self.recorder = None
+
+        self.execution_queue = deque()  # [(to_execute, coalesce, time of enqueueing), ...]
+        self._queue_lock = threading.Lock()
+        self._coalesced_pending = set()
+        self._event_pending = False
+        self.dropped_updates = 0  # total number of coalesced calls
         self._fusion_command: adsk.core.Command = None
         self.last_handler = None
 
-    def _executer(self, to_execute: Callable):
+    def _executer(self, to_execute: Callable, coalesce: bool = False):
         """Utility function which can be used to execute arbitrary FusionAPI calls by automatically
         determining the correct way of executing them. Either via the CustomCommand-doExecute mechanism
         or directly depending on the thread and on the currently active hanler.
+        Calls which are flagged with coalesce are dropped if the same callable is already waiting for
+        execution. Therefore these callables must always execute the latest pending work (e.g. render
+        the latest game state) and must be idempotent. All other calls (e.g. clear_world) are
+        always executed in the order they were requested.
 
         Args:
             to_execute (Callable): The function to execute. Must not accept any arguments.
+            coalesce (bool, optional): Whether the call can be merged with an already pending call
+                of the same callable. Defaults to False.
         """
         # actions from the event must be executed via customEvent(doExecute) (as described in docs)
         # actions from inputChanged handler must be executed via customEvent (otherwise bodies wont get created)
@@ -53,7 +73,17 @@ class CADTrisCommand(faf.AddinCommandBase):
         ):
             to_execute()
         else:
-            self.execution_queue.put(to_execute)
+            with self._queue_lock:
+                if coalesce and to_execute in self._coalesced_pending:
+                    self.dropped_updates += 1
+                    return
+                if coalesce:
+                    self._coalesced_pending.add(to_execute)
+                self.execution_queue.append((to_execute, coalesce, time.perf_counter()))
+                # only a single custom event is needed as the execute handler works off the whole queue
+                if self._event_pending:
+                    return
+                self._event_pending = True
             # FireCustomEvent returns immediately and therefore the lock for actions is removed.
             # The customevent (and the contained doExecute call) is scheduled and might not get immideately executed.
             # Therefore this function might get called (from the periodic thread) again when the execute
@@ -103,16 +133,36 @@ class CADTrisCommand(faf.AddinCommandBase):
 
         comp = faf.utils.new_component(config.CADTRIS_COMPONENT_NAME)
         design.rootComponent.allOccurrencesByComponent(comp).item(0).activate()
-        command_window = InputsWindow(eventArgs.command)
-        self.display = FusionDisplay(command_window, comp, self._executer)
+        command_window = InputsWindow(eventArgs.command, self.highscores)
+        self.display = create_fusion_display(
+            command_window, comp, self._executer, self.highscores
+        )
 
-        self.game = TetrisGame(self.display)
+        if config.CADTRIS_RECORD_REPLAYS:
+            self.recorder = ReplayRecorder()
+        # the clock of the game also repeats the moves of held keys
+        clock = RealTimeClock()
+        self.game = TetrisGame(self.display, clock=clock, recorder=self.recorder)
+        self.controls = KeyboardControls(
+            {
+                adsk.core.KeyCodes.UpKeyCode: self.game.rotate_right,
+                adsk.core.KeyCodes.DownKeyCode: self.game.rotate_left,
+                adsk.core.KeyCodes.ShiftKeyCode: self.game.drop,
+            },
+            {
+                adsk.core.KeyCodes.LeftKeyCode: -1,
+                adsk.core.KeyCodes.RightKeyCode: 1,
+            },
+            AutoShift(self.game.move_horizontal, clock),
+        )
 
     @_track_last_handler
     def inputChanged(self, eventArgs: adsk.core.InputChangedEventArgs):
         # do NOT use: inputs = event_args.inputs (will only contain inputs of the same input group as the changed input)
         # use instead: inputs = event_args.firingEvent.sender.commandInputs
         logging.getLogger(__name__).info(f"Changed input id: {eventArgs.input.id}")
+        # the focus is in the command dialog so the key up event of a held key might get lost
+        self.controls.stop()
         if eventArgs.input.id == InputIds.PlayButton.value:
             self.game.start()
         elif eventArgs.input.id == InputIds.PauseButton.value:
@@ -131,33 +181,59 @@ class CADTrisCommand(faf.AddinCommandBase):
     def execute(
         self, eventArgs: adsk.core.CommandEventArgs  # pylint:disable=unused-argument
     ):
-        c = 0
-        while not self.execution_queue.empty():
-            self.execution_queue.get()()
-            c+=1
-        logging.getLogger(__name__).debug(f"Executed {c} actions.")
+        with self._queue_lock:
+            # actions which are requested while executing the queue need a new custom event
+            self._event_pending = False
+            to_execute = self.execution_queue
+            self.execution_queue = deque()
+            self._coalesced_pending.clear()
+            dropped_updates = self.dropped_updates
+
+        started = time.perf_counter()
+        for action, _, enqueued in to_execute:
+            instrumentation.record("queue_wait", started - enqueued)
+            action()
+        logging.getLogger(__name__).debug(
+            f"Executed {len(to_execute)} actions, dropped {dropped_updates} updates in total."
+        )
 
     @_track_last_handler
     def destroy(
         self, eventArgs: adsk.core.CommandEventArgs  # pylint:disable=unused-argument
     ):
         # at first game must be terminated to avoid further thread calls while display is cleared
+        self.controls.stop()
         self.game.terminate()
+        # the last frame might have been deferred by the frame rate limit
+        self.display.flush()
+
+        if self.recorder is not None:
+            replay_path = config.CADTRIS_REPLAYS_FOLDER / time.strftime(
+                "%Y%m%d_%H%M%S.ctrp"
+            )
+            self.recorder.save(replay_path)
+            logging.getLogger(__name__).info(f"Saved replay to {replay_path}.")
 
         if not eventArgs.command.commandInputs.itemById(
             InputIds.KeepBodies.value
         ).value:
             self.display.clear_world()
+        else:
+            self.display.materialize()
+
+        with self._queue_lock:
+            self.execution_queue = deque()
+            self._coalesced_pending.clear()
+            self._event_pending = False
 
-        self.execution_queue = Queue()
+        instrumentation.dump(logging.getLogger(__name__))
+        instrumentation.reset()
 
     @_track_last_handler
     def keyDown(self, eventArgs: adsk.core.KeyboardEventArgs):
         logging.getLogger(__name__).info(f"Pressed key {eventArgs.keyCode}.")
-        {
-            adsk.core.KeyCodes.UpKeyCode: self.game.rotate_right,
-            adsk.core.KeyCodes.LeftKeyCode: self.game.move_left,
-            adsk.core.KeyCodes.RightKeyCode: self.game.move_right,
-            adsk.core.KeyCodes.DownKeyCode: self.game.rotate_left,
-            adsk.core.KeyCodes.ShiftKeyCode: self.game.drop,
-        }.get(eventArgs.keyCode, lambda: None)()
+        self.controls.key_down(eventArgs.keyCode)
+
+    @_track_last_handler
+    def keyUp(self, eventArgs: adsk.core.KeyboardEventArgs):
+        self.controls.key_up(eventArgs.keyCode)
@@ -0,0 +1,132 @@
+import threading
+from typing import Callable, Dict
+
+from ... import config
+from .clock import GameClock
+
+
+class AutoShift:
+    def __init__(self, move: Callable[[int], None], clock: GameClock):
+        """Delayed auto shift for the horizontal movement. Pressing a direction moves the figure
+        once immediately. If the key is still held after config.CADTRIS_DAS_DELAY, the figure is
+        moved repeatedly with config.CADTRIS_DAS_REPEAT_RATE until the key is released. Repeated
+        key down events of the operating system do not move the figure, the repetition is only
+        controlled by the timer of the clock. Moves which are due at the same time are passed as a
+        single move of multiple steps.
+        If no key up event arrives (e.g. because the focus changed), the repetition stops
+        config.CADTRIS_DAS_TIMEOUT seconds after the last key down event of the held key.
+
+        Args:
+            move (Callable[[int], None]): Function which moves the figure n steps horizontally
+                (n>0 --> right, n<0 --> left).
+            clock (GameClock): The clock whose timer triggers the repetitions, usually the clock
+                of the game.
+        """
+        self._move = move
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._direction = 0  # direction of the held key, 0 if no key is held
+        self._pressed_at = None  # clock time of the last key down event of the held key
+
+    def press(self, direction: int):
+        """Handles the key down event of a direction key.
+
+        Args:
+            direction (int): The direction of the key (1 --> right, -1 --> left).
+        """
+        with self._lock:
+            self._pressed_at = self._clock.now()
+            if direction == self._direction:
+                return
+            self._direction = direction
+            self._clock.start_timer(
+                self._repeat,
+                config.CADTRIS_DAS_DELAY,
+                1 / config.CADTRIS_DAS_REPEAT_RATE,
+            )
+        self._move(direction)
+
+    def release(self, direction: int):
+        """Handles the key up event of a direction key. Releasing a key which is not the currently
+        active direction (e.g. after switching directions) does nothing.
+
+        Args:
+            direction (int): The direction of the key (1 --> right, -1 --> left).
+        """
+        with self._lock:
+            if direction == self._direction:
+                self._stop()
+
+    def stop(self):
+        """Stops the repetition, e.g. if key up events might get lost."""
+        with self._lock:
+            self._stop()
+
+    def _stop(self):
+        """Stops the repetition. The lock must be held."""
+        self._direction = 0
+        self._clock.stop_timer()
+
+    def _repeat(self, n: int):
+        """Moves the figure for all repetitions which are due. Called by the timer of the clock.
+
+        Args:
+            n (int): The number of due repetitions.
+        """
+        with self._lock:
+            direction = self._direction
+            if direction == 0:
+                return
+            if self._clock.now() - self._pressed_at > config.CADTRIS_DAS_TIMEOUT:
+                self._stop()
+                return
+        self._move(n * direction)
+
+
+class KeyboardControls:
+    def __init__(
+        self,
+        actions: Dict[int, Callable[[], None]],
+        shift_directions: Dict[int, int],
+        auto_shift: AutoShift,
+    ):
+        """Maps key events to game actions. The maps are created once and reused for every event.
+
+        Args:
+            actions (Dict[int, Callable[[], None]]): Maps key codes to the actions which are
+                executed once per key down event.
+            shift_directions (Dict[int, int]): Maps key codes to horizontal directions which are
+                handled by the auto shift.
+            auto_shift (AutoShift): The auto shift for the horizontal movement.
+        """
+        self._actions = actions
+        self._shift_directions = shift_directions
+        self._auto_shift = auto_shift
+
+    def key_down(self, key_code: int):
+        """Executes the action which is bound to the key. Unbound keys are ignored.
+
+        Args:
+            key_code (int): The code of the pressed key.
+        """
+        direction = self._shift_directions.get(key_code)
+        if direction is not None:
+            self._auto_shift.press(direction)
+            return
+        action = self._actions.get(key_code)
+        if action is not None:
+            action()
+
+    def key_up(self, key_code: int):
+        """Ends the auto shift if a direction key has been released.
+
+        Args:
+            key_code (int): The code of the released key.
+        """
+        direction = self._shift_directions.get(key_code)
+        if direction is not None:
+            self._auto_shift.release(direction)
+
+    def stop(self):
+        """Stops all repetitions."""
+        self._auto_shift.stop()
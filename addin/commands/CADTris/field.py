@@ -0,0 +1,547 @@
+from abc import ABC, abstractmethod
+import struct
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from ... import config
+
+# tables for packing two color codes (<16) into one byte and unpacking them again
+_HIGH_NIBBLE = bytes((i << 4) & 0xFF for i in range(256))
+_LOW_NIBBLE_OF = bytes(i & 0x0F for i in range(256))
+_HIGH_NIBBLE_OF = bytes(i >> 4 for i in range(256))
+_N_ROWS = struct.Struct("<H")
+
+
+def rows_intersect(
+    rows: Sequence[int], full_mask: int, row_masks: Tuple[int, ...], x: int, y: int
+) -> bool:
+    """Checks whether the cells given as row bitmasks collide with the occupied cells of a field
+    given as row bitmasks, are outside of the walls or below the bottom.
+    Rows which are not contained in rows are treated as empty.
+
+    Args:
+        rows (Sequence[int]): The row bitmasks of the field starting at the bottom row.
+        full_mask (int): The bitmask of a full row, i.e. (1 << width) - 1.
+        row_masks (Tuple[int, ...]): The bitmasks of the cells to check. Bit i of row_masks[j]
+            represents the cell (x + i, y + j).
+        x (int): The x coordinate of bit 0.
+        y (int): The y coordinate of the first row mask.
+
+    Returns:
+        bool: True if any cell is invalid, False otherwise.
+    """
+    if x < 0 or y < 0:
+        return True
+    n_rows = len(rows)
+    for row_y, mask in enumerate(row_masks, y):
+        mask <<= x
+        if mask > full_mask:
+            return True
+        if row_y < n_rows and rows[row_y] & mask:
+            return True
+    return False
+
+
+def _pack_field(width: int, rows: Sequence[int], colors: bytes) -> bytes:
+    """Packs the row bitmasks and the color codes of a field into bytes. Two color codes are
+    stored per byte, the packing is done by byte translations and slicing only.
+
+    Args:
+        width (int): The width of the field.
+        rows (Sequence[int]): The row bitmasks.
+        colors (bytes): The color codes with one byte per cell (row by row). All codes must be < 16.
+
+    Returns:
+        bytes: The packed field.
+    """
+    row_bytes = (width + 7) // 8
+    colors = bytes(colors[: width * len(rows)])
+    low, high = colors[0::2], colors[1::2]
+    if len(high) < len(low):
+        high += b"\0"
+    packed_colors = (
+        int.from_bytes(low, "little")
+        | int.from_bytes(high.translate(_HIGH_NIBBLE), "little")
+    ).to_bytes(len(low), "little")
+    return b"".join(
+        (
+            _N_ROWS.pack(len(rows)),
+            b"".join(row.to_bytes(row_bytes, "little") for row in rows),
+            packed_colors,
+        )
+    )
+
+
+def _unpack_field(width: int, data: bytes) -> Tuple[List[int], bytearray]:
+    """Reverses _pack_field.
+
+    Args:
+        width (int): The width of the field.
+        data (bytes): The packed field.
+
+    Raises:
+        ValueError: If the data does not match the width.
+
+    Returns:
+        Tuple[List[int], bytearray]: The row bitmasks and the color codes with one byte per cell.
+    """
+    row_bytes = (width + 7) // 8
+    (n_rows,) = _N_ROWS.unpack_from(data)
+    n_cells = width * n_rows
+    rows_end = _N_ROWS.size + n_rows * row_bytes
+    if len(data) != rows_end + (n_cells + 1) // 2:
+        raise ValueError("Invalid field data.")
+    rows = [
+        int.from_bytes(data[i : i + row_bytes], "little")
+        for i in range(_N_ROWS.size, rows_end, row_bytes)
+    ]
+    packed_colors = data[rows_end:]
+    colors = bytearray(2 * len(packed_colors))
+    colors[0::2] = packed_colors.translate(_LOW_NIBBLE_OF)
+    colors[1::2] = packed_colors.translate(_HIGH_NIBBLE_OF)
+    del colors[n_cells:]
+    return rows, colors
+
+
+class Field(ABC):
+    def __init__(self, width: int, height: int):
+        """Base class for the storage of the settled blocks of a tetris game. The field only knows
+        about the cells which are occupied and their color codes. The active figure is not part of
+        the field until it gets added.
+
+        Args:
+            width (int): The number of cells in x direction.
+            height (int): The number of cells in y direction. Cells above this height can be
+                occupied (e.g. by a figure which freezes at the top) but are never checked for full rows.
+        """
+        self.width = width
+        self.height = height
+        # {(x,y):color_code or None} since the last call of take_changes
+        self._changes = {}
+        # the rows removed by every collapse since the last call of take_cleared_rows
+        self._cleared_rows = []
+
+    @abstractmethod
+    def intersects(self, coords: Iterable[Tuple[int, int]]) -> bool:
+        """Returns whether any of the given coordinates is outside of the walls, below the bottom
+        or already occupied.
+
+        Args:
+            coords (Iterable[Tuple[int, int]]): The coordinates to check.
+
+        Returns:
+            bool: True if any coordinate is invalid, False otherwise.
+        """
+        raise NotImplementedError()
+
+    def intersects_masks(self, row_masks: Tuple[int, ...], x: int, y: int) -> bool:
+        """Same as intersects but the cells are given as row bitmasks. Bit i of row_masks[j]
+        represents the cell (x + i, y + j).
+
+        Args:
+            row_masks (Tuple[int, ...]): The bitmasks of the rows to check starting at the bottom.
+            x (int): The x coordinate of bit 0.
+            y (int): The y coordinate of the first row mask.
+
+        Returns:
+            bool: True if any cell is invalid, False otherwise.
+        """
+        return self.intersects(
+            (x + i, y + j)
+            for j, mask in enumerate(row_masks)
+            for i in range(mask.bit_length())
+            if mask >> i & 1
+        )
+
+    def row_masks(self) -> Tuple[int, ...]:
+        """Returns the occupancy of the field as one bitmask per row (bit x is set if the cell (x,y)
+        is occupied) starting at the bottom row.
+
+        Returns:
+            Tuple[int, ...]: The row bitmasks. Contains at least height rows.
+        """
+        rows = [0] * self.height
+        for x, y in self.to_dict():
+            rows.extend([0] * (y + 1 - len(rows)))
+            rows[y] |= 1 << x
+        return tuple(rows)
+
+    def column_heights(self) -> Tuple[int, ...]:
+        """Returns the height of every column, i.e. the y coordinate above the highest occupied
+        cell of the column (0 for empty columns).
+
+        Returns:
+            Tuple[int, ...]: The heights of the columns x=0...width-1.
+        """
+        heights = [0] * self.width
+        for x, y in self.to_dict():
+            heights[x] = max(heights[x], y + 1)
+        return tuple(heights)
+
+    def column_height(self, x: int) -> int:
+        """Returns the height of a single column (see column_heights).
+
+        Args:
+            x (int): The x coordinate of the column.
+
+        Returns:
+            int: The y coordinate above the highest occupied cell of the column.
+        """
+        return self.column_heights()[x]
+
+    def to_bytes(self) -> bytes:
+        """Packs the field into a compact binary representation (one bitmask per row and
+        one nibble per cell for the color codes). The tracked changes are not included.
+
+        Returns:
+            bytes: The packed field.
+        """
+        rows = self.row_masks()
+        colors = bytearray(self.width * len(rows))
+        for (x, y), color_code in self.to_dict().items():
+            colors[y * self.width + x] = color_code
+        return _pack_field(self.width, rows, colors)
+
+    @classmethod
+    def from_bytes(cls, width: int, height: int, data: bytes) -> "Field":
+        """Creates a field from the representation created by to_bytes.
+
+        Args:
+            width (int): The width of the packed field.
+            height (int): The height of the packed field.
+            data (bytes): The packed field.
+
+        Returns:
+            Field: The unpacked field without tracked changes.
+        """
+        rows, colors = _unpack_field(width, data)
+        field = cls(width, height)
+        for y, row in enumerate(rows):
+            for x in range(width):
+                if row >> x & 1:
+                    field.add(((x, y),), colors[y * width + x])
+        field.take_changes()
+        return field
+
+    @abstractmethod
+    def add(self, coords: Iterable[Tuple[int, int]], color_code: int) -> None:
+        """Occupies the given coordinates with the given color code.
+
+        Args:
+            coords (Iterable[Tuple[int, int]]): The coordinates to occupy.
+            color_code (int): The color code of the added cells.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def full_rows(self, rows: Iterable[int] = None) -> List[int]:
+        """Returns the y coordinates of all rows which are fully occupied. Rows above the height
+        are never full.
+
+        Args:
+            rows (Iterable[int], optional): The y coordinates of the rows to check, e.g. the rows
+                of the last added figure. Defaults to None (all rows).
+
+        Returns:
+            List[int]: The y coordinates of the full rows in ascending order.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def collapse_rows(self, rows: List[int]) -> None:
+        """Removes the given rows and lowers all rows above accordingly.
+
+        Args:
+            rows (List[int]): The y coordinates of the rows to remove.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def to_dict(self) -> Dict[Tuple[int, int], int]:
+        """Creates a new dictionary representation of the field.
+
+        Returns:
+            Dict[Tuple[int, int], int]: The field as {(x,y):color_code}.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def _cells_from(self, y: int) -> Dict[Tuple[int, int], int]:
+        """Creates a dictionary representation of all cells in row y and above.
+
+        Args:
+            y (int): The lowest row to include.
+
+        Returns:
+            Dict[Tuple[int, int], int]: The cells as {(x,y):color_code}.
+        """
+        raise NotImplementedError()
+
+    def _record_changes(
+        self, before: Dict[Tuple[int, int], int], after: Dict[Tuple[int, int], int]
+    ):
+        """Adds the difference between two (partial) field states to the tracked changes.
+
+        Args:
+            before (Dict[Tuple[int, int], int]): The cells before the modification.
+            after (Dict[Tuple[int, int], int]): The cells after the modification.
+        """
+        for p in before.keys() - after.keys():
+            self._changes[p] = None
+        for p, c in after.items():
+            if before.get(p) != c:
+                self._changes[p] = c
+
+    def take_changes(self) -> Dict[Tuple[int, int], int]:
+        """Returns all cell changes since the last call of this method and resets the tracking.
+
+        Returns:
+            Dict[Tuple[int, int], int]: The changed cells as {(x,y):color_code}. Removed cells
+                have None as color code.
+        """
+        changes = self._changes
+        self._changes = {}
+        return changes
+
+    def take_cleared_rows(self) -> List[List[int]]:
+        """Returns the rows which were removed by every collapse since the last call of this method
+        and resets the tracking.
+
+        Returns:
+            List[List[int]]: The y coordinates of the removed rows in ascending order for every
+                collapse in the order of the collapses. The coordinates refer to the field as it
+                was right before the respective collapse.
+        """
+        cleared_rows = self._cleared_rows
+        self._cleared_rows = []
+        return cleared_rows
+
+
+class DictField(Field):
+    def __init__(self, width: int, height: int):
+        """Field which stores the occupied cells in a {(x,y):color_code} dictionary."""
+        super().__init__(width, height)
+        self._cells = {}  # {(x,y):color_code} x=[0...width-1] y=[0...height-1]
+
+    def intersects(self, coords: Iterable[Tuple[int, int]]) -> bool:
+        for x, y in coords:
+            if x >= self.width or x < 0 or y < 0 or (x, y) in self._cells:
+                return True
+        return False
+
+    def add(self, coords: Iterable[Tuple[int, int]], color_code: int) -> None:
+        for p in coords:
+            self._cells[p] = color_code
+            self._changes[p] = color_code
+
+    def full_rows(self, rows: Iterable[int] = None) -> List[int]:
+        if rows is None:
+            rows = range(self.height)
+        return [
+            y
+            for y in sorted(set(rows))
+            if 0 <= y < self.height
+            and all((x, y) in self._cells for x in range(self.width))
+        ]
+
+    def collapse_rows(self, rows: List[int]) -> None:
+        if not rows:
+            return
+        before = self._cells_from(min(rows))
+        removed = set(rows)
+        new_cells = {}
+        for (x, y), c in self._cells.items():
+            if y not in removed:
+                new_cells[(x, y - sum(r < y for r in rows))] = c
+        self._cells = new_cells
+        self._record_changes(before, self._cells_from(min(rows)))
+        self._cleared_rows.append(sorted(rows))
+
+    def to_dict(self) -> Dict[Tuple[int, int], int]:
+        return dict(self._cells)
+
+    def _cells_from(self, y: int) -> Dict[Tuple[int, int], int]:
+        return {p: c for p, c in self._cells.items() if p[1] >= y}
+
+
+class BitboardField(Field):
+    def __init__(self, width: int, height: int):
+        """Field which stores one integer bitmask per row (bit x is set if cell (x,y) is occupied)
+        and the color codes in a flat bytearray with one byte per cell.
+        Rows above the height are added on demand.
+        """
+        super().__init__(width, height)
+        self._full_mask = (1 << width) - 1
+        self._rows = [0] * height
+        self._colors = bytearray(width * height)
+        self._heights = [0] * width
+
+    def _ensure_rows(self, n_rows: int):
+        """Appends empty rows until the field has at least n_rows rows.
+
+        Args:
+            n_rows (int): The minimum number of rows.
+        """
+        missing = n_rows - len(self._rows)
+        if missing > 0:
+            self._rows.extend([0] * missing)
+            self._colors.extend(bytes(missing * self.width))
+
+    def intersects(self, coords: Iterable[Tuple[int, int]]) -> bool:
+        rows = self._rows
+        n_rows = len(rows)
+        for x, y in coords:
+            if x >= self.width or x < 0 or y < 0:
+                return True
+            if y < n_rows and rows[y] >> x & 1:
+                return True
+        return False
+
+    def intersects_masks(self, row_masks: Tuple[int, ...], x: int, y: int) -> bool:
+        return rows_intersect(self._rows, self._full_mask, row_masks, x, y)
+
+    def row_masks(self) -> Tuple[int, ...]:
+        return tuple(self._rows)
+
+    def column_heights(self) -> Tuple[int, ...]:
+        return tuple(self._heights)
+
+    def column_height(self, x: int) -> int:
+        return self._heights[x]
+
+    def to_bytes(self) -> bytes:
+        return _pack_field(self.width, self._rows, self._colors)
+
+    @classmethod
+    def from_bytes(cls, width: int, height: int, data: bytes) -> "BitboardField":
+        field = cls(width, height)
+        field._rows, field._colors = _unpack_field(width, data)
+        field._ensure_rows(height)
+        field._compute_heights()
+        return field
+
+    def _compute_heights(self):
+        """Calculates the column heights from the rows. Every column is only visited once by
+        searching the rows from the top."""
+        heights = [0] * self.width
+        remaining = self._full_mask  # columns without a found cell
+        for y in range(len(self._rows) - 1, -1, -1):
+            found = self._rows[y] & remaining
+            remaining &= ~found
+            while found:
+                lowest = found & -found
+                heights[lowest.bit_length() - 1] = y + 1
+                found ^= lowest
+            if not remaining:
+                break
+        self._heights = heights
+
+    def add(self, coords: Iterable[Tuple[int, int]], color_code: int) -> None:
+        for x, y in coords:
+            self._ensure_rows(y + 1)
+            self._rows[y] |= 1 << x
+            self._colors[y * self.width + x] = color_code
+            self._changes[(x, y)] = color_code
+            if y >= self._heights[x]:
+                self._heights[x] = y + 1
+
+    def full_rows(self, rows: Iterable[int] = None) -> List[int]:
+        full_mask = self._full_mask
+        if rows is None:
+            rows = range(self.height)
+        return [
+            y
+            for y in sorted(set(rows))
+            if 0 <= y < self.height and self._rows[y] == full_mask
+        ]
+
+    def collapse_rows(self, rows: List[int]) -> None:
+        if not rows:
+            return
+        before = self._cells_from(min(rows))
+        width = self.width
+        for y in sorted(rows, reverse=True):
+            del self._rows[y]
+            del self._colors[y * width : (y + 1) * width]
+        # keep at least the regular height available
+        self._ensure_rows(self.height)
+        self._record_changes(before, self._cells_from(min(rows)))
+        self._cleared_rows.append(sorted(rows))
+        self._update_heights(rows)
+
+    def _update_heights(self, removed_rows: List[int]):
+        """Updates the column heights after rows have been removed. As the removed rows were full,
+        every column loses len(removed_rows) cells. Only columns whose highest cell was removed
+        need to be searched for their new highest cell.
+
+        Args:
+            removed_rows (List[int]): The y coordinates of the removed rows.
+        """
+        n_removed = len(removed_rows)
+        highest_removed = max(removed_rows)
+        for x in range(self.width):
+            if self._heights[x] - 1 > highest_removed:
+                self._heights[x] -= n_removed
+                continue
+            y = self._heights[x] - 1 - n_removed
+            while y >= 0 and not self._rows[y] >> x & 1:
+                y -= 1
+            self._heights[x] = y + 1
+
+    def to_dict(self) -> Dict[Tuple[int, int], int]:
+        return self._cells_from(0)
+
+    def _cells_from(self, y: int) -> Dict[Tuple[int, int], int]:
+        cells = {}
+        width = self.width
+        for row_y, row in enumerate(self._rows[y:], y):
+            x = 0
+            while row:
+                if row & 1:
+                    cells[(x, row_y)] = self._colors[row_y * width + x]
+                row >>= 1
+                x += 1
+        return cells
+
+
+FIELD_BACKENDS = {
+    "dict": DictField,
+    "bitboard": BitboardField,
+}
+
+
+def create_field(width: int, height: int) -> Field:
+    """Creates an empty field using the backend defined in the config.
+
+    Args:
+        width (int): The number of cells in x direction.
+        height (int): The number of cells in y direction.
+
+    Raises:
+        ValueError: If the configured backend is not known.
+
+    Returns:
+        Field: The empty field.
+    """
+    if config.CADTRIS_FIELD_BACKEND not in FIELD_BACKENDS:
+        raise ValueError("Invalid field backend.")
+    return FIELD_BACKENDS[config.CADTRIS_FIELD_BACKEND](width, height)
+
+
+def field_from_bytes(width: int, height: int, data: bytes) -> Field:
+    """Creates a field from the representation created by Field.to_bytes using the backend
+    defined in the config.
+
+    Args:
+        width (int): The number of cells in x direction.
+        height (int): The number of cells in y direction.
+        data (bytes): The packed field.
+
+    Raises:
+        ValueError: If the configured backend is not known or the data is invalid.
+
+    Returns:
+        Field: The unpacked field.
+    """
+    if config.CADTRIS_FIELD_BACKEND not in FIELD_BACKENDS:
+        raise ValueError("Invalid field backend.")
+    return FIELD_BACKENDS[config.CADTRIS_FIELD_BACKEND].from_bytes(width, height, data)
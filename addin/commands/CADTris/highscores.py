@@ -0,0 +1,351 @@
+import bisect
+import json
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+import time
+from typing import List, NamedTuple, Tuple
+
+from ... import config
+
+
+class HighscoreEntry(NamedTuple):
+    score: int
+    width: int = None
+    height: int = None
+    # metadata of the game, None for entries which were converted from the legacy format
+    level: int = None
+    lines: int = None
+    duration: float = None  # playing time in seconds without pauses
+    timestamp: int = None  # seconds since the epoch when the game ended
+
+
+class _FileLock:
+    def __init__(self, path: Path):
+        """Inter process lock which is held as long as the lock file exists. Lock files which are
+        older than config.CADTRIS_SCORES_LOCK_TIMEOUT are treated as left over from a crashed
+        process and are removed.
+
+        Args:
+            path (Path): The path of the lock file.
+        """
+        self._path = path
+
+    def __enter__(self):
+        deadline = time.monotonic() + config.CADTRIS_SCORES_LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(self._path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                if time.monotonic() > deadline or self._is_stale():
+                    self._remove()
+                else:
+                    time.sleep(0.01)
+
+    def __exit__(self, *args):
+        self._remove()
+
+    def _is_stale(self) -> bool:
+        """Checks whether the lock file is older than the timeout.
+
+        Returns:
+            bool: True if the lock file is stale.
+        """
+        try:
+            age = time.time() - os.path.getmtime(self._path)
+        except OSError:
+            return False
+        return age > config.CADTRIS_SCORES_LOCK_TIMEOUT
+
+    def _remove(self):
+        """Removes the lock file if it exists."""
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+
+
+class Leaderboard:
+    def __init__(self):
+        """Entries of a single board ordered by descending score. The negated scores are kept in a
+        separate sorted list which serves as index for the rank queries."""
+        self._keys = []  # negated scores in ascending order
+        self._entries = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def scores(self) -> List[int]:
+        """All scores in descending order."""
+        return [-key for key in self._keys]
+
+    def rank(self, score: int) -> int:
+        """Returns the rank a new entry with the given score would get.
+
+        Args:
+            score (int): The score.
+
+        Returns:
+            int: The rank (starting at 0). Entries with the same score are ranked below the
+                existing ones.
+        """
+        return bisect.bisect_right(self._keys, -score)
+
+    def top(self, n: int) -> List[HighscoreEntry]:
+        """Returns the best entries.
+
+        Args:
+            n (int): The maximum number of entries.
+
+        Returns:
+            List[HighscoreEntry]: The best n entries ordered by descending score.
+        """
+        return self._entries[:n]
+
+    def insert(self, entry: HighscoreEntry) -> int:
+        """Adds an entry.
+
+        Args:
+            entry (HighscoreEntry): The entry to add.
+
+        Returns:
+            int: The rank of the added entry.
+        """
+        rank = self.rank(entry.score)
+        self._keys.insert(rank, -entry.score)
+        self._entries.insert(rank, entry)
+        return rank
+
+    def truncate(self, n: int) -> List[HighscoreEntry]:
+        """Removes all entries below the first n entries.
+
+        Args:
+            n (int): The number of entries to keep.
+
+        Returns:
+            List[HighscoreEntry]: The removed entries.
+        """
+        removed = self._entries[n:]
+        del self._keys[n:]
+        del self._entries[n:]
+        return removed
+
+
+def _entry_date(entry: HighscoreEntry) -> str:
+    """Returns the local date on which the game of the entry ended.
+
+    Args:
+        entry (HighscoreEntry): The entry.
+
+    Returns:
+        str: The date as "YYYY-MM-DD" or None if the entry has no timestamp.
+    """
+    if entry.timestamp is None:
+        return None
+    return time.strftime("%Y-%m-%d", time.localtime(entry.timestamp))
+
+
+class HighscoreStore:
+    _VERSION = 2
+
+    def __init__(self, path: Path = None):
+        """Cache of the saved highscores with one leaderboard per board size and per board size and
+        date. The file is read once when the scores are accessed the first time and only read
+        again right before adding a new entry, so that entries added by other Fusion instances in
+        the meantime are kept. The file is replaced atomically (written to a temporary file which
+        is renamed afterwards) while holding an inter process lock, so concurrent instances can not
+        corrupt it.
+        Files in the legacy format (a plain list of scores) are converted when written. As the
+        board size of these scores is unknown they are added to the board of the initial size
+        (config.CADTRIS_INITIAL_WIDTH, config.CADTRIS_INITIAL_HEIGHT), so they are still shown.
+
+        Args:
+            path (Path, optional): The path of the highscore file.
+                Defaults to None (config.CADTRIS_SCORES_PATH).
+        """
+        self._path = Path(path or config.CADTRIS_SCORES_PATH)
+        self._lock = threading.Lock()
+        self._boards = None  # {(width, height): Leaderboard}
+        self._daily_boards = None  # {(width, height, date): Leaderboard}
+
+    @property
+    def board_sizes(self) -> List[Tuple[int, int]]:
+        """The (width, height) of all boards which have entries."""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._boards.keys())
+
+    def leaderboard(self, width: int, height: int, date: str = None) -> Leaderboard:
+        """Returns the leaderboard of a board size. The returned leaderboard must not be modified.
+
+        Args:
+            width (int): The width of the board.
+            height (int): The height of the board.
+            date (str, optional): Only include games which ended on this date ("YYYY-MM-DD").
+                Defaults to None (all games).
+
+        Returns:
+            Leaderboard: The leaderboard, empty if there are no entries.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if date is None:
+                return self._boards.get((width, height), Leaderboard())
+            return self._daily_boards.get((width, height, date), Leaderboard())
+
+    def add(self, entry: HighscoreEntry) -> int:
+        """Adds an entry and saves the highscores. Only the best config.CADTRIS_MAX_SAVED_SCOES
+        entries of every board size are kept.
+
+        Args:
+            entry (HighscoreEntry): The entry to add.
+
+        Returns:
+            int: The rank (starting at 0) of the entry in the leaderboard of its board size.
+                Entries with the same score are ranked below the existing ones.
+        """
+        with self._lock:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            with _FileLock(self._path.with_name(self._path.name + ".lock")):
+                self._build_indexes(self._read(locked=True))
+                rank = self._insert(entry)
+                for removed in self._boards[(entry.width, entry.height)].truncate(
+                    config.CADTRIS_MAX_SAVED_SCOES
+                ):
+                    date_key = (removed.width, removed.height, _entry_date(removed))
+                    self._build_daily_board(date_key)
+                boards = self._boards.values()
+                self._write([e for board in boards for e in board.top(len(board))])
+        return rank
+
+    def _ensure_loaded(self):
+        """Reads the file if it has not been read yet."""
+        if self._boards is None:
+            self._build_indexes(self._read())
+
+    def _build_indexes(self, entries: List[HighscoreEntry]):
+        """Creates the leaderboards from entries which are sorted by descending score.
+
+        Args:
+            entries (List[HighscoreEntry]): The sorted entries.
+        """
+        self._boards = {}
+        self._daily_boards = {}
+        for entry in entries:
+            self._insert(entry)
+
+    def _insert(self, entry: HighscoreEntry) -> int:
+        """Adds an entry to its leaderboards.
+
+        Args:
+            entry (HighscoreEntry): The entry to add.
+
+        Returns:
+            int: The rank of the entry in the leaderboard of its board size.
+        """
+        key = (entry.width, entry.height)
+        rank = self._boards.setdefault(key, Leaderboard()).insert(entry)
+        date = _entry_date(entry)
+        if date is not None:
+            self._daily_boards.setdefault((*key, date), Leaderboard()).insert(entry)
+        return rank
+
+    def _build_daily_board(self, date_key: Tuple[int, int, str]):
+        """Recreates a daily leaderboard from the leaderboard of its board size, e.g. after entries
+        have been removed.
+
+        Args:
+            date_key (Tuple[int, int, str]): The width, height and date of the daily leaderboard.
+        """
+        if date_key[2] is None:
+            return
+        daily_board = Leaderboard()
+        board = self._boards[date_key[:2]]
+        for entry in board.top(len(board)):
+            if _entry_date(entry) == date_key[2]:
+                daily_board.insert(entry)
+        self._daily_boards[date_key] = daily_board
+
+    def _read(self, locked: bool = False) -> List[HighscoreEntry]:
+        """Reads the entries from the file.
+
+        An invalid file which is read while holding the file lock is renamed to
+        "<name>.<timestamp>.corrupt" so that it is not overwritten by the next write. Without the
+        lock the file might just be written by another instance, so it is left untouched.
+
+        Args:
+            locked (bool, optional): Whether the file lock is held. Defaults to False.
+
+        Raises:
+            OSError: If the file exists but can not be read.
+
+        Returns:
+            List[HighscoreEntry]: The sorted entries. Empty if the file does not exist or is
+                invalid.
+        """
+        try:
+            with open(self._path, encoding="utf-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return []
+
+        try:
+            data = json.loads(content)
+            if isinstance(data, list):  # legacy format
+                entries = [
+                    HighscoreEntry(
+                        score,
+                        config.CADTRIS_INITIAL_WIDTH,
+                        config.CADTRIS_INITIAL_HEIGHT,
+                    )
+                    for score in data
+                ]
+            else:
+                fields = data["fields"]
+                entries = [
+                    HighscoreEntry(**dict(zip(fields, values)))
+                    for values in data["entries"]
+                ]
+            entries.sort(key=lambda e: -e.score)
+        except (ValueError, TypeError, KeyError):
+            if not locked:
+                logging.getLogger(__name__).warning("Invalid highscore file.")
+                return []
+            corrupt_path = self._path.with_name(
+                f"{self._path.name}.{time.strftime('%Y%m%d%H%M%S')}.corrupt"
+            )
+            logging.getLogger(__name__).warning(
+                f"Invalid highscore file, moved to {corrupt_path}."
+            )
+            os.replace(self._path, corrupt_path)
+            return []
+        return entries
+
+    def _write(self, entries: List[HighscoreEntry]):
+        """Writes the entries to a temporary file in the same folder and replaces the highscore
+        file with it.
+
+        Args:
+            entries (List[HighscoreEntry]): The entries to write.
+        """
+        data = {
+            "version": self._VERSION,
+            "fields": HighscoreEntry._fields,
+            "entries": [list(entry) for entry in entries],
+        }
+        fd, temp_path = tempfile.mkstemp(
+            dir=self._path.parent, prefix=self._path.name, suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self._path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
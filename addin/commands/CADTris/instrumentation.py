@@ -0,0 +1,174 @@
+"""Low overhead timing of the stages of the game/display loop. Every stage has a histogram which
+keeps the most recent samples in a ring buffer. If config.CADTRIS_INSTRUMENTATION_ENABLED is False
+all timers are no-ops.
+"""
+
+from array import array
+import logging
+import time
+from typing import Dict, List
+
+from ... import config
+
+
+class TimingHistogram:
+    def __init__(self, size: int = None):
+        """Ring buffer of the most recent durations of a stage.
+
+        Args:
+            size (int, optional): The number of kept samples.
+                Defaults to None (config.CADTRIS_INSTRUMENTATION_SAMPLES).
+        """
+        self._samples = array(
+            "d", bytes(8 * (size or config.CADTRIS_INSTRUMENTATION_SAMPLES))
+        )
+        self._index = 0
+        # number of samples since the creation, including overwritten ones
+        self.count = 0
+        self.total = 0.0  # sum of all samples since the creation
+
+    def record(self, seconds: float):
+        """Adds a sample and overwrites the oldest sample if the buffer is full.
+
+        Args:
+            seconds (float): The duration in seconds.
+        """
+        self._samples[self._index] = seconds
+        self._index = (self._index + 1) % len(self._samples)
+        self.count += 1
+        self.total += seconds
+
+    def samples(self) -> List[float]:
+        """Returns the kept samples.
+
+        Returns:
+            List[float]: The kept samples in seconds in no particular order.
+        """
+        return self._samples.tolist()[: min(self.count, len(self._samples))]
+
+    def summary(self) -> Dict[str, float]:
+        """Calculates statistics over the kept samples.
+
+        Returns:
+            Dict[str, float]: The total count, the mean over all samples and the median, 95th
+                percentile and maximum of the kept samples in milliseconds.
+        """
+        samples = sorted(self.samples())
+        if not samples:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count * 1000,
+            "p50": samples[len(samples) // 2] * 1000,
+            "p95": samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000,
+            "max": samples[-1] * 1000,
+        }
+
+
+class _Timer:
+    def __init__(self, histogram: TimingHistogram):
+        """Context manager which records the time spent in its block.
+
+        Args:
+            histogram (TimingHistogram): The histogram which receives the duration.
+        """
+        self._histogram = histogram
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._histogram.record(time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+_histograms = {}  # {stage name: TimingHistogram}
+
+
+def histogram(stage: str) -> TimingHistogram:
+    """Returns the histogram of a stage and creates it if needed.
+
+    Args:
+        stage (str): The name of the stage.
+
+    Returns:
+        TimingHistogram: The histogram of the stage.
+    """
+    if stage not in _histograms:
+        _histograms[stage] = TimingHistogram()
+    return _histograms[stage]
+
+
+def timed(stage: str):
+    """Returns a context manager which records the duration of its block for the given stage.
+
+    Args:
+        stage (str): The name of the stage.
+
+    Returns:
+        The context manager.
+    """
+    if not config.CADTRIS_INSTRUMENTATION_ENABLED:
+        return _NULL_TIMER
+    return _Timer(histogram(stage))
+
+
+def record(stage: str, seconds: float):
+    """Records a duration which has been measured elsewhere.
+
+    Args:
+        stage (str): The name of the stage.
+        seconds (float): The duration in seconds.
+    """
+    if config.CADTRIS_INSTRUMENTATION_ENABLED:
+        histogram(stage).record(seconds)
+
+
+def summaries() -> Dict[str, Dict[str, float]]:
+    """Returns the statistics of all stages.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The statistics (see TimingHistogram.summary) by stage name.
+    """
+    return {stage: h.summary() for stage, h in sorted(_histograms.items())}
+
+
+def format_summaries() -> str:
+    """Formats the statistics of all stages as one line per stage.
+
+    Returns:
+        str: The formatted statistics.
+    """
+    return "\n".join(
+        f"{stage}: n={s['count']} mean={s['mean']:.2f}ms p50={s['p50']:.2f}ms "
+        + f"p95={s['p95']:.2f}ms max={s['max']:.2f}ms"
+        for stage, s in summaries().items()
+    )
+
+
+def dump(logger: logging.Logger = None):
+    """Writes the statistics of all stages to the log.
+
+    Args:
+        logger (logging.Logger, optional): The logger to use. Defaults to the logger of this module.
+    """
+    if not _histograms:
+        return
+    (logger or logging.getLogger(__name__)).info(
+        "Timings of the game loop:\n" + format_summaries()
+    )
+
+
+def reset():
+    """Removes all recorded samples."""
+    _histograms.clear()
@@ -1,12 +1,88 @@
-from collections import deque
 import random
-from typing import Dict, List, Tuple
-from copy import deepcopy
+from typing import Callable, Dict, List, NamedTuple, Tuple, FrozenSet
 import threading
+import collections
+import struct
 
-from ...libs.fusion_addin_framework import fusion_addin_framework as faf
 from ... import config
 from .ui import TetrisDisplay
+from .field import create_field, field_from_bytes
+from .clock import GameClock, RealTimeClock
+from . import instrumentation
+
+
+class Rotation(NamedTuple):
+    """A single precomputed orientation of a figure shape. The row masks contain one bitmask per
+    row of the bounding box (starting at the bottom row). Bit i of a mask is set if the cell at
+    x = bbox[0] + i is occupied.
+    """
+
+    coords: Tuple[Tuple[int, int], ...]
+    bbox: Tuple[int, int, int, int]  # (min_x, min_y, max_x, max_y)
+    row_masks: Tuple[int, ...]
+    # the lowest element of every occupied column ((x, min_y), ...)
+    column_bottoms: Tuple[Tuple[int, int], ...]
+
+
+def _create_rotation(coords: FrozenSet[Tuple[int, int]]) -> Rotation:
+    """Precomputes the bounding box and the row masks of a set of figure coordinates.
+
+    Args:
+        coords (FrozenSet[Tuple[int, int]]): The coordinates of the elements of the figure.
+
+    Returns:
+        Rotation: The precomputed rotation entry.
+    """
+    xs, ys = zip(*coords)
+    bbox = (min(xs), min(ys), max(xs), max(ys))
+    row_masks = tuple(
+        sum(1 << (x - bbox[0]) for x, y_c in coords if y_c == y)
+        for y in range(bbox[1], bbox[3] + 1)
+    )
+    column_bottoms = tuple(
+        (x, min(y for x_c, y in coords if x_c == x)) for x in sorted(set(xs))
+    )
+    return Rotation(tuple(sorted(coords)), bbox, row_masks, column_bottoms)
+
+
+class RandomGenerator:
+    _MASK = (1 << 64) - 1
+
+    def __init__(self, seed: int = None):
+        """Small seedable pseudo random number generator (splitmix64) which is used to create the figures.
+        Its whole state is a single 64 bit integer so it can be stored and restored cheaply and
+        games with the same seed create the same sequence of figures on every platform.
+
+        Args:
+            seed (int, optional): The seed of the generator. A random seed is used if None is given.
+                Defaults to None.
+        """
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.state = seed & self._MASK
+
+    def next_int(self) -> int:
+        """Advances the generator and returns the next 64 bit integer.
+
+        Returns:
+            int: A pseudo random integer in [0, 2**64).
+        """
+        self.state = (self.state + 0x9E3779B97F4A7C15) & self._MASK
+        z = self.state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & self._MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & self._MASK
+        return z ^ (z >> 31)
+
+    def randbelow(self, n: int) -> int:
+        """Returns a pseudo random integer in [0, n).
+
+        Args:
+            n (int): The exclusive upper bound.
+
+        Returns:
+            int: The random integer.
+        """
+        return (self.next_int() * n) >> 64
 
 
 class Figure:
@@ -19,53 +95,85 @@ class Figure:
     #     ------------------------> x
     #      0     1     2     3
 
-    I = deque([{(1, 3), (1, 2), (1, 1), (1, 0)}, {(0, 2), (1, 2), (2, 2), (3, 2)}])
-    Z = deque([{(2, 2), (2, 1), (1, 1), (1, 0)}, {(0, 1), (1, 1), (1, 0), (2, 0)}])
-    S = deque([{(1, 2), (1, 1), (2, 1), (2, 0)}, {(2, 1), (3, 1), (1, 0), (2, 0)}])
-    L = deque(
-        [
-            {(1, 2), (2, 2), (1, 1), (1, 0)},
-            {(0, 2), (0, 1), (1, 1), (2, 1)},
-            {(1, 2), (1, 1), (1, 0), (0, 0)},
-            {(0, 1), (1, 1), (2, 1), (2, 0)},
-        ]
+    I = (
+        frozenset({(1, 3), (1, 2), (1, 1), (1, 0)}),
+        frozenset({(0, 2), (1, 2), (2, 2), (3, 2)}),
     )
-    J = deque(
-        [
-            {(1, 2), (2, 2), (2, 1), (2, 0)},
-            {(1, 1), (2, 1), (3, 1), (1, 0)},
-            {(2, 2), (2, 1), (2, 0), (3, 0)},
-            {(3, 2), (1, 1), (2, 1), (3, 1)},
-        ]
+    Z = (
+        frozenset({(2, 2), (2, 1), (1, 1), (1, 0)}),
+        frozenset({(0, 1), (1, 1), (1, 0), (2, 0)}),
     )
-    T = deque(
-        [
-            {(1, 2), (1, 1), (2, 1), (1, 0)}, #1
-            {(1, 2), (0, 1), (1, 1), (2, 1)}, #2
-            {(1, 2), (0, 1), (1, 1), (1, 0)}, #3
-            {(0, 1), (1, 1), (2, 1), (1, 0)}, #4
-        ]
+    S = (
+        frozenset({(1, 2), (1, 1), (2, 1), (2, 0)}),
+        frozenset({(2, 1), (3, 1), (1, 0), (2, 0)}),
     )
-    O = deque([{(1, 1), (2, 1), (1, 0), (2, 0)}])
-    all_figures = [I, Z, S, L, J, T, O]
+    L = (
+        frozenset({(1, 2), (2, 2), (1, 1), (1, 0)}),
+        frozenset({(0, 2), (0, 1), (1, 1), (2, 1)}),
+        frozenset({(1, 2), (1, 1), (1, 0), (0, 0)}),
+        frozenset({(0, 1), (1, 1), (2, 1), (2, 0)}),
+    )
+    J = (
+        frozenset({(1, 2), (2, 2), (2, 1), (2, 0)}),
+        frozenset({(1, 1), (2, 1), (3, 1), (1, 0)}),
+        frozenset({(2, 2), (2, 1), (2, 0), (3, 0)}),
+        frozenset({(3, 2), (1, 1), (2, 1), (3, 1)}),
+    )
+    T = (
+        frozenset({(1, 2), (1, 1), (2, 1), (1, 0)}),  # 1
+        frozenset({(1, 2), (0, 1), (1, 1), (2, 1)}),  # 2
+        frozenset({(1, 2), (0, 1), (1, 1), (1, 0)}),  # 3
+        frozenset({(0, 1), (1, 1), (2, 1), (1, 0)}),  # 4
+    )
+    O = (frozenset({(1, 1), (2, 1), (1, 0), (2, 0)}),)
+    all_figures = (I, Z, S, L, J, T, O)
 
-    def __init__(self, x: int, y: int):
+    # immutable lookup table: rotations[shape_id][rotation_index]
+    rotations = tuple(
+        tuple(_create_rotation(coords) for coords in shape) for shape in all_figures
+    )
+
+    def __init__(self, x: int, y: int, rng: RandomGenerator):
         """Creates a figure instance with a random shape and color. The initial
         position of the figure coordinate system is set according to the x and y
-        values.
+        values. A figure is only described by its shape id, rotation index, position and color.
+        All geometric information is taken from the precomputed rotations table.
 
         Args:
             x (int): Initial x position of the figure.
             y (int): Initial x position of the figure.
+            rng (RandomGenerator): The generator used to choose the shape and the color.
         """
         self._x = x
         self._y = y
 
-        self._figure_coords = random.choice(self.all_figures)
-        # assert any([c[1] == 0 for c in self._figure_coords[0]])
-        self._actual_coords = None
-        self._update_actual_coords()
-        self._color_code = random.randint(1, len(config.CADTRIS_TETRONIMO_COLORS))
+        self._shape_id = rng.randbelow(len(self.rotations))
+        self._rotation_index = 0
+        self._color_code = 1 + rng.randbelow(len(config.CADTRIS_TETRONIMO_COLORS))
+
+    @classmethod
+    def restore(
+        cls, shape_id: int, rotation_index: int, x: int, y: int, color_code: int
+    ) -> "Figure":
+        """Creates a figure with the given properties without using a random generator.
+
+        Args:
+            shape_id (int): The index of the shape in the rotations table.
+            rotation_index (int): The index of the rotation of the shape.
+            x (int): The x position of the figure.
+            y (int): The y position of the figure.
+            color_code (int): The color code of the figure.
+
+        Returns:
+            Figure: The figure.
+        """
+        figure = cls.__new__(cls)
+        figure._x = x
+        figure._y = y
+        figure._shape_id = shape_id
+        figure._rotation_index = rotation_index
+        figure._color_code = color_code
+        return figure
 
     def serialize(self) -> Dict:
         """Creates a serialized version of the figure. This serialization contains
@@ -75,24 +183,46 @@ class Figure:
             Dict: The serialized game.
         """
         return {
-            "coordinates": deepcopy(self._actual_coords),
+            "coordinates": self.coords,
             "color_code": self._color_code,
         }
 
-    def _update_actual_coords(self):
-        self._actual_coords = [
-            (c[0] + self._x, c[1] + self._y) for c in self._figure_coords[0]
-        ]
+    @property
+    def shape_id(self) -> int:
+        """The index of the shape of the figure in the rotations table."""
+        return self._shape_id
+
+    @property
+    def rotation_index(self) -> int:
+        """The index of the current rotation of the shape in the rotations table."""
+        return self._rotation_index
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        """The position of the figure coordinate system in the field."""
+        return (self._x, self._y)
+
+    @property
+    def rotation(self) -> Rotation:
+        """The precomputed table entry of the current shape and rotation."""
+        return self.rotations[self._shape_id][self._rotation_index]
 
     @property
     def coords(self) -> List[Tuple[int]]:
         """Returns a list of all coordinates of the elements of the figure. The
         coordinates are relative to the nivenebt of figure and the initial coordinate.
+        The list is created on every call.
 
         Returns:
             List[Tuple[int]]: The coordinates of the elements of the figure.
         """
-        return self._actual_coords
+        return [(x + self._x, y + self._y) for x, y in self.rotation.coords]
+
+    @property
+    def mask_origin(self) -> Tuple[int, int]:
+        """The field coordinate of bit 0 of the first row mask of the current rotation."""
+        bbox = self.rotation.bbox
+        return (self._x + bbox[0], self._y + bbox[1])
 
     @property
     def color_code(self) -> int:
@@ -108,8 +238,9 @@ class Figure:
         Args:
             n (int): The number of 90 degree rotations.
         """
-        self._figure_coords.rotate(n)
-        self._update_actual_coords()
+        self._rotation_index = (self._rotation_index - n) % len(
+            self.rotations[self._shape_id]
+        )
 
     def move_vertical(self, n: int):
         """Moves the figure n steps in y direction.
@@ -118,7 +249,6 @@ class Figure:
             n (int): Number of steps to move the figure
         """
         self._y += n
-        self._update_actual_coords()
 
     def move_horizontal(self, n: int):
         """Moves the figure n steps in x direction.
@@ -127,7 +257,6 @@ class Figure:
             n (int): Number of steps to move the figure
         """
         self._x += n
-        self._update_actual_coords()
 
 
 # region
@@ -166,14 +295,46 @@ class Figure:
 class TetrisGame:
     # all public methods will update the display after they have executed
 
-    def __init__(self, display: TetrisDisplay):
+    # snapshot layout: version, width, height, state, allowed actions, rng state, score, lines,
+    # level, pieces, play time in ms, shape id (-1 if there is no figure), rotation index, x, y,
+    # color code followed by the packed field
+    _SNAPSHOT = struct.Struct("<BHHBBQIIHIIbBhhB")
+    _SNAPSHOT_VERSION = 1
+    _STATES = ("start", "running", "pause", "gameover", "terminated")
+    _ACTIONS = ("start", "pause", "reset", "move", "change")
+
+    def __init__(
+        self,
+        display: TetrisDisplay,
+        seed: int = None,
+        clock: GameClock = None,
+        recorder=None,
+        width: int = None,
+        height: int = None,
+    ):
         """Creates a game according to passed parameters. Sets the initial state to "start"
         and calls the displays upate function once.
 
         Args:
             display (TetrisDisplay): The display which controls how the game is visualized.
+            seed (int, optional): The seed for the sequence of figures. A random seed is used
+                if None is given. Defaults to None.
+            clock (GameClock, optional): The clock which drives the gravity. Use a VirtualClock
+                to control the time manually (or to only move down by calling tick).
+                Defaults to None (a RealTimeClock).
+            recorder (ReplayRecorder, optional): Recorder which gets all executed commands.
+                Defaults to None.
+            width (int, optional): The initial width of the field.
+                Defaults to None (config.CADTRIS_INITIAL_WIDTH).
+            height (int, optional): The initial height of the field.
+                Defaults to None (config.CADTRIS_INITIAL_HEIGHT).
+
+        Raises:
+            ValueError: If the width or the height is outside of the configured range.
         """
         self._display = display
+        self._rng = RandomGenerator(seed)
+        self._recorder = recorder
 
         assert (
             config.CADTRIS_MIN_HEIGHT
@@ -186,124 +347,244 @@ class TetrisGame:
             <= config.CADTRIS_MAX_WIDTH
         )
         # we set the inital height by the config but it might chamge later due to user input
-        self._height = config.CADTRIS_INITIAL_HEIGHT
-        self._width = config.CADTRIS_INITIAL_WIDTH
+        self._height = config.CADTRIS_INITIAL_HEIGHT if height is None else height
+        self._width = config.CADTRIS_INITIAL_WIDTH if width is None else width
+        if not config.CADTRIS_MIN_WIDTH <= self._width <= config.CADTRIS_MAX_WIDTH:
+            raise ValueError(f"Invalid width {self._width}.")
+        if not config.CADTRIS_MIN_HEIGHT <= self._height <= config.CADTRIS_MAX_HEIGHT:
+            raise ValueError(f"Invalid height {self._height}.")
 
         self._active_figure = None
-        self._field = {}  # {(x,y):color_code} x=[0...width-1] y=[0...height-1]
-        self._go_down_scheduler = faf.utils.PeriodicExecuter(
-            1 / config.CADTRIS_MIN_SPEED,
-            lambda: self._move_vertical(-1),
-            # True # do not set this as it might lead to unstable behaviour (for unknown reason)
-        )
+        self._field = None
+        self._field_reset = False
+        self._reset_field()
+        self._clock = clock if clock is not None else RealTimeClock()
+        self._clock.interval = 1 / config.CADTRIS_MIN_SPEED
+        self._clock.attach(self.tick)
+        if self._recorder is not None:
+            self._recorder.begin(
+                self._rng.state, self._width, self._height, self._clock.now()
+            )
+        # the thread which holds the action lock processes the command queue
         self._action_lock = threading.Lock()
+        # appending and popping are atomic so inputs can be queued without taking the lock
+        self._commands = collections.deque()
 
         self._state = None  # "start" "running" "pause", "gameover"
+        self._play_time = 0.0  # seconds in the running state without the current period
+        self._running_since = None  # clock time when the running state was entered
         self._allowed_actions = None  # "start" "pause" "reset" "move" "change"
         self._set_state("start")
 
         self._score = None
         self._lines = None
         self._level = None
+        self._pieces = None
         self._reset_scores()
 
+        # the values which have been passed to the display in the last update
+        self._published_scalars = {}
+        self._published_figure = None
+        self._published_ghost = None
+
         self._update_display()
 
-    def _serialize(self) -> Dict:
-        """Creates a serialized version of the current game state. This serialization contains
-        only primitive datatype but contains all information to visualize the game or rebuild it.
-        All containers are deepcopied to avoid a manipulation of the game state from "outside".
+    @property
+    def state(self) -> str:
+        """The current state of the game. One of {"start", "running", "pause", "gameover", "terminated"}."""
+        return self._state
+
+    @property
+    def score(self) -> int:
+        """The score achieved in the current game."""
+        return self._score
+
+    @property
+    def lines(self) -> int:
+        """The number of lines cleared in the current game."""
+        return self._lines
+
+    @property
+    def level(self) -> int:
+        """The current level of the game."""
+        return self._level
+
+    @property
+    def pieces(self) -> int:
+        """The number of figures which have been placed in the field in the current game."""
+        return self._pieces
+
+    def _serialize_scalars(self) -> Dict:
+        """Creates a dictionary with all game attributes which are neither the field nor the figure.
 
         Returns:
-            Dict: The serialized game.
+            Dict: The scalar attributes of the game.
         """
         return {
             "height": self._height,
             "width": self._width,
-            "field": deepcopy(self._field),
             "state": self._state,
             "allowed_actions": self._allowed_actions,
-            "figure": self._active_figure.serialize()
-            if self._active_figure is not None
-            else None,
             "lines": self._lines,
             "score": self._score,
             "level": self._level,
+            "duration": self._play_time,
         }
 
-    def _update_display(self):
-        """Calls the update function of the display with the serialized game."""
-        self._display.update(self._serialize())
+    def _serialize(self) -> Dict:
+        """Creates a serialized version of the current game state. This serialization contains
+        only primitive datatype but contains all information to visualize the game or rebuild it.
+        All containers are copied to avoid a manipulation of the game state from "outside".
 
-    def _intersects(self) -> bool:
-        """Returns whether the _activae_figure intersects with the frame, a other tetromino or is
-        below the bottom.
+        Returns:
+            Dict: The serialized game.
+        """
+        with instrumentation.timed("serialize"):
+            return {
+                **self._serialize_scalars(),
+                "field": self._field.to_dict(),
+                "figure": self._active_figure.serialize()
+                if self._active_figure is not None
+                else None,
+                "ghost": self._serialize_ghost(),
+            }
+
+    def _serialize_ghost(self) -> List[Tuple[int, int]]:
+        """Returns the coordinates the active figure would occupy if it was dropped now.
 
         Returns:
-            bool: True if intersects, False if valid position.
+            List[Tuple[int, int]]: The coordinates of the ghost figure or None if there is no active figure.
         """
-        for x, y in self._active_figure.coords:
-            if x >= self._width or x < 0 or y < 0 or (x, y) in self._field:
-                return True
-        return False
+        if self._active_figure is None:
+            return None
+        dy = self._landing_y() - self._active_figure.position[1]
+        return [(x, y + dy) for x, y in self._active_figure.coords]
 
-    def _full_row(self, y: int) -> bool:
-        """Gets if all fields in the line y are occupied by blocks.
+    def _serialize_changes(self) -> Dict:
+        """Creates a compact description of everything that changed since the last display update.
+        The description contains the changed scalar attributes, the changed cells of the field and
+        the old and new figure. Only primitive datatypes are used and nothing is shared with the game.
 
-        Args:
-            y (int): The y coordinate of the line to check.
+        Returns:
+            Dict: The changes as {"scalars": {name: value}, "field_reset": bool,
+                "cells": {(x,y): color_code or None}, "cleared_rows": [[y, ...], ...],
+                "figure": (old, new) or None if unchanged, "ghost": (old, new) or None if unchanged}.
+                The cleared rows contain the rows removed by every collapse (see
+                Field.take_cleared_rows), the changed cells already include their effect.
+        """
+        scalars = self._serialize_scalars()
+        changed_scalars = {
+            k: v
+            for k, v in scalars.items()
+            if k not in self._published_scalars or self._published_scalars[k] != v
+        }
+        self._published_scalars = scalars
+
+        figure = (
+            self._active_figure.serialize() if self._active_figure is not None else None
+        )
+        figure_change = None
+        if figure != self._published_figure:
+            figure_change = (self._published_figure, figure)
+        self._published_figure = figure
+
+        ghost = self._serialize_ghost()
+        ghost_change = None
+        if ghost != self._published_ghost:
+            ghost_change = (self._published_ghost, ghost)
+        self._published_ghost = ghost
+
+        changes = {
+            "scalars": changed_scalars,
+            "field_reset": self._field_reset,
+            "cells": self._field.take_changes(),
+            "cleared_rows": self._field.take_cleared_rows(),
+            "figure": figure_change,
+            "ghost": ghost_change,
+        }
+        self._field_reset = False
+        return changes
+
+    def _duration(self) -> float:
+        """Returns the time the game has been in the running state including the current period.
 
         Returns:
-            bool: Wheteher the line is fully occupied.
+            float: The playing time in seconds.
+        """
+        if self._state == "running":
+            return self._play_time + self._clock.now() - self._running_since
+        return self._play_time
+
+    def _update_display(self):
+        """Passes the changes since the last update to the display. The full serialized game is
+        only created if the display demands it.
         """
-        return all((x, y) in self._field for x in range(self._width))
+        with instrumentation.timed("serialize_changes"):
+            changes = self._serialize_changes()
+        self._display.apply_changes(changes, self._serialize)
 
-    def _remove_row(self, y: int) -> None:
-        """Removes all elements of the given row by popping the coords from the field_dict.
+    def _intersects(self) -> bool:
+        """Returns whether the _activae_figure intersects with the frame, a other tetromino or is
+        below the bottom.
 
-        Args:
-            y (int): The y coorinate of the row to remove.
+        Returns:
+            bool: True if intersects, False if valid position.
         """
-        for p in set(self._field.keys()):
-            if p[1] == y:
-                self._field.pop(p)
+        return self._field.intersects_masks(
+            self._active_figure.rotation.row_masks, *self._active_figure.mask_origin
+        )
 
-    def _lower_rows_above(self, y: int) -> None:
-        """Lowers the y coordinate of all filed coordinates by 1 if their y coordiante is
-        above the given y.
+    def _landing_y(self) -> int:
+        """Calculates the y position in which the active figure would freeze if it was dropped.
+        As long as the figure is above all occupied cells of its columns this is done directly from the
+        column heights of the field. Otherwise (the figure has been moved below an overhang) the
+        figure is moved down step by step.
 
-        Args:
-            y (int): The y coordiante above which all other coordiantes get lowered.
+        Returns:
+            int: The y position of the figure after dropping it.
         """
-        new_field = {}
-        for (x_new, y_new), c in self._field.items():  # lower all points above
-            if y_new > y:
-                new_coords = (x_new, y_new - 1)
-            else:
-                new_coords = (x_new, y_new)
-            new_field[new_coords] = c
-        self._field = new_field
+        figure = self._active_figure
+        x, y = figure.position
+        column_height = self._field.column_height
+        landing_y = max(
+            column_height(x + dx) - dy for dx, dy in figure.rotation.column_bottoms
+        )
+        if landing_y <= y:
+            return landing_y
+
+        figure.move_vertical(-1)
+        while not self._intersects():
+            figure.move_vertical(-1)
+        landing_y = figure.position[1] + 1
+        figure.move_vertical(y - figure.position[1])
+        return landing_y
+
+    def _reset_field(self):
+        """Replaces the field with an empty field of the current size."""
+        self._field = create_field(self._width, self._height)
+        self._field_reset = True
 
     def _add_figure_to_field(self):
         """Adds the elements of the active_figure to the field and sets the active figure to None."""
-        for p in self._active_figure.coords:
-            self._field[p] = self._active_figure.color_code
+        self._field.add(self._active_figure.coords, self._active_figure.color_code)
         self._active_figure = None
 
     def _new_figure(self):
         """Creates a mew figure at the initial top middle position"""
-        self._active_figure = Figure(self._width // 2 - 1, self._height)
-        self._go_down_scheduler.reset()
+        self._active_figure = Figure(self._width // 2 - 1, self._height, self._rng)
+        self._clock.reset()
 
     def _reset_scores(self):
-        """Resets all score related attributes and also resets the interval for the go down timer."""
+        """Resets all score related attributes and also resets the interval for the clock."""
         self._score = 0
         self._level = 1
         self._lines = 0
-        self._go_down_scheduler.interval = 1 / config.CADTRIS_MIN_SPEED
+        self._pieces = 0
+        self._play_time = 0.0
+        self._clock.interval = 1 / config.CADTRIS_MIN_SPEED
 
     def _update_score(self, broken_lines: int):
-        """Updates all score related attributes (lines, score, level) and also updates the go down
+        """Updates all score related attributes (lines, score, level) and also updates the gravity
         interval accordignaly. Should be executed after lines were collapsed.
 
         Args:
@@ -315,7 +596,7 @@ class TetrisGame:
             self._lines // config.CADTRIS_LINES_PER_LEVEL + 1,
             config.CADTRIS_MAX_LEVEL,
         )
-        self._go_down_scheduler.interval = 1 / (
+        self._clock.interval = 1 / (
             config.CADTRIS_MIN_SPEED
             + (config.CADTRIS_MAX_SPEED - config.CADTRIS_MIN_SPEED)
             * ((self._level - 1) / (config.CADTRIS_MAX_LEVEL - 1))
@@ -329,24 +610,22 @@ class TetrisGame:
         Returns:
             int: How many rows got destroyed due to the location of the figure.
         """
+        # only the rows of the figure can have been completed
+        figure_rows = {y for _, y in self._active_figure.coords}
         self._add_figure_to_field()
+        self._pieces += 1
 
-        broken_lines = 0
-
-        for y in range(self._height - 1, -1, -1):  # from top to botton
-            if self._full_row(y):
-                self._remove_row(y)
-                self._lower_rows_above(y)
-                broken_lines += 1
+        full_rows = self._field.full_rows(figure_rows)
+        self._field.collapse_rows(full_rows)
 
-        self._update_score(broken_lines)
+        self._update_score(len(full_rows))
 
         self._new_figure()
         if self._intersects():
             self._set_state("gameover")
 
     def _set_state(self, new_state: str):
-        """Sets the game state to the passed value and sets the go down scheduler accordingly.
+        """Sets the game state to the passed value and sets the clock accordingly.
         Also does everything else whihc is needed in a game state change.
         The main idea of this function is to have a single place where all allowed actions are defined
         for each state.
@@ -359,43 +638,122 @@ class TetrisGame:
         Raises:
             ValueError: If the passed new state is no valid name of a game state.
         """
+        if self._state == "running" and new_state != "running":
+            self._play_time += self._clock.now() - self._running_since
+
         if new_state == "pause":
-            self._go_down_scheduler.pause()
+            self._clock.pause()
             self._allowed_actions = ("start", "reset")
         elif new_state == "running":
             if self._state == "start":
                 assert self._active_figure is None
                 self._new_figure()
-            self._go_down_scheduler.start()
+            self._clock.start()
+            self._running_since = self._clock.now()
             self._allowed_actions = ("pause", "reset", "move")
         elif new_state == "start":
             self._active_figure = None
-            self._field = {}
-            self._go_down_scheduler.pause()
-            self._go_down_scheduler.reset()
+            self._reset_field()
+            self._clock.pause()
+            self._clock.reset()
             self._reset_scores()
             self._allowed_actions = ("start", "change")
         elif new_state == "gameover":
             self._active_figure = None
-            self._go_down_scheduler.pause()
+            self._clock.pause()
             self._allowed_actions = ("reset",)
         elif new_state == "terminated":
-            self._go_down_scheduler.pause()
+            self._clock.pause()
             self._allowed_actions = ()
         else:
             raise ValueError("Invalid state.")
         self._state = new_state
 
+    def _submit(self, required_action: str, method: Callable, *args):
+        """Adds a command to the command queue and processes the queue if no other thread is
+        currently doing so. Otherwise the command gets executed by the thread which is currently
+        processing the queue and this method returns immediately.
+        While the queue holds config.CADTRIS_COMMAND_QUEUE_SIZE commands, new moves and rotations
+        of the player are rejected. State changes and gravity ticks are always queued.
+
+        Args:
+            required_action (str): The action which must be allowed in the game state at the time
+                the command is executed. Otherwise the command is ignored.
+            method (Callable): The method which executes the command.
+            *args: The arguments passed to the method.
+        """
+        if (
+            required_action == "move"
+            and method != self._tick
+            and len(self._commands) >= config.CADTRIS_COMMAND_QUEUE_SIZE
+        ):
+            return
+        self._commands.append((required_action, method, args))
+        self._process_commands()
+
+    def _process_commands(self):
+        """Executes all queued commands in batches. Only the thread which owns the action lock
+        processes the queue, all other threads return immediately. The display is updated once per
+        batch and additionally after every state change so that no state transition (e.g. gameover)
+        gets lost. After releasing the lock the queue is checked again so that commands which were
+        added in the meantime are not left behind.
+        """
+        while self._commands:
+            if not self._action_lock.acquire(blocking=False):
+                return
+            try:
+                with instrumentation.timed("action_lock"):
+                    self._process_batch()
+            finally:
+                self._action_lock.release()
+
+    def _process_batch(self):
+        """Executes the queued commands until the queue is empty. Must only be called by the owner
+        of the action lock.
+        """
+        outdated = False  # whether the display misses executed commands
+        while self._commands:
+            required_action, method, args = self._commands.popleft()
+            if required_action not in self._allowed_actions:
+                continue
+            if method == self._move_horizontal:
+                args = (self._fold_horizontal_moves(args[0]),)
+            if self._recorder is not None:
+                self._recorder.record(self._clock.now(), method.__name__, args)
+            state = self._state
+            method(*args)
+            outdated = True
+            if self._state != state:
+                self._update_display()
+                outdated = False
+        if outdated:
+            self._update_display()
+
+    def _fold_horizontal_moves(self, n: int) -> int:
+        """Removes all directly following horizontal moves in the same direction from the command
+        queue and adds their steps to n. Must only be called by the owner of the action lock.
+
+        Args:
+            n (int): The steps of the current horizontal move.
+
+        Returns:
+            int: The total steps of the folded moves.
+        """
+        while self._commands:
+            _, method, args = self._commands[0]
+            if method != self._move_horizontal or (args[0] > 0) != (n > 0):
+                break
+            self._commands.popleft()
+            n += args[0]
+        return n
+
     def start(self):
         """Starts or continues the game when the game state is either "start" or "pause".
         Otherwise nothing happens.
         This sets the gamestate to running.
         Updates the dsiplay.
         """
-        with self._action_lock:
-            if "start" in self._allowed_actions:
-                self._set_state("running")
-                self._update_display()
+        self._submit("start", self._set_state, "running")
 
     def pause(self):
         """Pauses the gane if its currently in state "running".
@@ -403,10 +761,7 @@ class TetrisGame:
         Sets the gamestate to pause.
         Updates the dsiplay.
         """
-        with self._action_lock:
-            if "pause" in self._allowed_actions:
-                self._set_state("pause")
-                self._update_display()
+        self._submit("pause", self._set_state, "pause")
 
     def reset(self):
         """Resets the game (independent on its state).
@@ -414,17 +769,143 @@ class TetrisGame:
         Sets the gamestate to "start".
         Updates the dsiplay.
         """
-        with self._action_lock:
-            if "reset" in self._allowed_actions:
-                self._set_state("start")
-                self._update_display()
+        self._submit("reset", self._set_state, "start")
 
     def terminate(self):
         """Ultimately terminates the game. ITs not possible to do anything after the game has been terminated.
-        A game can always get terminated. No screen update is executed. Stops the go down scheduler.
+        A game can always get terminated. No screen update is executed. Stops the clock.
+        Queued commands are discarded.
         """
         with self._action_lock:
+            self._commands.clear()
             self._set_state("terminated")
+        # the clock thread might wait for the action lock so it must not be held while stopping
+        self._clock.stop()
+
+    def snapshot(self) -> bytes:
+        """Creates a compact binary representation of the complete game state (field, figure,
+        random generator, scores and game state) which can be passed to restore.
+
+        Returns:
+            bytes: The snapshot.
+        """
+        with self._action_lock:
+            snapshot = self._snapshot()
+        # execute the commands which were queued while the lock was held
+        self._process_commands()
+        return snapshot
+
+    def _snapshot(self) -> bytes:
+        """Creates the snapshot. Must only be called by the owner of the action lock.
+
+        Returns:
+            bytes: The snapshot.
+        """
+        figure = self._active_figure
+        return (
+            self._SNAPSHOT.pack(
+                self._SNAPSHOT_VERSION,
+                self._width,
+                self._height,
+                self._STATES.index(self._state),
+                sum(
+                    1 << i
+                    for i, action in enumerate(self._ACTIONS)
+                    if action in self._allowed_actions
+                ),
+                self._rng.state,
+                self._score,
+                self._lines,
+                self._level,
+                self._pieces,
+                round(self._duration() * 1000),
+                figure.shape_id if figure is not None else -1,
+                figure.rotation_index if figure is not None else 0,
+                *(figure.position if figure is not None else (0, 0)),
+                figure.color_code if figure is not None else 0,
+            )
+            + self._field.to_bytes()
+        )
+
+    def restore(self, snapshot: bytes):
+        """Sets the game to the state of the snapshot. Queued commands which were not executed yet
+        are applied afterwards. Updates the display with the complete game.
+        Recorded games can not be restored as the replay log would not contain the jump.
+
+        Args:
+            snapshot (bytes): The snapshot created by snapshot.
+
+        Raises:
+            ValueError: If the snapshot is invalid or the game is recorded.
+        """
+        if self._recorder is not None:
+            raise ValueError("Invalid restore, the game is recorded.")
+        with self._action_lock:
+            self._restore(snapshot)
+            self._update_display()
+        self._process_commands()
+
+    def _restore(self, snapshot: bytes):
+        """Restores the snapshot. Must only be called by the owner of the action lock.
+
+        Args:
+            snapshot (bytes): The snapshot created by snapshot.
+
+        Raises:
+            ValueError: If the snapshot is invalid.
+        """
+        if len(snapshot) < self._SNAPSHOT.size:
+            raise ValueError("Invalid snapshot.")
+        (
+            version,
+            width,
+            height,
+            state_index,
+            allowed_actions,
+            rng_state,
+            score,
+            lines,
+            level,
+            pieces,
+            play_time,
+            shape_id,
+            rotation_index,
+            x,
+            y,
+            color_code,
+        ) = self._SNAPSHOT.unpack_from(snapshot)
+        if version != self._SNAPSHOT_VERSION or state_index >= len(self._STATES):
+            raise ValueError("Invalid snapshot.")
+
+        self._field = field_from_bytes(width, height, snapshot[self._SNAPSHOT.size :])
+        self._field_reset = True
+        self._width = width
+        self._height = height
+        self._active_figure = (
+            Figure.restore(shape_id, rotation_index, x, y, color_code)
+            if shape_id >= 0
+            else None
+        )
+        self._rng.state = rng_state
+        self._state = self._STATES[state_index]
+        self._allowed_actions = tuple(
+            action
+            for i, action in enumerate(self._ACTIONS)
+            if allowed_actions >> i & 1
+        )
+        self._lines = lines
+        # sets the interval of the clock according to the lines
+        self._update_score(0)
+        self._score = score
+        self._level = level
+        self._pieces = pieces
+        self._play_time = play_time / 1000
+        if self._state == "running":
+            self._clock.reset()
+            self._clock.start()
+            self._running_since = self._clock.now()
+        else:
+            self._clock.pause()
 
     def _move_vertical(self, n):
         """Moves the active figure n steps vertically and executes all resulting
@@ -433,13 +914,40 @@ class TetrisGame:
         Args:
             n (int): The direction and number of steps to move.
         """
-        with self._action_lock:
-            if "move" in self._allowed_actions:
-                self._active_figure.move_vertical(n)
-                if self._intersects():
-                    self._active_figure.move_vertical(-n)
-                    self._freeze()
-                self._update_display()
+        self._submit("move", self._step_vertical, n)
+
+    def _step_vertical(self, n):
+        """Moves the active figure n steps vertically and freezes it if it can not be moved.
+
+        Args:
+            n (int): The direction and number of steps to move.
+        """
+        self._active_figure.move_vertical(n)
+        if self._intersects():
+            self._active_figure.move_vertical(-n)
+            self._freeze()
+
+    def tick(self, n: int = 1):
+        """Executes n gravity steps, i.e. moves the active figure down n times and executes all
+        resulting game/field effects. Is called by the clock and can be called directly to drive the game manually.
+        Is only executed when gamestate is "running".
+        Updates the display once after all steps.
+
+        Args:
+            n (int, optional): The number of gravity steps. Defaults to 1.
+        """
+        self._submit("move", self._tick, n)
+
+    def _tick(self, n: int):
+        """Executes n gravity steps as long as the game is running.
+
+        Args:
+            n (int): The number of gravity steps.
+        """
+        for _ in range(n):
+            if "move" not in self._allowed_actions:
+                break
+            self._step_vertical(-1)
 
     def drop(self):
         """Moves the active figure to as low as possible and executes all resulting
@@ -447,24 +955,40 @@ class TetrisGame:
         Is only executed when gamestate is "running".
         Updates the dsiplay.
         """
-        with self._action_lock:
-            if "move" in self._allowed_actions:
-                while not self._intersects():
-                    self._active_figure.move_vertical(-1)
-                self._active_figure.move_vertical(1)
-                self._freeze()
-                self._update_display()
+        self._submit("move", self._drop)
+
+    def _drop(self):
+        """Moves the active figure to its landing position and freezes it."""
+        self._active_figure.move_vertical(
+            self._landing_y() - self._active_figure.position[1]
+        )
+        self._freeze()
 
     def _move_horizontal(self, n):
         """Moves the active figure n steps horizontally and executes all resulting
         game/field effects. N>0 --> right, n<0 --> left.
+        The figure is moved step by step and stops in front of the first obstacle.
 
         Args:
             n (int): The direction and number of steps to move.
         """
-        self._active_figure.move_horizontal(n)
-        if self._intersects():
-            self._active_figure.move_horizontal(-n)
+        step = 1 if n > 0 else -1
+        for _ in range(abs(n)):
+            self._active_figure.move_horizontal(step)
+            if self._intersects():
+                self._active_figure.move_horizontal(-step)
+                break
+
+    def move_horizontal(self, n: int):
+        """Moves the active figure n steps horizontally and executes all resulting
+        game/field effects. N>0 --> right, n<0 --> left.
+        Is only executed when gamestate is "running".
+        Updates the dsiplay.
+
+        Args:
+            n (int): The direction and number of steps to move.
+        """
+        self._submit("move", self._move_horizontal, n)
 
     def move_right(self):
         """Moves the active figure horizontally to the right and executes all resulting
@@ -472,10 +996,7 @@ class TetrisGame:
         Is only executed when gamestate is "running".
         Updates the dsiplay.
         """
-        with self._action_lock:
-            if "move" in self._allowed_actions:
-                self._move_horizontal(1)
-                self._update_display()
+        self._submit("move", self._move_horizontal, 1)
 
     def move_left(self):
         """Moves the active figure horizontally to the right left executes all resulting
@@ -483,10 +1004,7 @@ class TetrisGame:
         Is only executed when gamestate is "running".
         Updates the dsiplay.
         """
-        with self._action_lock:
-            if "move" in self._allowed_actions:
-                self._move_horizontal(-1)
-                self._update_display()
+        self._submit("move", self._move_horizontal, -1)
 
     def _rotate(self, n: int):
         """Rotates the active figure n times when the filed is free.
@@ -503,20 +1021,14 @@ class TetrisGame:
         Is only executed when gamestate is "running".
         Updates the dsiplay.
         """
-        with self._action_lock:
-            if "move" in self._allowed_actions:
-                self._rotate(1)
-                self._update_display()
+        self._submit("move", self._rotate, 1)
 
     def rotate_left(self):
         """Rotates the figure by 90 degrees counterclockwise if the field is free.
         Is only executed when gamestate is "running".
         Updates the dsiplay.
         """
-        with self._action_lock:
-            if "move" in self._allowed_actions:
-                self._rotate(-1)
-                self._update_display()
+        self._submit("move", self._rotate, -1)
 
     def set_width(self, new_width: int):
         """Sets the width of the game. This can only be done in the start state.
@@ -525,11 +1037,17 @@ class TetrisGame:
         Args:
             new_width (int): The new width to set.
         """
-        with self._action_lock:
-            if "change" in self._allowed_actions:
-                if config.CADTRIS_MIN_WIDTH <= new_width <= config.CADTRIS_MAX_WIDTH:
-                    self._width = new_width
-                    self._update_display()
+        self._submit("change", self._set_width, new_width)
+
+    def _set_width(self, new_width: int):
+        """Sets the width and resets the field if the width is in the configured range.
+
+        Args:
+            new_width (int): The new width to set.
+        """
+        if config.CADTRIS_MIN_WIDTH <= new_width <= config.CADTRIS_MAX_WIDTH:
+            self._width = new_width
+            self._reset_field()
 
     def set_height(self, new_height: int):
         """Sets the height of the game. This can only be done in the start state.
@@ -538,8 +1056,14 @@ class TetrisGame:
         Args:
             new_height (int): The new height to set.
         """
-        with self._action_lock:
-            if "change" in self._allowed_actions:
-                if config.CADTRIS_MIN_HEIGHT <= new_height <= config.CADTRIS_MAX_HEIGHT:
-                    self._height = new_height
-                    self._update_display()
+        self._submit("change", self._set_height, new_height)
+
+    def _set_height(self, new_height: int):
+        """Sets the height and resets the field if the height is in the configured range.
+
+        Args:
+            new_height (int): The new height to set.
+        """
+        if config.CADTRIS_MIN_HEIGHT <= new_height <= config.CADTRIS_MAX_HEIGHT:
+            self._height = new_height
+            self._reset_field()
@@ -0,0 +1,246 @@
+"""Display of groups of voxels as merged bodies. Instead of creating a body for every voxel, all
+voxels of a group which share the same color are unified into a single body by using the
+TemporaryBRepManager. Neighboring voxels in a line are created as a single box before they get
+unified so only a few boolean operations are needed per body.
+"""
+
+from typing import Dict, Hashable, List, Tuple
+
+import adsk.core, adsk.fusion  # pylint:disable=import-error
+
+
+def _runs(coords: List[Tuple[int, int, int]], axis: int) -> List[Tuple[Tuple, int]]:
+    """Combines voxels which are direct neighbors along the given axis.
+
+    Args:
+        coords (List[Tuple[int, int, int]]): The voxel coordinates.
+        axis (int): The axis along which the voxels are combined (0, 1 or 2).
+
+    Returns:
+        List[Tuple[Tuple, int]]: The first voxel coordinate and the length of every run.
+    """
+    runs = []
+    for coord in sorted(coords, key=lambda c: (*c[:axis], *c[axis + 1 :], c[axis])):
+        if runs:
+            start, length = runs[-1]
+            expected = (*start[:axis], start[axis] + length, *start[axis + 1 :])
+            if coord == expected:
+                runs[-1] = (start, length + 1)
+                continue
+        runs.append((coord, 1))
+    return runs
+
+
+def create_temporary_body(
+    coords: List[Tuple[int, int, int]],
+    grid_size: float,
+    offset: Tuple[float, float, float] = (0, 0, 0),
+) -> adsk.fusion.BRepBody:
+    """Creates a temporary body which consists of the given voxels (see MergedBodyWorld for
+    their placement). Voxels in a line are created as a single box along the axis which needs the
+    fewest boxes.
+
+    Args:
+        coords (List[Tuple[int, int, int]]): The voxel coordinates.
+        grid_size (float): The side length of a voxel.
+        offset (Tuple[float, float, float], optional): The offset of the voxels in voxels.
+            Defaults to (0, 0, 0).
+
+    Returns:
+        adsk.fusion.BRepBody: The temporary body.
+    """
+    manager = adsk.fusion.TemporaryBRepManager.get()
+    axis, runs = min(
+        ((axis, _runs(coords, axis)) for axis in range(3)),
+        key=lambda axis_runs: len(axis_runs[1]),
+    )
+
+    body = None
+    for start, length in runs:
+        size = [grid_size] * 3
+        size[axis] = grid_size * length
+        center = [(start[i] + offset[i]) * grid_size for i in range(3)]
+        center[axis] += (length - 1) * grid_size / 2
+        box = manager.createBox(
+            adsk.core.OrientedBoundingBox3D.create(
+                adsk.core.Point3D.create(*center),
+                adsk.core.Vector3D.create(1, 0, 0),
+                adsk.core.Vector3D.create(0, 1, 0),
+                *size,
+            )
+        )
+        if body is None:
+            body = box
+        else:
+            manager.booleanOperation(
+                body, box, adsk.fusion.BooleanTypes.UnionBooleanType
+            )
+    return body
+
+
+def get_appearance(
+    design: adsk.fusion.Design,
+    appearance_id: str,
+    color: Tuple[int, int, int, int],
+) -> adsk.core.Appearance:
+    """Returns the appearance for bodies of the given color. Colored appearances are created as
+    copies of the library appearance in the design and are reused.
+
+    Args:
+        design (adsk.fusion.Design): The design which contains the bodies.
+        appearance_id (str): The id of the library appearance.
+        color (Tuple[int, int, int, int]): The rgbo tuple or None to use the library
+            appearance as it is.
+
+    Returns:
+        adsk.core.Appearance: The appearance.
+    """
+    app = adsk.core.Application.get()
+    base = None
+    for library in app.materialLibraries:
+        base = library.appearances.itemById(appearance_id)
+        if base is not None:
+            break
+
+    if color is None:
+        return base
+
+    name = f"CADTris {appearance_id} {'_'.join(str(c) for c in color)}"
+    appearance = design.appearances.itemByName(name)
+    if appearance is None:
+        appearance = design.appearances.addByCopy(base, name)
+        color_property = adsk.core.ColorProperty.cast(
+            appearance.appearanceProperties.itemById("opaque_albedo")
+        )
+        if color_property is not None:
+            color_property.value = adsk.core.Color.create(*color)
+    return appearance
+
+
+class MergedBodyWorld:
+    def __init__(
+        self,
+        grid_size: float,
+        component: adsk.fusion.Component,
+        offset: Tuple[float, float, float] = (0, 0, 0),
+    ):
+        """Shows groups of voxels as one body per group and color. A group can be any set of
+        voxels which is updated together, e.g. a row of the game. Voxels use the same placement
+        as in the voxel world: the voxel (x,y,z) is a cube with the side length grid_size whose
+        center is ((x, y, z) + offset) * grid_size. The component must be in a direct design.
+
+        Args:
+            grid_size (float): The side length of a voxel.
+            component (adsk.fusion.Component): The component in which the bodies are created.
+            offset (Tuple[float, float, float], optional): The offset of the voxels in voxels.
+                Defaults to (0, 0, 0).
+        """
+        self.grid_size = grid_size
+        self.component = component
+        self._offset = offset
+        self._groups = {}  # {key: {voxel coord: description}}
+        self._bodies = {}  # {key: [adsk.fusion.BRepBody]}
+        self._appearances = {}  # {(appearance, color): adsk.core.Appearance}
+
+    @property
+    def groups(self) -> List[Hashable]:
+        """The identifiers of all groups which have bodies."""
+        return list(self._groups)
+
+    @property
+    def n_bodies(self) -> int:
+        """The number of bodies which are currently shown."""
+        return sum(len(bodies) for bodies in self._bodies.values())
+
+    def set_group(self, key: Hashable, voxels: Dict[Tuple[int, int, int], Dict]):
+        """Replaces the bodies of a group by bodies for the given voxels. Groups without voxels are
+        removed.
+
+        Args:
+            key (Hashable): The identifier of the group.
+            voxels (Dict[Tuple[int, int, int], Dict]): The voxels of the group and their
+                descriptions (see VoxelWorld.add_voxel). {(x_voxel,y_voxel,z_voxel):description}
+        """
+        if self._groups.get(key, {}) == voxels:
+            return
+        self._remove_bodies(key)
+        if not voxels:
+            self._groups.pop(key, None)
+            return
+        self._groups[key] = dict(voxels)
+        self._bodies[key] = self._create_bodies(voxels)
+
+    def set_grid_size(self, grid_size: float):
+        """Changes the size of the voxels and recreates all bodies.
+
+        Args:
+            grid_size (float): The new side length of a voxel.
+        """
+        self.grid_size = grid_size
+        for key, voxels in self._groups.items():
+            self._remove_bodies(key)
+            self._bodies[key] = self._create_bodies(voxels)
+
+    def clear(self):
+        """Removes all bodies."""
+        for key in list(self._bodies):
+            self._remove_bodies(key)
+        self._groups = {}
+
+    def _remove_bodies(self, key: Hashable):
+        """Deletes the bodies of a group.
+
+        Args:
+            key (Hashable): The identifier of the group.
+        """
+        for body in self._bodies.pop(key, ()):
+            if body.isValid:
+                body.deleteMe()
+
+    def _create_bodies(
+        self, voxels: Dict[Tuple[int, int, int], Dict]
+    ) -> List[adsk.fusion.BRepBody]:
+        """Creates one body for all voxels with the same description.
+
+        Args:
+            voxels (Dict[Tuple[int, int, int], Dict]): The voxels and their descriptions.
+
+        Returns:
+            List[adsk.fusion.BRepBody]: The created bodies.
+        """
+        coords_by_description = {}
+        for coord, description in voxels.items():
+            key = (description["name"], description["appearance"], description["color"])
+            coords_by_description.setdefault(key, (description, []))[1].append(coord)
+
+        bodies = []
+        for description, coords in coords_by_description.values():
+            body = self.component.bRepBodies.add(
+                create_temporary_body(coords, self.grid_size, self._offset)
+            )
+            body.name = description["name"]
+            body.appearance = self._get_appearance(
+                description["appearance"], description["color"]
+            )
+            bodies.append(body)
+        return bodies
+
+    def _get_appearance(
+        self, appearance_id: str, color: Tuple[int, int, int, int]
+    ) -> adsk.core.Appearance:
+        """Returns the appearance for the bodies of the given color and caches it.
+
+        Args:
+            appearance_id (str): The id of the library appearance.
+            color (Tuple[int, int, int, int]): The rgbo tuple or None to use the library
+                appearance as it is.
+
+        Returns:
+            adsk.core.Appearance: The appearance.
+        """
+        key = (appearance_id, color)
+        if key not in self._appearances:
+            self._appearances[key] = get_appearance(
+                self.component.parentDesign, appearance_id, color
+            )
+        return self._appearances[key]
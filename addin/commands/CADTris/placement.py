@@ -0,0 +1,220 @@
+from collections import deque
+import functools
+from typing import NamedTuple, Tuple
+
+from .field import rows_intersect
+from .logic_model import Figure, TetrisGame
+
+
+class Placement(NamedTuple):
+    """A reachable final position of a figure and the resulting board."""
+
+    rotation_index: int
+    x: int
+    y: int
+    coords: Tuple[Tuple[int, int], ...]
+    # the actions (names of the TetrisGame methods) which lead from the start position to the
+    # placement, "tick" is a single gravity step, a final "drop" freezes the figure
+    actions: Tuple[str, ...]
+    # row bitmasks of the board after freezing the figure and clearing the full rows
+    rows: Tuple[int, ...]
+    cleared_lines: int
+    score_delta: int
+
+
+def _strip_rows(rows: Tuple[int, ...], height: int) -> Tuple[int, ...]:
+    """Removes the empty rows above the height so that equal boards have equal row tuples.
+
+    Args:
+        rows (Tuple[int, ...]): The row bitmasks.
+        height (int): The height of the board.
+
+    Returns:
+        Tuple[int, ...]: The row bitmasks with exactly height rows or more if rows above the
+            height are occupied.
+    """
+    rows = tuple(rows) + (0,) * (height - len(rows))
+    n_rows = len(rows)
+    while n_rows > height and rows[n_rows - 1] == 0:
+        n_rows -= 1
+    return rows[:n_rows]
+
+
+def _place(
+    rows: Tuple[int, ...],
+    width: int,
+    height: int,
+    shape_id: int,
+    state: Tuple[int, int, int],
+) -> Tuple[Tuple[int, ...], int]:
+    """Adds the figure to the board and collapses the full rows like TetrisGame._freeze.
+
+    Args:
+        rows (Tuple[int, ...]): The row bitmasks of the board.
+        width (int): The width of the board.
+        height (int): The height of the board.
+        shape_id (int): The shape of the figure.
+        state (Tuple[int, int, int]): The rotation index and the x, y position of the figure.
+
+    Returns:
+        Tuple[Tuple[int, ...], int]: The resulting row bitmasks and the number of cleared lines.
+    """
+    rotation_index, x, y = state
+    rotation = Figure.rotations[shape_id][rotation_index]
+    origin_x, origin_y = x + rotation.bbox[0], y + rotation.bbox[1]
+
+    new_rows = list(rows)
+    new_rows.extend([0] * (origin_y + len(rotation.row_masks) - len(new_rows)))
+    for row_y, mask in enumerate(rotation.row_masks, origin_y):
+        new_rows[row_y] |= mask << origin_x
+
+    full_mask = (1 << width) - 1
+    kept_rows = [r for r in new_rows[:height] if r != full_mask]
+    cleared_lines = height - len(kept_rows)
+    new_rows = kept_rows + new_rows[height:] + [0] * cleared_lines
+    return _strip_rows(new_rows, height), cleared_lines
+
+
+@functools.lru_cache(maxsize=4096)
+def _enumerate_placements(
+    rows: Tuple[int, ...],
+    width: int,
+    height: int,
+    shape_id: int,
+    start: Tuple[int, int, int],
+) -> Tuple[Placement, ...]:
+    """Cached breadth first search over all positions which are reachable from the start
+    position by moving, rotating and moving down. See enumerate_placements."""
+    full_mask = (1 << width) - 1
+    rotations = Figure.rotations[shape_id]
+
+    def intersects(state):
+        rotation = rotations[state[0]]
+        return rows_intersect(
+            rows,
+            full_mask,
+            rotation.row_masks,
+            state[1] + rotation.bbox[0],
+            state[2] + rotation.bbox[1],
+        )
+
+    if intersects(start):
+        return ()
+
+    # same transitions as Figure.rotate, Figure.move_horizontal, Figure.move_vertical
+    def neighbours(state):
+        rotation_index, x, y = state
+        yield "move_left", (rotation_index, x - 1, y)
+        yield "move_right", (rotation_index, x + 1, y)
+        yield "rotate_right", ((rotation_index - 1) % len(rotations), x, y)
+        yield "rotate_left", ((rotation_index + 1) % len(rotations), x, y)
+        yield "tick", (rotation_index, x, y - 1)
+
+    parents = {start: None}
+    queue = deque([start])
+    placements = {}
+    while queue:
+        state = queue.popleft()
+        for action, neighbour in neighbours(state):
+            if neighbour in parents:
+                continue
+            if intersects(neighbour):
+                if action == "tick":
+                    coords = tuple(
+                        sorted(
+                            (cx + state[1], cy + state[2])
+                            for cx, cy in rotations[state[0]].coords
+                        )
+                    )
+                    if coords not in placements:
+                        placements[coords] = state
+                continue
+            parents[neighbour] = (state, action)
+            queue.append(neighbour)
+
+    result = []
+    for coords, state in placements.items():
+        actions = []
+        node = state
+        while parents[node] is not None:
+            node, action = parents[node]
+            actions.append(action)
+        actions.reverse()
+        actions.append("drop")
+
+        new_rows, cleared_lines = _place(rows, width, height, shape_id, state)
+        result.append(
+            Placement(
+                state[0],
+                state[1],
+                state[2],
+                coords,
+                tuple(actions),
+                new_rows,
+                cleared_lines,
+                cleared_lines**2,
+            )
+        )
+    return tuple(result)
+
+
+def enumerate_placements(
+    rows: Tuple[int, ...],
+    width: int,
+    height: int,
+    shape_id: int,
+    rotation_index: int,
+    x: int,
+    y: int,
+) -> Tuple[Placement, ...]:
+    """Returns all final placements of a figure which are reachable from its current position
+    by moving it left, right, down and rotating it. The same collision rules as in TetrisGame are
+    used. Results are cached per board and figure.
+
+    Args:
+        rows (Tuple[int, ...]): The occupancy of the board as one bitmask per row.
+        width (int): The width of the board.
+        height (int): The height of the board.
+        shape_id (int): The shape of the figure (index in Figure.rotations).
+        rotation_index (int): The current rotation index of the figure.
+        x (int): The current x position of the figure.
+        y (int): The current y position of the figure.
+
+    Returns:
+        Tuple[Placement, ...]: All distinct reachable placements. Empty if the figure intersects
+            at its current position.
+    """
+    return _enumerate_placements(
+        _strip_rows(rows, height), width, height, shape_id, (rotation_index, x, y)
+    )
+
+
+def game_placements(game: TetrisGame) -> Tuple[Placement, ...]:
+    """Returns all reachable final placements of the active figure of the game.
+
+    Args:
+        game (TetrisGame): The game.
+
+    Returns:
+        Tuple[Placement, ...]: All reachable placements. Empty if the game has no active figure.
+    """
+    # pylint:disable=protected-access
+    with game._action_lock:
+        figure = game._active_figure
+        if figure is None:
+            args = None
+        else:
+            args = (
+                game._field.row_masks(),
+                game._width,
+                game._height,
+                figure.shape_id,
+                figure.rotation_index,
+                *figure.position,
+            )
+    # execute the commands which were queued while the lock was held
+    game._process_commands()
+
+    if args is None:
+        return ()
+    return enumerate_placements(*args)
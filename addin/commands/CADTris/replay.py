@@ -0,0 +1,257 @@
+"""Recording of games as compact binary logs and a headless engine which replays them.
+A log consists of a header (seed and initial size) followed by one fixed size record per executed
+command (time in milliseconds since the start of the recording, opcode, argument). Gravity ticks
+are commands as well, so a replay does not depend on any timing.
+"""
+
+import bisect
+from pathlib import Path
+import struct
+from typing import List, NamedTuple, Tuple
+
+from ... import config
+from .clock import VirtualClock
+from .logic_model import TetrisGame
+from .ui import NullDisplay, TetrisDisplay
+
+_MAGIC = b"CTRP"
+_VERSION = 2
+_HEADER = struct.Struct("<4sBQHH")  # magic, version, seed, width, height
+# time in ms, opcode, argument by version, version 1 logs only hold 16 bit arguments
+_RECORDS = {1: struct.Struct("<IBh"), 2: struct.Struct("<IBi")}
+_RECORD = _RECORDS[_VERSION]
+
+# the opcode is the index in this tuple
+# (required action, name of the TetrisGame method, fixed arguments or None if the recorded
+# argument is passed)
+_COMMANDS = (
+    ("start", "_set_state", ("running",)),
+    ("pause", "_set_state", ("pause",)),
+    ("reset", "_set_state", ("start",)),
+    ("move", "_drop", ()),
+    ("move", "_tick", None),
+    ("move", "_step_vertical", None),
+    ("move", "_move_horizontal", None),
+    ("move", "_rotate", None),
+    ("change", "_set_width", None),
+    ("change", "_set_height", None),
+)
+_OPCODES = {
+    (name, fixed_args): opcode for opcode, (_, name, fixed_args) in enumerate(_COMMANDS)
+}
+
+
+class ReplayRecord(NamedTuple):
+    time: int  # milliseconds since the start of the recording
+    opcode: int
+    argument: int
+
+
+class ReplayRecorder:
+    def __init__(self):
+        """Collects the commands executed by a TetrisGame in the binary replay format.
+        Pass the recorder to the TetrisGame which calls begin and record.
+        """
+        self._data = bytearray()
+        self._start_time = None
+
+    def begin(self, seed: int, width: int, height: int, time: float):
+        """Writes the header. Must be called before any command is recorded.
+
+        Args:
+            seed (int): The seed of the game.
+            width (int): The initial width of the game.
+            height (int): The initial height of the game.
+            time (float): The current time of the game clock in seconds.
+        """
+        self._data = bytearray(_HEADER.pack(_MAGIC, _VERSION, seed, width, height))
+        self._start_time = time
+
+    def record(self, time: float, method_name: str, args: Tuple):
+        """Appends an executed command.
+
+        Args:
+            time (float): The current time of the game clock in seconds.
+            method_name (str): The name of the TetrisGame method which executed the command.
+            args (Tuple): The arguments passed to the method.
+
+        Raises:
+            ValueError: If the command can not be recorded.
+        """
+        opcode = _OPCODES.get((method_name, args))
+        argument = 0
+        if opcode is None:
+            opcode = _OPCODES.get((method_name, None))
+            if opcode is None or len(args) != 1:
+                raise ValueError("Invalid command.")
+            argument = args[0]
+        self._data += _RECORD.pack(
+            round((time - self._start_time) * 1000), opcode, argument
+        )
+
+    def to_bytes(self) -> bytes:
+        """Returns the recorded log.
+
+        Returns:
+            bytes: The binary replay log.
+        """
+        return bytes(self._data)
+
+    def save(self, path: Path):
+        """Writes the recorded log to a file.
+
+        Args:
+            path (Path): The path of the file.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(self._data)
+
+
+def parse_replay(data: bytes) -> Tuple[int, int, int, List[ReplayRecord]]:
+    """Reads a binary replay log.
+
+    Args:
+        data (bytes): The binary replay log.
+
+    Raises:
+        ValueError: If the data is no valid replay log.
+
+    Returns:
+        Tuple[int, int, int, List[ReplayRecord]]: The seed, the initial width, the initial height
+            and the records.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Invalid replay length.")
+    magic, version, seed, width, height = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version not in _RECORDS:
+        raise ValueError("Invalid replay header.")
+    record = _RECORDS[version]
+    if (len(data) - _HEADER.size) % record.size:
+        raise ValueError("Invalid replay length.")
+    records = [
+        ReplayRecord(*values) for values in record.iter_unpack(data[_HEADER.size :])
+    ]
+    if any(r.opcode >= len(_COMMANDS) for r in records):
+        raise ValueError("Invalid replay opcode.")
+    return seed, width, height, records
+
+
+class ReplayEngine:
+    def __init__(
+        self,
+        data: bytes,
+        snapshot_interval: int = None,
+    ):
+        """Rebuilds recorded games headlessly as fast as possible. While replaying, the state of
+        the game is captured with TetrisGame.snapshot every snapshot_interval records so that
+        seeking only needs to replay the records after the nearest snapshot.
+
+        Args:
+            data (bytes): The binary replay log.
+            snapshot_interval (int, optional): The number of records between two snapshots.
+                Defaults to None (config.CADTRIS_REPLAY_SNAPSHOT_INTERVAL).
+        """
+        self.seed, self.width, self.height, self.records = parse_replay(data)
+        self._snapshot_interval = (
+            snapshot_interval or config.CADTRIS_REPLAY_SNAPSHOT_INTERVAL
+        )
+        self._snapshots = {}  # {number of applied records: snapshot}
+
+        # number of gravity ticks after applying the first i+1 records
+        self._tick_counts = []
+        ticks = 0
+        tick_opcode = _OPCODES[("_tick", None)]
+        for record in self.records:
+            if record.opcode == tick_opcode:
+                ticks += record.argument
+            self._tick_counts.append(ticks)
+
+    @property
+    def n_ticks(self) -> int:
+        """The total number of recorded gravity ticks."""
+        return self._tick_counts[-1] if self._tick_counts else 0
+
+    def play(self, display: TetrisDisplay = None) -> TetrisGame:
+        """Replays all records.
+
+        Args:
+            display (TetrisDisplay, optional): The display which shows the replay.
+                Defaults to None (no display).
+
+        Returns:
+            TetrisGame: The game after the last record.
+        """
+        return self._replay(len(self.records), display)
+
+    def seek(self, tick: int, display: TetrisDisplay = None) -> TetrisGame:
+        """Rebuilds the game right after the given gravity tick. Only the records after the nearest
+        snapshot are replayed. A record which holds multiple ticks is only replayed up to the given
+        tick. Tick 0 is the game right before the first gravity tick, i.e. after all records which
+        precede the first tick record.
+
+        Args:
+            tick (int): The number of gravity ticks to replay.
+            display (TetrisDisplay, optional): The display which shows the game.
+                Defaults to None (no display).
+
+        Returns:
+            TetrisGame: The game after the given tick.
+        """
+        if tick <= 0:
+            return self._replay(bisect.bisect_left(self._tick_counts, 1), display)
+        position = bisect.bisect_left(self._tick_counts, tick) + 1
+        if position > len(self.records):
+            return self._replay(len(self.records), display)
+        excess_ticks = self._tick_counts[position - 1] - tick
+        if excess_ticks <= 0:
+            return self._replay(position, display)
+
+        game = self._replay(position - 1, display)
+        if self.records[position - 1].argument > excess_ticks:
+            game.tick(self.records[position - 1].argument - excess_ticks)
+        return game
+
+    def _new_game(self, display: TetrisDisplay) -> TetrisGame:
+        """Creates the game in its recorded initial state.
+
+        Args:
+            display (TetrisDisplay): The display of the game or None.
+
+        Returns:
+            TetrisGame: The new game.
+        """
+        return TetrisGame(
+            display if display is not None else NullDisplay(),
+            seed=self.seed,
+            clock=VirtualClock(),
+            width=self.width,
+            height=self.height,
+        )
+
+    def _replay(self, position: int, display: TetrisDisplay) -> TetrisGame:
+        """Rebuilds the game after the given number of records from the nearest snapshot.
+
+        Args:
+            position (int): The number of records to apply.
+            display (TetrisDisplay): The display of the game or None.
+
+        Returns:
+            TetrisGame: The game after applying the records.
+        """
+        game = self._new_game(display)
+        start = max((p for p in self._snapshots if p <= position), default=0)
+        if start:
+            game.restore(self._snapshots[start])
+
+        for i in range(start, position):
+            required_action, name, fixed_args = _COMMANDS[self.records[i].opcode]
+            args = fixed_args if fixed_args is not None else (self.records[i].argument,)
+            game._submit(  # pylint:disable=protected-access
+                required_action, getattr(game, name), *args
+            )
+            if (i + 1) % self._snapshot_interval == 0 and i + 1 not in self._snapshots:
+                self._snapshots[i + 1] = game.snapshot()
+
+        game._update_display()  # pylint:disable=protected-access
+        return game
@@ -0,0 +1,159 @@
+"""Runner which lets policies (bots) play many seeded headless games in parallel.
+Outside of Fusion360 the adsk modules must be mocked before importing this module (see tests/main_test.py).
+With the "spawn" start method the mocking must happen at module level of the main script so that the
+worker processes execute it as well.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import os
+import statistics
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from ... import config
+from .clock import VirtualClock
+from .logic_model import TetrisGame
+from .ui import NullDisplay
+
+# a policy gets the serialized game and returns the names of the actions to execute before
+# the next gravity step, the result must only depend on the passed game
+Policy = Callable[[Dict], Iterable[str]]
+
+ACTIONS = ("move_left", "move_right", "rotate_left", "rotate_right", "drop")
+
+
+def _check_size(width: int, height: int) -> Tuple[int, int]:
+    """Checks the board size before any game is started, because TetrisGame ignores sizes
+    outside the configured range.
+
+    Args:
+        width (int): The width or None for config.CADTRIS_INITIAL_WIDTH.
+        height (int): The height or None for config.CADTRIS_INITIAL_HEIGHT.
+
+    Raises:
+        ValueError: If the width or the height is outside the configured range.
+
+    Returns:
+        Tuple[int, int]: The width and the height.
+    """
+    width = config.CADTRIS_INITIAL_WIDTH if width is None else width
+    height = config.CADTRIS_INITIAL_HEIGHT if height is None else height
+    if not config.CADTRIS_MIN_WIDTH <= width <= config.CADTRIS_MAX_WIDTH:
+        raise ValueError(f"Invalid width {width}.")
+    if not config.CADTRIS_MIN_HEIGHT <= height <= config.CADTRIS_MAX_HEIGHT:
+        raise ValueError(f"Invalid height {height}.")
+    return width, height
+
+
+def play_game(
+    policy: Policy,
+    seed: int,
+    width: int = None,
+    height: int = None,
+    max_pieces: int = 1000,
+) -> Dict:
+    """Plays a single headless game until it is over or max_pieces figures have been placed.
+    Before every gravity step the policy is asked for the actions to execute.
+
+    Args:
+        policy (Policy): The policy which decides about the actions.
+        seed (int): The seed of the game.
+        width (int, optional): The width of the game.
+            Defaults to None (config.CADTRIS_INITIAL_WIDTH).
+        height (int, optional): The height of the game.
+            Defaults to None (config.CADTRIS_INITIAL_HEIGHT).
+        max_pieces (int, optional): The maximum number of figures to place. Defaults to 1000.
+
+    Raises:
+        ValueError: If the size is outside the configured range or the policy returns an
+            unknown action.
+
+    Returns:
+        Dict: The result of the game {"seed", "score", "lines", "level", "pieces"}.
+    """
+    width, height = _check_size(width, height)
+    game = TetrisGame(NullDisplay(), seed=seed, clock=VirtualClock())
+    game.set_width(width)
+    game.set_height(height)
+    game.start()
+
+    while game.state == "running" and game.pieces < max_pieces:
+        for action in policy(game._serialize()):  # pylint:disable=protected-access
+            if action not in ACTIONS:
+                raise ValueError(f"Invalid action {action}.")
+            getattr(game, action)()
+        game.tick()
+
+    return {
+        "seed": seed,
+        "score": game.score,
+        "lines": game.lines,
+        "level": game.level,
+        "pieces": game.pieces,
+    }
+
+
+def aggregate_results(results: List[Dict]) -> Dict:
+    """Calculates statistics over the results of multiple games.
+
+    Args:
+        results (List[Dict]): The results as returned by play_game.
+
+    Returns:
+        Dict: The mean, min, max and standard deviation of all result values and the
+            results themselves.
+    """
+    statistic = {"games": len(results), "results": results}
+    for key in ("score", "lines", "level", "pieces"):
+        values = [r[key] for r in results]
+        statistic[key] = {
+            "mean": statistics.mean(values),
+            "min": min(values),
+            "max": max(values),
+            "stdev": statistics.pstdev(values),
+        }
+    return statistic
+
+
+def run_tournament(
+    policy: Policy,
+    seeds: Sequence[int],
+    width: int = None,
+    height: int = None,
+    max_pieces: int = 1000,
+    max_workers: int = None,
+) -> Dict:
+    """Plays one game per seed with the given policy distributed over multiple processes.
+    The result of every game only depends on its seed and the policy, therefore the results are
+    the same for any number of workers.
+
+    Args:
+        policy (Policy): The policy which decides about the actions. Must be picklable (e.g. a
+            module level function).
+        seeds (Sequence[int]): The seeds of the games to play.
+        width (int, optional): The width of the games.
+            Defaults to None (config.CADTRIS_INITIAL_WIDTH).
+        height (int, optional): The height of the games.
+            Defaults to None (config.CADTRIS_INITIAL_HEIGHT).
+        max_pieces (int, optional): The maximum number of figures per game. Defaults to 1000.
+        max_workers (int, optional): The number of processes. Defaults to None (number of CPUs).
+
+    Raises:
+        ValueError: If no seeds are passed or the size is outside the configured range.
+
+    Returns:
+        Dict: The aggregated results as returned by aggregate_results. The results of the single
+            games are ordered like the seeds.
+    """
+    if not seeds:
+        raise ValueError("Invalid seeds, at least one seed is required.")
+    width, height = _check_size(width, height)
+    play = functools.partial(
+        play_game, policy, width=width, height=height, max_pieces=max_pieces
+    )
+    n_workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(play, seeds, chunksize=max(1, len(seeds) // (4 * n_workers)))
+        )
+    return aggregate_results(results)
@@ -1,9 +1,11 @@
 from enum import auto
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, List, Tuple, Set
-import bisect
-import json
+from typing import Callable, Dict, Iterable, List, Tuple, Set, TextIO
 import functools
+import io
+import sys
+import threading
+import time
 
 import adsk.core, adsk.fusion  # pylint:disable=import-error
 
@@ -11,6 +13,10 @@ from ...libs.fusion_addin_framework import fusion_addin_framework as faf
 from ...libs.voxler import voxler as vox
 
 from ... import config
+from .body_pool import BodyPool
+from .highscores import HighscoreEntry, HighscoreStore
+from .merged_bodies import MergedBodyWorld, create_temporary_body
+from . import instrumentation
 
 
 class InputIds(faf.utils.InputIdsBase):
@@ -24,6 +30,8 @@ class InputIds(faf.utils.InputIdsBase):
     LinesText = auto()
     HighscoreGroup = auto()
     HighscoreHeading = auto()
+    TimingsGroup = auto()
+    TimingsText = auto()
     SettingsGroup = auto()
     BlockHeight = auto()
     BlockWidth = auto()
@@ -32,15 +40,17 @@ class InputIds(faf.utils.InputIdsBase):
 
 
 class InputsWindow:
-    def __init__(self, command: adsk.core.Command):
+    def __init__(self, command: adsk.core.Command, highscores: HighscoreStore):
         """Creates the input window in Fusion for the passed command. This includes all InputGroups and
         Input configuration. The inputs are saved as properties of this class.
 
         Args:
             command (adsk.core.Command): The command for which the inputs are createtd.
+            highscores (HighscoreStore): The store of the highscores to display.
         """
 
         self._command = command
+        self._highscores = highscores
 
         # TODO investigate changing alignment of button when settings group gets expanded
 
@@ -48,6 +58,8 @@ class InputsWindow:
         self._create_info_group()
         self._create_highscores_group()
         self._create_settings_group()
+        if config.CADTRIS_SHOW_TIMINGS:
+            self._create_timings_group()
 
     def _create_controls_group(self):
         """Creates the control group for the Play, PAuse buttons etc. and the corresponding inputs."""
@@ -126,7 +138,11 @@ class InputsWindow:
             )
             for rank in range(config.CADTRIS_DISPLAYED_SCORES)
         ]
-        self.update_highscores(faf.utils.get_json_from_file(config.CADTRIS_SCORES_PATH, []))
+        self.update_highscores(
+            self._highscores.leaderboard(
+                config.CADTRIS_INITIAL_WIDTH, config.CADTRIS_INITIAL_HEIGHT
+            ).top(config.CADTRIS_DISPLAYED_SCORES)
+        )
 
         self.highscore_group.isExpanded = False
 
@@ -223,17 +239,36 @@ class InputsWindow:
         self.width_setting.isEnabled = enable
         self.block_size_input.isEnabled = enable
 
-    def update_highscores(self, scores: List[int]):
+    def _create_timings_group(self):
+        """Creates the input group which shows the timings of the game loop."""
+        self.timings_group = self._command.commandInputs.addGroupCommandInput(
+            InputIds.TimingsGroup.value, config.CADTRIS_TIMINGS_GROUP_NAME
+        )
+        self.timings_group.isExpanded = False
+        self.timings_text = self.timings_group.children.addTextBoxCommandInput(
+            InputIds.TimingsText.value, "", "", 8, True
+        )
+        self.timings_text.isFullWidth = True
+
+    def update_timings(self, text: str):
+        """Shows the passed timings in the timings group.
+
+        Args:
+            text (str): The formatted timings.
+        """
+        self.timings_text.text = text
+
+    def update_highscores(self, entries: List[HighscoreEntry]):
         """Updates the highscore text inputs accorfing to the values in the passed list.
         It is asumed that the values in the passed list are sorted. Only the first values in the list
         are used.
 
         Args:
-            scores (List[int]): A ordered list containing the current scores.
+            entries (List[HighscoreEntry]): A ordered list containing the current highscore entries.
         """
         for rank in range(config.CADTRIS_DISPLAYED_SCORES):
-            if rank < len(scores):
-                self.highscore_texts[rank].text = str(scores[rank])
+            if rank < len(entries):
+                self.highscore_texts[rank].text = str(entries[rank].score)
             else:
                 self.highscore_texts[rank].text = str(config.CADTRIS_NO_SCORE_SYMBOL)
 
@@ -255,18 +290,51 @@ class Display(ABC):
 
 
 class TetrisDisplay(Display, ABC):
-    pass
+    def apply_changes(
+        self, changes: Dict, get_serialized_game: Callable[[], Dict]
+    ) -> None:
+        """Updates the display according to the changes of the game since the last update.
+        Displays which can not work with changes fall back to the full serialized game which is
+        only created when this method demands it.
+
+        Args:
+            changes (Dict): The changed scalars, cells and figure since the last update.
+            get_serialized_game (Callable[[], Dict]): Function which creates the full serialized game.
+                Must be called before this method returns.
+        """
+        self.update(get_serialized_game())
+
+
+class NullDisplay(TetrisDisplay):
+    """Display which does not visualize anything. Used to run the game logic headless, e.g. for
+    simulations. Never requests the full serialized game."""
+
+    def update(self, serialized_game: Dict) -> None:
+        pass
+
+    def apply_changes(
+        self, changes: Dict, get_serialized_game: Callable[[], Dict]
+    ) -> None:
+        pass
 
 
 class AsciisDisplay(TetrisDisplay):
+    # number of rows above the field which are shown so new figures are visible
+    _SPAWN_ROWS = 4
+
     def __init__(
         self,
         wall_char: str = "X",
         element_char: str = "O",
         air_char: str = " ",
         horizontal_spacing: str = "  ",
+        stream: TextIO = None,
+        headless: bool = False,
     ) -> None:
-        """Display to visualize theb Teris game. Used for debugging the logic without using any part of Fusion
+        """Display to visualize theb Teris game. Used for debugging the logic without using any part of Fusion.
+        The display keeps the occupied cells of every row as bitmask and renders the rows from
+        these masks. Only the lines which differ from the last frame are written to the terminal
+        by moving the cursor with ANSI escape sequences.
 
         Args:
             wall_char (str, optional): The character used to display walls. Defaults to "X".
@@ -274,11 +342,30 @@ class AsciisDisplay(TetrisDisplay):
             air_char (str, optional): The character used to display empty blocks. Defaults to " ".
             horizontal_spacing (str, optional): The characters used to seperate the displayed character horizontally.
                 Used to get less thin look. Defaults to "  ".
+            stream (TextIO, optional): The stream to which the frames are written.
+                Defaults to None (sys.stdout).
+            headless (bool, optional): Render into an in-memory buffer instead of the stream, e.g.
+                for benchmarks. The buffer only contains the output of the last frame.
+                Defaults to False.
         """
         self.horizontal_spacing = horizontal_spacing
         self.wall_char = wall_char + self.horizontal_spacing
         self.element_char = element_char + self.horizontal_spacing
         self.air_char = air_char + self.horizontal_spacing
+        self.headless = headless
+        self.buffer = io.StringIO() if headless else None
+        self._stream = stream
+
+        self._state = None
+        self._width = None
+        self._height = None
+        # bitmask of the occupied field cells by y (including spawn rows)
+        self._field_rows = []
+        self._figure_rows = {}  # {y: bitmask of the cells of the active figure}
+        self._row_cache = {}  # {(bitmask, inside walls): rendered row}
+        self._bottom_line = None
+        self.lines = []  # the lines of the current frame
+
         super().__init__()
 
     def update(self, serialized_game: Dict) -> None:
@@ -288,38 +375,144 @@ class AsciisDisplay(TetrisDisplay):
             serialized_game (Dict): A full representation of the game which allows to visualize
                 the game but prevents changign the game.
         """
-        output = ""
+        self._state = serialized_game["state"]
+        self._resize(serialized_game["width"], serialized_game["height"])
+        for x, y in serialized_game["field"]:
+            self._field_rows[y] |= 1 << x
+        self._set_figure(serialized_game["figure"])
+        self._render()
+
+    def apply_changes(
+        self, changes: Dict, get_serialized_game: Callable[[], Dict]
+    ) -> None:
+        """Updates and writes only the rows which are affected by the changes, so the costs do not
+        depend on the size of the board. The full serialized game is only used if the field has
+        been reset or resized.
+
+        Args:
+            changes (Dict): The changes since the last update.
+            get_serialized_game (Callable[[], Dict]): Function which creates the full serialized game.
+        """
+        scalars = changes["scalars"]
+        if (
+            changes["field_reset"]
+            or self._width is None
+            or "width" in scalars
+            or "height" in scalars
+        ):
+            self.update(get_serialized_game())
+            return
+
+        if "state" in scalars:
+            self._state = scalars["state"]
+        dirty_rows = set()
+        for (x, y), color_code in changes["cells"].items():
+            dirty_rows.add(y)
+            if color_code is None:
+                self._field_rows[y] &= ~(1 << x)
+            else:
+                self._field_rows[y] |= 1 << x
+        if changes["figure"] is not None:
+            dirty_rows.update(self._figure_rows)
+            self._set_figure(changes["figure"][1])
+            dirty_rows.update(self._figure_rows)
+        self._render(dirty_rows)
 
-        output += serialized_game["state"]
-        output += "\n\n"
+    @property
+    def frame(self) -> str:
+        """The current frame as it is shown in the terminal."""
+        return "\n".join(self.lines)
 
-        elements = {
-            # field tetronimo
-            **{c: self.element_char for c in serialized_game["field"].keys()},
-            # active tetronimo
-            **(
-                {c: self.element_char for c in serialized_game["figure"]["coordinates"]}
-                if serialized_game["figure"]
-                else {}
-            ),
-            # sides
-            **{
-                (x, y): self.wall_char
-                for x in (-1, serialized_game["width"])
-                for y in range(-1, serialized_game["height"])
-            },
-            # bottom
-            **{(x, -1): self.wall_char for x in range(-1, serialized_game["width"])},
-        }
+    def _resize(self, width: int, height: int):
+        """Clears the rows and creates the wall frame for the given size.
+
+        Args:
+            width (int): The width of the game.
+            height (int): The height of the game.
+        """
+        if (width, height) != (self._width, self._height):
+            self._width = width
+            self._height = height
+            self._row_cache = {}
+            self._bottom_line = self.wall_char * (width + 2)
+        self._field_rows = [0] * (height + self._SPAWN_ROWS)
+
+    def _set_figure(self, serialized_figure: Dict):
+        """Replaces the masks of the active figure.
 
-        xs, ys = list(zip(*elements.keys()))
-        for y in range(max(ys), min(ys) - 1, -1):
-            for x in range(min(xs), max(xs) + 1):
-                c = elements.get((x, y), self.air_char)
-                output += c
-            output += "\n"
+        Args:
+            serialized_figure (Dict): The serialized figure or None if there is no active figure.
+        """
+        self._figure_rows = {}
+        if serialized_figure is None:
+            return
+        for x, y in serialized_figure["coordinates"]:
+            if 0 <= y < len(self._field_rows):
+                self._figure_rows[y] = self._figure_rows.get(y, 0) | 1 << x
 
-        print(output)
+    def _render_row(self, mask: int, inside_walls: bool) -> str:
+        """Renders a single row. Rendered rows are cached by their mask.
+
+        Args:
+            mask (int): The bitmask of the occupied cells.
+            inside_walls (bool): Whether the row is enclosed by the walls.
+
+        Returns:
+            str: The rendered row.
+        """
+        key = (mask, inside_walls)
+        row = self._row_cache.get(key)
+        if row is None:
+            cells = (self.air_char, self.element_char)
+            side = self.wall_char if inside_walls else self.air_char
+            row = "".join(
+                [side, *[cells[(mask >> x) & 1] for x in range(self._width)], side]
+            )
+            if len(self._row_cache) > 4096:
+                self._row_cache = {}
+            self._row_cache[key] = row
+        return row
+
+    def _render(self, dirty_rows: Set[int] = None):
+        """Renders the current frame and writes the lines which differ from the last frame.
+
+        Args:
+            dirty_rows (Set[int], optional): The y coordinates of the only rows which might have
+                changed. Defaults to None (all rows are rendered).
+        """
+        n_rows = len(self._field_rows)
+        figure_rows = self._figure_rows
+        # the state and an empty line are shown above the rows, the bottom wall below
+        changed = {0: self._state}
+        if dirty_rows is None or len(self.lines) != n_rows + 3:
+            dirty_rows = range(n_rows)
+            changed[1] = ""
+            changed[n_rows + 2] = self._bottom_line
+        for y in dirty_rows:
+            changed[n_rows + 1 - y] = self._render_row(
+                self._field_rows[y] | figure_rows.get(y, 0), y < self._height
+            )
+
+        if len(self.lines) != n_rows + 3:
+            # the size changed, the whole screen is redrawn
+            self.lines = [changed[i] for i in range(n_rows + 3)]
+            output = ["\x1b[2J\x1b[H", "\n".join(self.lines)]
+        else:
+            output = []
+            for i, line in sorted(changed.items()):
+                if line != self.lines[i]:
+                    self.lines[i] = line
+                    output.append(f"\x1b[{i + 1};1H{line}\x1b[K")
+        output.append(f"\x1b[{n_rows + 4};1H")
+
+        if self.headless:
+            self.buffer.seek(0)
+            self.buffer.truncate()
+            self.buffer.write("".join(output))
+        else:
+            stream = self._stream if self._stream is not None else sys.stdout
+            stream.write("".join(output))
+            stream.flush()
 
 
 class FusionDisplay(TetrisDisplay):
@@ -328,6 +521,7 @@ class FusionDisplay(TetrisDisplay):
         command_window: InputsWindow,
         component: adsk.fusion.Component,
         executer: Callable,
+        highscores: HighscoreStore,
     ) -> None:
         """Display abstraction to visualite the Tetris game within Fusion360. This takes care of biulding
         the BREPBodies, executing the command for building etc.
@@ -336,17 +530,39 @@ class FusionDisplay(TetrisDisplay):
             command_window (InputsWindow): The command input window which get updated by the display due to
                 changes in game state etc.
             component (adsk.fusion.Component): The Fusion360 component into which the blocks are build.
-            executer (Callable): A function which takes a single Callable as inputs and executes it
-                in a appropriate way.
+            executer (Callable): A function which takes a Callable and a coalesce flag as inputs and
+                executes the Callable in a appropriate way. Pending calls of the same Callable
+                which are flagged with coalesce may be executed only once.
+            highscores (HighscoreStore): The store to which the scores of finished games are added.
         """
         self._command_window = command_window
+        self._highscores = highscores
 
-        self._voxel_world = vox.VoxelWorld(
+        # the body pool moves the bodies of the settled blocks when rows are cleared
+        voxel_world_class = BodyPool if config.CADTRIS_POOL_BODIES else vox.VoxelWorld
+        self._voxel_world = voxel_world_class(
+            config.CADTRIS_INITIAL_VOXEL_SIZE, component, self._get_voxelworld_offset()
+        )
+        # bodies of the settled rows and the walls if config.CADTRIS_MERGE_BODIES is set
+        self._merged_bodies = MergedBodyWorld(
             config.CADTRIS_INITIAL_VOXEL_SIZE, component, self._get_voxelworld_offset()
         )
 
-        self._last_game = None
-        self._last_voxels = set()
+        # mirror of the game state which is updated by the changes passed from the game
+        self._game = {"field": {}, "figure": None, "ghost": None}
+        # the voxels which are currently shown {(x_voxel,y_voxel,z_voxel):description}
+        self._voxels = {}
+        self._voxel_descriptions = {}
+        self._wall_voxels_cache = {}
+
+        # changes which have been passed from the game but are not rendered yet
+        self._pending_changes = []
+        self._pending_lock = threading.Lock()
+        # time.monotonic() of the last update of the timings group
+        self._timings_shown_at = 0
+        self._frame_started_at = 0  # time.monotonic() of the last rendered frame
+        # timer which requests the next frame if it is deferred
+        self._frame_timer = None
 
         self.executer = executer
 
@@ -366,7 +582,7 @@ class FusionDisplay(TetrisDisplay):
     def _set_camera(self, height: int, width: int):
         """Sets the camera so that the game fits in the viewarea. This accounts for the voxel world grid size,
         the height and width of the last game and the offset configurations.
-        The height and width values can either be obtained from the self._last_game attribute or from
+        The height and width values can either be obtained from the self._game attribute or from
         the current game to visualize.
 
         Args:
@@ -435,6 +651,49 @@ class FusionDisplay(TetrisDisplay):
         elif config.CADTRIS_DISPLAY_PLANE == "xz":
             return (game_coords[0], 0, game_coords[1])
 
+    def _get_voxel_description(self, color: Tuple[int]) -> Dict:
+        """Returns the voxel description for the given color. The descriptions are cached and shared
+        between all voxels of the same color and must therefore not be modified.
+
+        Args:
+            color (Tuple[int]): The rgbo tuple of the voxel or None for the default appearance.
+
+        Returns:
+            Dict: The voxel description which can get passed to the voxler-world instance.
+        """
+        if color not in self._voxel_descriptions:
+            self._voxel_descriptions[color] = {
+                "shape": "cube",
+                "color": color,
+                "appearance": config.CADTRIS_BLOCK_APPEARANCE,
+                "name": "CADTris voxel",
+            }
+        return self._voxel_descriptions[color]
+
+    def _get_wall_voxels(self, width: int, height: int) -> Dict:
+        """Returns the voxels of the walls and the bottom of a game of the given size. The result is
+        cached per (width, height, plane) and must therefore not be modified.
+
+        Args:
+            width (int): The width of the game.
+            height (int): The height of the game.
+
+        Returns:
+            Dict: The voxel description of the walls. {(x_voxel,y_voxel,z_voxel):description}
+        """
+        key = (width, height, config.CADTRIS_DISPLAY_PLANE)
+        if key not in self._wall_voxels_cache:
+            wall_coords = {
+                *((x, y) for x in (-1, width) for y in range(-1, height)),
+                *((x, -1) for x in range(-1, width)),
+            }
+            description = self._get_voxel_description(config.CADTRIS_WALL_COLOR)
+            self._wall_voxels_cache[key] = {
+                self._game_coords_to_voxel_coords(coord): description
+                for coord in wall_coords
+            }
+        return self._wall_voxels_cache[key]
+
     def _get_voxel_dict(self, serialized_game: Dict) -> Dict:
         """Takes the needed information from the serialized game and transforms them into dictionary
         qith all voxel description which can get passed directly to the voxler-world instance.
@@ -443,51 +702,190 @@ class FusionDisplay(TetrisDisplay):
             serialized_game (Dict): The serialized game.
 
         Returns:
-            Dict: The voxel description for the voxler. {(x_game,y_game):(r,b,g,o)}
+            Dict: The voxel description for the voxler. {(x_voxel,y_voxel,z_voxel):description}
         """
-        field_voxels = {
-            coord: self._convert_color_code(color_code)
+        voxels = {
+            self._game_coords_to_voxel_coords(coord): self._get_voxel_description(
+                self._convert_color_code(color_code)
+            )
             for coord, color_code in serialized_game["field"].items()
         }
 
-        figure_voxels = dict()
-        if serialized_game["figure"]:
-            figure_voxels = {
-                coord: self._convert_color_code(serialized_game["figure"]["color_code"])
-                for coord in serialized_game["figure"]["coordinates"]
-            }
+        figure, ghost = self._get_voxel_figures(serialized_game)
+        if figure:
+            description = self._get_voxel_description(
+                self._convert_color_code(figure["color_code"])
+            )
+            for coord in figure["coordinates"]:
+                voxels[self._game_coords_to_voxel_coords(coord)] = description
 
-        wall_voxels = {
-            **{
-                (x, y): config.CADTRIS_WALL_COLOR
-                for x in (-1, serialized_game["width"])
-                for y in range(-1, serialized_game["height"])
-            },
-            **{
-                (x, -1): config.CADTRIS_WALL_COLOR
-                for x in range(-1, serialized_game["width"])
-            },
-        }
+        if ghost:
+            description = self._get_voxel_description(config.CADTRIS_GHOST_COLOR)
+            for coord in ghost:
+                voxel_coord = self._game_coords_to_voxel_coords(coord)
+                voxels.setdefault(voxel_coord, description)
 
-        # {(x_game,y_game):(r,b,g,o)}
-        voxels = {**field_voxels, **figure_voxels, **wall_voxels}
+        voxels.update(
+            self._get_wall_voxels(serialized_game["width"], serialized_game["height"])
+        )
 
-        # convert to three dimensional coords
-        voxels = {
-            self._game_coords_to_voxel_coords(coord): {
-                "shape": "cube",
-                "color": color,
-                "appearance": config.CADTRIS_BLOCK_APPEARANCE,
-                "name": "CADTris voxel",
-            }
-            for coord, color in voxels.items()
+        return voxels
+
+    def _get_figure_voxels(self, serialized_game: Dict) -> Dict:
+        """Creates the voxel descriptions of the active figure and the ghost figure.
+
+        Args:
+            serialized_game (Dict): The serialized game.
+
+        Returns:
+            Dict: The voxel description of the figures. {(x_voxel,y_voxel,z_voxel):description}
+        """
+        voxels = {}
+        figure, ghost = self._get_voxel_figures(serialized_game)
+        if ghost:
+            description = self._get_voxel_description(config.CADTRIS_GHOST_COLOR)
+            for coord in ghost:
+                voxels[self._game_coords_to_voxel_coords(coord)] = description
+        if figure:
+            description = self._get_voxel_description(
+                self._convert_color_code(figure["color_code"])
+            )
+            for coord in figure["coordinates"]:
+                voxels[self._game_coords_to_voxel_coords(coord)] = description
+        return voxels
+
+    def _get_voxel_figures(self, serialized_game: Dict) -> Tuple[Dict, List]:
+        """Returns the active figure and the ghost figure which are shown as voxels.
+
+        Args:
+            serialized_game (Dict): The serialized game.
+
+        Returns:
+            Tuple[Dict, List]: The serialized figure and the coordinates of the ghost figure. None
+                if the figure is not shown as voxels.
+        """
+        ghost = serialized_game.get("ghost") if config.CADTRIS_SHOW_GHOST else None
+        return serialized_game["figure"], ghost
+
+    def _get_row_voxels(self, y: int) -> Dict:
+        """Creates the voxel descriptions of the settled blocks of a row of the mirrored game.
+
+        Args:
+            y (int): The y coordinate of the row.
+
+        Returns:
+            Dict: The voxel description of the row. {(x_voxel,y_voxel,z_voxel):description}
+        """
+        field = self._game["field"]
+        return {
+            self._game_coords_to_voxel_coords((x, y)): self._get_voxel_description(
+                self._convert_color_code(field[(x, y)])
+            )
+            for x in range(self._game["width"])
+            if (x, y) in field
         }
 
+    def _update_merged_bodies(self, changes: Dict, full_update: bool):
+        """Updates the merged bodies of all rows which contain changed cells. If the whole game
+        changed, the walls and all rows are updated.
+
+        Args:
+            changes (Dict): The changes since the last update. The mirrored game must already be updated.
+            full_update (bool): Whether the whole game has changed (reset or resize).
+        """
+        game = self._game
+        if full_update:
+            self._merged_bodies.set_group(
+                "walls", self._get_wall_voxels(game["width"], game["height"])
+            )
+            rows = {y for _, y in game["field"]}
+            rows.update(key[1] for key in self._merged_bodies.groups if key != "walls")
+        else:
+            rows = {y for _, y in changes["cells"]}
+        for y in rows:
+            self._merged_bodies.set_group(("row", y), self._get_row_voxels(y))
+
+    def _get_figure_coords(self) -> Set[Tuple[int, int]]:
+        """Returns the game coordinates of the active figure and the ghost figure of the mirrored
+        game which are shown as voxels.
+
+        Returns:
+            Set[Tuple[int, int]]: The game coordinates.
+        """
+        coords = set()
+        figure, ghost = self._get_voxel_figures(self._game)
+        if figure:
+            coords.update(figure["coordinates"])
+        if ghost:
+            coords.update(ghost)
+        return coords
+
+    def _get_changed_voxels(
+        self,
+        changes: Dict,
+        old_figure_coords: Set[Tuple[int, int]],
+        rows_from: int = None,
+    ) -> Dict:
+        """Creates the voxel descriptions for all game coordinates which might have changed according
+        to the passed changes. This includes the changed cells of the field and the coordinates
+        of the old and the new figure and ghost. The mirrored game must already be updated.
+
+        Args:
+            changes (Dict): The changes since the last update.
+            old_figure_coords (Set[Tuple[int, int]]): The coordinates of the figure and the ghost
+                before the changes were applied.
+            rows_from (int, optional): All coordinates in this row and above are treated as
+                changed, e.g. after the voxels of these rows have been moved. Defaults to None.
+
+        Returns:
+            Dict: The voxel description of all possibly changed voxels. Voxels which should not
+                exist are mapped to None. {(x_voxel,y_voxel,z_voxel):description or None}
+        """
+        game = self._game
+        walls = self._get_wall_voxels(game["width"], game["height"])
+
+        candidates = set(changes["cells"])
+        candidates.update(old_figure_coords)
+        candidates.update(self._get_figure_coords())
+        if rows_from is not None:
+            candidates.update(
+                (x, y)
+                for y in range(rows_from, game["height"] + 4)
+                for x in range(game["width"])
+            )
+
+        figure, ghost = self._get_voxel_figures(game)
+        figure_coords = ()
+        if figure:
+            figure_coords = figure["coordinates"]
+            figure_description = self._get_voxel_description(
+                self._convert_color_code(figure["color_code"])
+            )
+        ghost_coords = ()
+        if ghost:
+            ghost_coords = ghost
+            ghost_description = self._get_voxel_description(config.CADTRIS_GHOST_COLOR)
+
+        voxels = {}
+        for coord in candidates:
+            voxel_coord = self._game_coords_to_voxel_coords(coord)
+            if voxel_coord in walls:
+                voxels[voxel_coord] = walls[voxel_coord]
+            elif coord in figure_coords:
+                voxels[voxel_coord] = figure_description
+            elif coord in game["field"]:
+                voxels[voxel_coord] = self._get_voxel_description(
+                    self._convert_color_code(game["field"][coord])
+                )
+            elif coord in ghost_coords:
+                voxels[voxel_coord] = ghost_description
+            else:
+                voxels[voxel_coord] = None
         return voxels
 
     def _update_scores(self, serialized_game: Dict) -> str:
-        """Fetches the current highscores from the file and compares the current game score to it.
-        Updates the highscore file. Updates the command inputs. Return the respective game over message.
+        """Adds the score of the finished game to the highscores. Updates the command inputs.
+        Return the respective game over message.
 
         Args:
             serialized_game (Dict): The serialized game.
@@ -495,99 +893,415 @@ class FusionDisplay(TetrisDisplay):
         Returns:
             str: The game over message to display depending on the result.
         """
-        score = serialized_game["score"]
-        scores = faf.utils.get_json_from_file(config.CADTRIS_SCORES_PATH, [])
-
-        achieved_rank = len(scores) - bisect.bisect_right(scores[::-1], score)
-
-        scores.insert(achieved_rank, serialized_game["score"])
-        with open(config.CADTRIS_SCORES_PATH, "w", encoding="utf-8") as f:
-            json.dump(scores[: config.CADTRIS_MAX_SAVED_SCOES], f, indent=4)
+        achieved_rank = self._highscores.add(
+            HighscoreEntry(
+                serialized_game["score"],
+                serialized_game["width"],
+                serialized_game["height"],
+                serialized_game["level"],
+                serialized_game["lines"],
+                round(serialized_game["duration"], 1),
+                int(time.time()),
+            )
+        )
 
         msg = config.CADTRIS_GAME_OVER_MESSAGE
         if achieved_rank < config.CADTRIS_DISPLAYED_SCORES:
-            self._command_window.update_highscores(scores)
+            self._update_highscores(serialized_game)
             msg += config.CADTRIS_HIGHSCORE_MESSAGE.format(
                 faf.utils.make_ordinal(achieved_rank + 1)
             )
 
         return msg
 
-    def _update_voxels(self, serialized_game: Dict):
-        """Calls the voxel_world update mechanism and determines whether to use a progressbar or not.
+    def _update_highscores(self, serialized_game: Dict):
+        """Shows the leaderboard of the board size of the game in the command inputs.
 
         Args:
             serialized_game (Dict): The serialized game.
         """
-        voxels = self._get_voxel_dict(serialized_game)
-        n_voxel_diff = len(set(self._last_voxels).symmetric_difference(set(voxels)))
-        self._last_voxels = voxels
+        self._command_window.update_highscores(
+            self._highscores.leaderboard(
+                serialized_game["width"], serialized_game["height"]
+            ).top(config.CADTRIS_DISPLAYED_SCORES)
+        )
+
+    def _update_voxels(self, changes: Dict, old_figure_coords: Set[Tuple[int, int]]):
+        """Determines the voxels which changed and passes only those to the voxel world. If a lot
+        of voxels of the field changed a progressbar is shown while they are updated. If
+        config.CADTRIS_MERGE_BODIES is set, the settled blocks and the walls are shown by merged
+        bodies and only the figures consist of single voxels.
+
+        Args:
+            changes (Dict): The changes since the last update. The mirrored game must already be updated.
+            old_figure_coords (Set[Tuple[int, int]]): The coordinates of the figure and the ghost
+                before the changes were applied.
+        """
+        full_update = (
+            changes["field_reset"]
+            or "width" in changes["scalars"]
+            or "height" in changes["scalars"]
+        )
+        if config.CADTRIS_MERGE_BODIES:
+            # only the figures consist of single voxels
+            with instrumentation.timed("merged_bodies_update"):
+                self._update_merged_bodies(changes, full_update)
+            target = {
+                self._game_coords_to_voxel_coords(coord): None
+                for coord in old_figure_coords
+            }
+            target.update(self._get_figure_voxels(self._game))
+            if full_update:
+                target.update({c: None for c in self._voxels.keys() - target.keys()})
+        elif full_update:
+            with instrumentation.timed("voxel_dict"):
+                target = self._get_voxel_dict(self._game)
+            target.update({c: None for c in self._voxels.keys() - target.keys()})
+        elif changes["cleared_rows"] and isinstance(self._voxel_world, BodyPool):
+            with instrumentation.timed("shift_rows"):
+                self._shift_rows(changes["cleared_rows"], old_figure_coords)
+            # the moved blocks are compared to the game as a whole
+            with instrumentation.timed("changed_voxels"):
+                target = self._get_changed_voxels(
+                    changes,
+                    old_figure_coords,
+                    min(min(rows) for rows in changes["cleared_rows"]),
+                )
+        else:
+            with instrumentation.timed("changed_voxels"):
+                target = self._get_changed_voxels(changes, old_figure_coords)
+
+        diff = {
+            coord: description
+            for coord, description in target.items()
+            if self._voxels.get(coord) is not description
+        }
+
+        # the figure and the ghost change on every move, only changes of the field (e.g. cleared
+        # lines) can be large enough for a progressbar
+        figure_coords = {
+            self._game_coords_to_voxel_coords(coord)
+            for coord in old_figure_coords | self._get_figure_coords()
+        }
+        field_diff = {c: d for c, d in diff.items() if c not in figure_coords}
+        self._update_voxel_world(
+            field_diff, len(field_diff) >= config.MIN_VOXELS_FOR_PROGRESSBAR
+        )
+        self._update_voxel_world({c: d for c, d in diff.items() if c in figure_coords})
+
+    def _update_voxel_world(self, diff: Dict, show_progress: bool = False):
+        """Applies the changed voxels to the voxel world by adding and removing single voxels and
+        updates the dict of the currently shown voxels.
+
+        Args:
+            diff (Dict): The changed voxels. {(x_voxel,y_voxel,z_voxel):description or None}
+            show_progress (bool, optional): Whether a progressbar is shown while the voxels are
+                updated. Defaults to False.
+        """
         progressbar = None
-        if n_voxel_diff >= config.MIN_VOXELS_FOR_PROGRESSBAR:
+        if show_progress:
             progressbar = faf.utils.create_progress_dialog(
                 title=config.CADTRIS_PROGRESSBAR_TITLE,
                 message=config.CADTRIS_PROGRESSBAR_MESSAGE,
             )
-        self._voxel_world.update(
-            voxels, progressbar, config.CADTRIS_VOXEL_CHANGES_FOR_DIALOG
-        )
+            progressbar.show(
+                config.CADTRIS_PROGRESSBAR_TITLE,
+                config.CADTRIS_PROGRESSBAR_MESSAGE,
+                0,
+                len(diff),
+            )
+
+        with instrumentation.timed("voxel_world_update"):
+            for i, (coord, description) in enumerate(diff.items(), 1):
+                if coord in self._voxels:
+                    self._voxel_world.remove_voxel(coord)
+                if description is not None:
+                    self._voxel_world.add_voxel(coord, **description)
+                if progressbar is not None:
+                    progressbar.progressValue = i
+
+        if progressbar is not None:
+            progressbar.hide()
+        self._apply_voxel_diff(diff)
+
+    def _shift_rows(
+        self, cleared_rows: List[List[int]], old_figure_coords: Set[Tuple[int, int]]
+    ):
+        """Lowers the shown blocks of the field like the game did when it cleared the rows. The
+        bodies of the cleared rows and of the old figure and ghost are removed and therefore kept
+        for reuse by the body pool. The bodies above every cleared row are moved together. The
+        voxels which differ from the game afterwards are updated by the caller.
+
+        Args:
+            cleared_rows (List[List[int]]): The rows removed by every collapse in the order of
+                the collapses (see Field.take_cleared_rows).
+            old_figure_coords (Set[Tuple[int, int]]): The coordinates of the figure and the ghost
+                before the changes were applied.
+        """
+        width = self._game["width"]
+        top = self._game["height"] + 4
+        to_voxel_coords = self._game_coords_to_voxel_coords
+
+        self._remove_voxels(to_voxel_coords(coord) for coord in old_figure_coords)
+        for rows in cleared_rows:
+            self._remove_voxels(
+                to_voxel_coords((x, y)) for y in rows for x in range(width)
+            )
+            # the blocks between two cleared rows are lowered by the number of rows below them
+            for n_below, (low, high) in enumerate(zip(rows, [*rows[1:], top]), 1):
+                coords = [
+                    to_voxel_coords((x, y))
+                    for y in range(low + 1, high)
+                    for x in range(width)
+                    if to_voxel_coords((x, y)) in self._voxels
+                ]
+                if not coords:
+                    continue
+                offset = to_voxel_coords((0, -n_below))
+                self._voxel_world.move_voxels(coords, offset)
+                moved = {coord: self._voxels.pop(coord) for coord in coords}
+                for coord, description in moved.items():
+                    self._voxels[tuple(c + o for c, o in zip(coord, offset))] = (
+                        description
+                    )
+
+    def _remove_voxels(self, voxel_coords: Iterable[Tuple[int, int, int]]):
+        """Removes the given voxels if they are shown.
+
+        Args:
+            voxel_coords (Iterable[Tuple[int, int, int]]): The voxel coordinates.
+        """
+        for voxel_coord in voxel_coords:
+            if voxel_coord in self._voxels:
+                self._voxel_world.remove_voxel(voxel_coord)
+                del self._voxels[voxel_coord]
+
+    def _apply_voxel_diff(self, diff: Dict):
+        """Updates the dict of the currently shown voxels.
+
+        Args:
+            diff (Dict): The changed voxels. {(x_voxel,y_voxel,z_voxel):description or None}
+        """
+        for coord, description in diff.items():
+            if description is None:
+                self._voxels.pop(coord, None)
+            else:
+                self._voxels[coord] = description
 
-    @_with_executer
     def update(self, serialized_game: Dict) -> None:
-        """Steps to execute in order to update the screen accordingly. This includes updating the inputs and
-        updating the voxel world.
-        Depending on the context this function must be executed from the execute event handler or
-        directly which is decided in the update-method.
+        """Updates the screen to show the passed game. The complete game is treated as changed.
 
         Args:
             serialized_game (Dict): The serialized game.
         """
+        self._queue_changes(
+            {
+                "scalars": {
+                    k: v
+                    for k, v in serialized_game.items()
+                    if k not in ("field", "figure", "ghost")
+                },
+                "field_reset": True,
+                "cells": serialized_game["field"],
+                "cleared_rows": [],
+                "figure": (None, serialized_game["figure"]),
+                "ghost": (None, serialized_game.get("ghost")),
+            }
+        )
 
-        if not self._last_game:
-            changes = {k: True for k in serialized_game}
-        else:
-            changes = {k: v != self._last_game[k] for k, v in serialized_game.items()}
+    def apply_changes(
+        self, changes: Dict, get_serialized_game: Callable[[], Dict]
+    ) -> None:
+        """Updates the screen by only using the changes. No full serialized game is needed.
 
-        # update buttons
-        if changes["state"]:
-            self._command_window.update_control_buttons(
-                serialized_game["allowed_actions"]
+        Args:
+            changes (Dict): The changes since the last update.
+            get_serialized_game (Callable[[], Dict]): Not used.
+        """
+        self._queue_changes(changes)
+
+    def _queue_changes(self, changes: Dict):
+        """Adds the changes to the pending changes and requests the rendering of all pending changes.
+        The changes get merged into the last pending changes as long as this does not hide a
+        change of the game state. This ensures that the display only shows the latest game state
+        but still runs through all state transitions (e.g. gameover) in the correct order.
+
+        Args:
+            changes (Dict): The changes since the last update.
+        """
+        with self._pending_lock:
+            if not self._pending_changes or (
+                "state" in changes["scalars"]
+                and "state" in self._pending_changes[-1]["scalars"]
+            ):
+                self._pending_changes.append(changes)
+            else:
+                self._merge_changes(self._pending_changes[-1], changes)
+            if self._frame_timer is not None:
+                return  # the deferred frame renders these changes as well
+            delay = (
+                self._frame_started_at + 1 / config.CADTRIS_MAX_FPS - time.monotonic()
+                if config.CADTRIS_MAX_FPS
+                else 0
+            )
+            if delay > 0:
+                self._frame_timer = threading.Timer(delay, self._request_deferred_frame)
+                self._frame_timer.daemon = True
+                self._frame_timer.start()
+                return
+        self.executer(self._render_pending, True)
+
+    def _request_deferred_frame(self):
+        """Requests the rendering of the pending changes after the frame has been deferred."""
+        with self._pending_lock:
+            self._frame_timer = None
+        self.executer(self._render_pending, True)
+
+    def flush(self):
+        """Renders all pending changes immediately, also if the next frame has been deferred by the
+        frame rate limit."""
+        with self._pending_lock:
+            if self._frame_timer is not None:
+                self._frame_timer.cancel()
+                self._frame_timer = None
+        self.executer(self._render_pending, True)
+
+    def _merge_changes(self, changes: Dict, later_changes: Dict):
+        """Merges the later changes into the given changes so that applying the merged changes has
+        the same effect as applying both changes one after another.
+
+        Args:
+            changes (Dict): The earlier changes which get updated.
+            later_changes (Dict): The changes which happened afterwards.
+        """
+        changes["scalars"].update(later_changes["scalars"])
+        if later_changes["field_reset"]:
+            changes["field_reset"] = True
+            changes["cells"] = later_changes["cells"]
+            changes["cleared_rows"] = later_changes["cleared_rows"]
+        else:
+            changes["cells"].update(later_changes["cells"])
+            changes["cleared_rows"] = (
+                changes["cleared_rows"] + later_changes["cleared_rows"]
             )
-            self._command_window.able_settings(
-                "change" in serialized_game["allowed_actions"]
+        if later_changes["figure"] is not None:
+            old_figure = (
+                changes["figure"][0]
+                if changes["figure"] is not None
+                else later_changes["figure"][0]
             )
+            changes["figure"] = (old_figure, later_changes["figure"][1])
+        if later_changes.get("ghost") is not None:
+            old_ghost = (
+                changes["ghost"][0]
+                if changes.get("ghost") is not None
+                else later_changes["ghost"][0]
+            )
+            changes["ghost"] = (old_ghost, later_changes["ghost"][1])
+
+    def _render_pending(self):
+        """Renders all pending changes as a single frame. Calling this method when no changes are
+        pending does nothing.
+        The batches of changes are applied one after another so every state transition updates the
+        inputs (and e.g. the highscores at gameover) with the game state at the time of the
+        transition. The voxel world is only updated once for all batches and the game over message
+        is shown afterwards.
+        """
+        with self._pending_lock:
+            pending_changes = self._pending_changes
+            self._pending_changes = []
+            if not pending_changes:
+                return
+            self._frame_started_at = time.monotonic()
+
+        with instrumentation.timed("render"):
+            old_figure_coords = self._get_figure_coords()
+            game_over_msgs = [
+                self._render_changes(changes) for changes in pending_changes
+            ]
+            frame_changes = pending_changes[0]
+            for changes in pending_changes[1:]:
+                self._merge_changes(frame_changes, changes)
+            self._update_voxels(frame_changes, old_figure_coords)
+
+        for game_over_msg in game_over_msgs:
+            if game_over_msg is not None:
+                adsk.core.Application.get().userInterface.messageBox(game_over_msg)
+
+        self._update_timings()
+
+    def _apply_to_mirror(self, changes: Dict):
+        """Updates the mirrored game state according to the passed changes.
+
+        Args:
+            changes (Dict): The changes since the last update.
+        """
+        if changes["field_reset"]:
+            self._game["field"] = {}
+        field = self._game["field"]
+        for coord, color_code in changes["cells"].items():
+            if color_code is None:
+                field.pop(coord, None)
+            else:
+                field[coord] = color_code
+        if changes["figure"] is not None:
+            self._game["figure"] = changes["figure"][1]
+        if changes.get("ghost") is not None:
+            self._game["ghost"] = changes["ghost"][1]
+        self._game.update(changes["scalars"])
+
+    def _render_changes(self, changes: Dict) -> str:
+        """Steps to execute in order to update the screen accordingly. This includes updating the
+        mirrored game and the inputs. The voxel world is updated by the caller.
+        Depending on the context this function must be executed from the execute event handler or
+        directly which is decided by the executer.
+
+        Args:
+            changes (Dict): The changes since the last update.
+
+        Returns:
+            str: The message to show if the game is over, None otherwise.
+        """
+        self._apply_to_mirror(changes)
+        changed = changes["scalars"]
+        game = self._game
+
+        # update buttons
+        if "state" in changed:
+            self._command_window.update_control_buttons(game["allowed_actions"])
+            self._command_window.able_settings("change" in game["allowed_actions"])
 
         # update camera
-        if changes["height"] or changes["width"]:
-            self._set_camera(serialized_game["height"] + 4, serialized_game["width"])
+        if "height" in changed or "width" in changed:
+            self._set_camera(game["height"] + 4, game["width"])
+            self._update_highscores(game)
 
         # update lines text
-        if changes["lines"]:
-            self._command_window.cleared_lines_text.formattedText = str(
-                serialized_game["lines"]
-            )
+        if "lines" in changed:
+            self._command_window.cleared_lines_text.formattedText = str(game["lines"])
 
         # update score text
-        if changes["score"]:
-            self._command_window.score_text.formattedText = str(
-                serialized_game["score"]
-            )
+        if "score" in changed:
+            self._command_window.score_text.formattedText = str(game["score"])
 
         # update level slider
-        if changes["level"]:
-            self._command_window.speed_slider.valueOne = serialized_game["level"]
-
-        # update voxels
-        self._update_voxels(serialized_game)
+        if "level" in changed:
+            self._command_window.speed_slider.valueOne = game["level"]
 
         # update score
-        game_over_msg = None
-        if changes["state"] and serialized_game["state"] == "gameover":
-            game_over_msg = self._update_scores(serialized_game)
-        if game_over_msg is not None:
-            adsk.core.Application.get().userInterface.messageBox(game_over_msg)
-
-        self._last_game = serialized_game
+        if "state" in changed and game["state"] == "gameover":
+            return self._update_scores(game)
+        return None
+
+    def _update_timings(self):
+        """Shows the current timings in the command inputs if enabled. The timings group is only
+        updated every config.CADTRIS_TIMINGS_UPDATE_INTERVAL seconds."""
+        if not (config.CADTRIS_SHOW_TIMINGS and config.CADTRIS_INSTRUMENTATION_ENABLED):
+            return
+        now = time.monotonic()
+        if now - self._timings_shown_at >= config.CADTRIS_TIMINGS_UPDATE_INTERVAL:
+            self._timings_shown_at = now
+            self._command_window.update_timings(instrumentation.format_summaries())
 
     @_with_executer
     def set_grid_size(self, new_grid_size: int):
@@ -597,7 +1311,7 @@ class FusionDisplay(TetrisDisplay):
         Args:
             new_grid_size (int): _description_
         """
-        if "change" in self._last_game["allowed_actions"]:
+        if "change" in self._game["allowed_actions"]:
             self._voxel_world.set_grid_size(
                 new_grid_size,
                 faf.utils.create_progress_dialog(
@@ -605,10 +1319,172 @@ class FusionDisplay(TetrisDisplay):
                     message=config.CADTRIS_PROGRESSBAR_MESSAGE,
                 ),
             )
-            self._set_camera(self._last_game["height"] + 4, self._last_game["width"])
+            self._merged_bodies.set_grid_size(new_grid_size)
+            self._set_camera(self._game["height"] + 4, self._game["width"])
 
     @_with_executer
     def clear_world(self):
         """Clears all voxels in the used voxel world and also removes the component of the voxel world."""
         self._voxel_world.clear()
+        self._merged_bodies.clear()
+        self._voxels = {}
         faf.utils.delete_component(self._voxel_world.component)
+
+    @_with_executer
+    def materialize(self):
+        """Makes sure that everything which is shown consists of bodies and that no hidden bodies
+        are left, e.g. before the bodies are kept after the command has been closed.
+        """
+        self._release_pooled_bodies()
+
+    def _release_pooled_bodies(self):
+        """Deletes the hidden bodies which are kept for reuse by the body pool."""
+        if isinstance(self._voxel_world, BodyPool):
+            self._voxel_world.clear_pool()
+
+
+class TransientFusionDisplay(FusionDisplay):
+    def __init__(
+        self,
+        command_window: InputsWindow,
+        component: adsk.fusion.Component,
+        executer: Callable,
+        highscores: HighscoreStore,
+    ) -> None:
+        """Display which shows the active figure and the ghost figure as custom graphics instead
+        of bodies. Bodies are only created for the walls and for the blocks of the field, i.e.
+        when a figure freezes. Moving the figure only replaces the custom graphics which is much
+        cheaper than replacing bodies.
+
+        Args:
+            command_window (InputsWindow): The command input window which get updated by the display due to
+                changes in game state etc.
+            component (adsk.fusion.Component): The Fusion360 component into which the blocks are build.
+            executer (Callable): A function which takes a Callable and a coalesce flag as inputs and
+                executes the Callable in a appropriate way.
+            highscores (HighscoreStore): The store to which the scores of finished games are added.
+        """
+        self._graphics_group = None  # custom graphics of the figures
+        super().__init__(command_window, component, executer, highscores)
+
+    def _get_voxel_figures(self, serialized_game: Dict) -> Tuple[Dict, List]:
+        return None, None
+
+    def _update_voxels(self, changes: Dict, old_figure_coords: Set[Tuple[int, int]]):
+        super()._update_voxels(changes, old_figure_coords)
+        if (
+            changes["figure"] is not None
+            or changes.get("ghost") is not None
+            or changes["field_reset"]
+            or "width" in changes["scalars"]
+            or "height" in changes["scalars"]
+        ):
+            self._draw_figures()
+
+    def _draw_figures(self):
+        """Replaces the custom graphics by the active figure and the ghost figure of the
+        mirrored game."""
+        self._remove_graphics()
+        figure, ghost = super()._get_voxel_figures(self._game)
+        if not figure and not ghost:
+            return
+
+        self._graphics_group = self._voxel_world.component.customGraphicsGroups.add()
+        if ghost:
+            self._add_graphics(
+                set(ghost) - set(figure["coordinates"] if figure else ()),
+                config.CADTRIS_GHOST_COLOR,
+            )
+        if figure:
+            self._add_graphics(
+                figure["coordinates"], self._convert_color_code(figure["color_code"])
+            )
+        adsk.core.Application.get().activeViewport.refresh()
+
+    def _add_graphics(self, coords: List[Tuple[int, int]], color: Tuple[int]):
+        """Adds the blocks at the given game coordinates to the custom graphics.
+
+        Args:
+            coords (List[Tuple[int, int]]): The game coordinates of the blocks.
+            color (Tuple[int]): The rgbo tuple of the blocks or None for the default color.
+        """
+        if not coords:
+            return
+        graphics = self._graphics_group.addBRepBody(
+            create_temporary_body(
+                [self._game_coords_to_voxel_coords(coord) for coord in coords],
+                self._voxel_world.grid_size,
+                self._get_voxelworld_offset(),
+            )
+        )
+        if color is not None:
+            graphics.color = adsk.fusion.CustomGraphicsSolidColorEffect.create(
+                adsk.core.Color.create(*color)
+            )
+
+    def _remove_graphics(self):
+        """Removes the custom graphics of the figures."""
+        if self._graphics_group is not None and self._graphics_group.isValid:
+            self._graphics_group.deleteMe()
+        self._graphics_group = None
+
+    def set_grid_size(self, new_grid_size: int):
+        super().set_grid_size(new_grid_size)
+        if "change" in self._game["allowed_actions"]:
+            # the figures are redrawn with the new grid size after the pending actions
+            self.executer(self._draw_figures)
+
+    def clear_world(self):
+        self.executer(self._remove_graphics)
+        super().clear_world()
+
+    @FusionDisplay._with_executer
+    def materialize(self):
+        """Replaces the custom graphics of the active figure by bodies. The ghost figure is not
+        kept."""
+        self._remove_graphics()
+        figure = self._game["figure"]
+        if figure:
+            description = self._get_voxel_description(
+                self._convert_color_code(figure["color_code"])
+            )
+            for coord in figure["coordinates"]:
+                voxel_coord = self._game_coords_to_voxel_coords(coord)
+                if voxel_coord not in self._voxels:
+                    self._voxel_world.add_voxel(voxel_coord, **description)
+                    self._voxels[voxel_coord] = description
+        self._release_pooled_bodies()
+
+
+FUSION_DISPLAYS = {
+    "bodies": FusionDisplay,
+    "transient": TransientFusionDisplay,
+}
+
+
+def create_fusion_display(
+    command_window: InputsWindow,
+    component: adsk.fusion.Component,
+    executer: Callable,
+    highscores: HighscoreStore,
+) -> FusionDisplay:
+    """Creates the display for Fusion which is defined in the config.
+
+    Args:
+        command_window (InputsWindow): The command input window which get updated by the display.
+        component (adsk.fusion.Component): The Fusion360 component into which the blocks are build.
+        executer (Callable): A function which takes a Callable and a coalesce flag as inputs and
+            executes the Callable in a appropriate way.
+        highscores (HighscoreStore): The store to which the scores of finished games are added.
+
+    Raises:
+        ValueError: If the configured display backend is not known.
+
+    Returns:
+        FusionDisplay: The display.
+    """
+    if config.CADTRIS_DISPLAY_BACKEND not in FUSION_DISPLAYS:
+        raise ValueError("Invalid display backend.")
+    return FUSION_DISPLAYS[config.CADTRIS_DISPLAY_BACKEND](
+        command_window, component, executer, highscores
+    )
@@ -25,12 +25,30 @@ CADTRIS_COMPONENT_NAME = "CADTris"
 # game related settings
 CADTRIS_INITIAL_VOXEL_SIZE = 10
 
+# allows boards up to 200x400 blocks (e.g. for demos), the game and the displays only process the
+# changed cells so the costs of a tick do not depend on the board size
+CADTRIS_LARGE_BOARDS = False
+
 CADTRIS_INITIAL_WIDTH = 7
 CADTRIS_MIN_WIDTH = 6
-CADTRIS_MAX_WIDTH = 25
+CADTRIS_MAX_WIDTH = 200 if CADTRIS_LARGE_BOARDS else 25
 CADTRIS_INITIAL_HEIGHT = 15
 CADTRIS_MIN_HEIGHT = 9
-CADTRIS_MAX_HEIGHT = 50
+CADTRIS_MAX_HEIGHT = 400 if CADTRIS_LARGE_BOARDS else 50
+
+# {"bitboard", "dict"} storage of the settled blocks, "dict" is kept for comparison
+CADTRIS_FIELD_BACKEND = "bitboard"
+
+# maximum number of queued commands, further moves and rotations of the player are rejected while
+# the queue is full (state changes and gravity ticks are always queued)
+CADTRIS_COMMAND_QUEUE_SIZE = 64
+
+# delayed auto shift: holding a left/right key moves the figure repeatedly after the delay
+CADTRIS_DAS_DELAY = 0.17  # seconds
+CADTRIS_DAS_REPEAT_RATE = 20  # moves per second
+# the repetition stops this long after the last key down event if the key up event gets lost, key
+# down events are repeated by the operating system while a key is held
+CADTRIS_DAS_TIMEOUT = 1  # seconds
 
 CADTRIS_MAX_LEVEL = 5
 CADTRIS_LINES_PER_LEVEL = 6
@@ -47,6 +65,9 @@ CADTRIS_TETRONIMO_COLORS = (
     (255, 0, 255, 255),
 )
 CADTRIS_WALL_COLOR = None
+# shows the landing position of the active figure, every move also changes the ghost voxels
+CADTRIS_SHOW_GHOST = False
+CADTRIS_GHOST_COLOR = (128, 128, 128, 100)
 CADTRIS_BLOCK_APPEARANCE = "Prism-256"
 
 # ui related settings
@@ -61,11 +82,17 @@ CADTRIS_SCORE_INPUT_NAME = "Score"
 CADTRIS_SCORE_INPUT_TOOLTIP = "Your current score."
 CADTRIS_LINES_INPUT_NAME = "Lines"
 CADTRIS_LINES_INPUT_TOOLTIP = "Number of line you have cleared till now."
-CADTRIS_SCORES_GROUP_NAME = "Highscores (Top 5)"
+CADTRIS_SCORES_GROUP_NAME = "Highscores of this size (Top 5)"
 CADTRIS_SCORES_PATH = Path(appdirs.user_state_dir(APPNAME)) / "highscores.json"
+# records every game as a binary replay log which can be rebuilt by replay.ReplayEngine
+CADTRIS_RECORD_REPLAYS = False
+CADTRIS_REPLAYS_FOLDER = Path(appdirs.user_state_dir(APPNAME)) / "replays"
+CADTRIS_REPLAY_SNAPSHOT_INTERVAL = 500  # records between two captured states when seeking
 CADTRIS_DISPLAYED_SCORES = 5
 CADTRIS_NO_SCORE_SYMBOL = "-"
-CADTRIS_MAX_SAVED_SCOES = 100
+CADTRIS_MAX_SAVED_SCOES = 100  # per board size
+# seconds after which the lock file of the highscores is treated as left over by a crashed instance
+CADTRIS_SCORES_LOCK_TIMEOUT = 5
 CADTRIS_SETTINGS_GROUP_NAME = "Settings"
 CADTRIS_HEIGHT_INPUT_NAME = "Height (blocks)"
 CADTRIS_HEIGHT_INPUT_TOOLTIP = "Height of the game in blocks."
@@ -87,10 +114,31 @@ CADTRIS_DIRECT_DESIGN_QUESTION = (
     + "and further operations will not be captured in the timeline."
 )
 CADTRIS_DIRECT_DESIGN_TITLE = "Warning"
+# minimum number of changed voxels of the field for which a progressbar is shown while the
+# display is updated
 MIN_VOXELS_FOR_PROGRESSBAR = 15
 CADTRIS_PROGRESSBAR_TITLE = "Updating Screen"
 CADTRIS_PROGRESSBAR_MESSAGE = "Updating Screen (%p%)"
+# minimum number of changed voxels for which a progressbar is shown while the body pool recreates
+# all voxels, e.g. after the grid size changed
 CADTRIS_VOXEL_CHANGES_FOR_DIALOG = 10
+# {"bodies", "transient"} "transient" shows the falling figure as custom graphics instead of bodies
+CADTRIS_DISPLAY_BACKEND = "bodies"
+# show the settled blocks of every row and the walls as one body per color instead of one body per
+# block, only the active figure consists of single blocks
+CADTRIS_MERGE_BODIES = False
+# reuse the bodies of removed blocks and move the bodies of the settled blocks when rows are
+# cleared instead of recreating them
+CADTRIS_POOL_BODIES = False
+CADTRIS_MAX_POOLED_BODIES = 200  # maximum number of hidden bodies which are kept for reuse
+CADTRIS_MAX_FPS = 20  # maximum number of rendered frames per second, None for no limit
+
+# timing of the stages of the game loop, written to the log when the command is closed
+CADTRIS_INSTRUMENTATION_ENABLED = False
+CADTRIS_INSTRUMENTATION_SAMPLES = 1000  # kept samples per stage
+CADTRIS_SHOW_TIMINGS = False  # requires CADTRIS_INSTRUMENTATION_ENABLED
+CADTRIS_TIMINGS_GROUP_NAME = "Timings"
+CADTRIS_TIMINGS_UPDATE_INTERVAL = 1  # in seconds
 
 # camera/display related settings
 # {"xy", "yz", "xz"} # "xz" will display from the backside FIXME
@@ -0,0 +1,84 @@
+"""This module tests the vectorized batch environment located in batch_env.py against the
+TetrisGame. Requires numpy (pip install -e .[sim]).
+"""
+
+from unittest.mock import Mock
+import sys
+
+# adsk modules are not needed to test headless games
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from addin.commands.CADTris import batch_env
+from addin.commands.CADTris.clock import VirtualClock
+from addin.commands.CADTris.logic_model import TetrisGame
+from addin.commands.CADTris.ui import NullDisplay
+
+WIDTH = 6
+HEIGHT = 16
+
+
+def _play_single_game(seed: int, actions: np.ndarray) -> TetrisGame:
+    game = TetrisGame(NullDisplay(), seed=seed, clock=VirtualClock())
+    game.set_width(WIDTH)
+    game.set_height(HEIGHT)
+    game.start()
+    methods = {
+        batch_env.MOVE_LEFT: game.move_left,
+        batch_env.MOVE_RIGHT: game.move_right,
+        batch_env.ROTATE_RIGHT: game.rotate_right,
+        batch_env.ROTATE_LEFT: game.rotate_left,
+        batch_env.DROP: game.drop,
+    }
+    for action in actions:
+        if action in methods:
+            methods[action]()
+        game.tick()
+    return game
+
+
+def test_batch_matches_single_games():
+    seeds = list(range(100, 140))
+    n_steps = 600
+    actions = np.random.default_rng(0).choice(
+        [
+            batch_env.NOOP,
+            batch_env.MOVE_LEFT,
+            batch_env.MOVE_RIGHT,
+            batch_env.ROTATE_RIGHT,
+            batch_env.ROTATE_LEFT,
+            batch_env.DROP,
+        ],
+        size=(n_steps, len(seeds)),
+    )
+
+    env = batch_env.BatchTetris(seeds, WIDTH, HEIGHT)
+    for step_actions in actions:
+        env.step(step_actions)
+
+    assert env.lines.sum() > 0
+    assert env.gameover.any()
+    for i, seed in enumerate(seeds):
+        game = _play_single_game(seed, actions[:, i])
+        assert game.score == env.scores[i]
+        assert game.lines == env.lines[i]
+        assert game.level == env.levels[i]
+        assert game.pieces == env.pieces[i]
+        assert (game.state == "gameover") == env.gameover[i]
+        cells = {
+            (x, y): int(env.cells[i, y, x]) for y, x in zip(*np.nonzero(env.cells[i]))
+        }
+        assert game._serialize()["field"] == cells  # pylint:disable=protected-access
+
+
+def test_step_returns_score_deltas():
+    env = batch_env.BatchTetris([1, 2, 3], WIDTH, HEIGHT)
+    total = np.zeros(3, dtype=np.int64)
+    for _ in range(300):
+        total += env.step(np.full(3, batch_env.DROP))
+    assert (total == env.scores).all()
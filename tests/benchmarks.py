@@ -0,0 +1,462 @@
+"""This module benchmarks the performance critical paths of the game logic and the displays.
+Like main_test.py it does not need Fusion360, the adsk modules are mocked and the voxel world of
+the FusionDisplay is replaced by a mock so only the preparation of the voxels is measured.
+The module is no pytest module and must be executed directly:
+
+    python tests/benchmarks.py --output benchmarks.json [--compare old_benchmarks.json]
+
+The results are written as JSON so the results of different commits can be compared. Every
+benchmark is executed on the smallest, the initial and the largest board size of the config.
+Additionally the costs of a single gravity tick are measured on boards up to the size of the
+large board mode (see config.CADTRIS_LARGE_BOARDS), these should not depend on the board size.
+The display update after a line clear is measured with the body pool (see
+config.CADTRIS_POOL_BODIES) whose bodies are replaced by simple objects.
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+from unittest.mock import MagicMock, Mock
+
+# adsk modules are not needed to run the benchmarks
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+# the appearances of the body pool are copied from the (empty) material libraries
+sys.modules["adsk"].core.Application.get().materialLibraries = []
+
+from addin import config
+
+# every change is rendered immediately
+config.CADTRIS_MAX_FPS = None
+
+from addin.commands.CADTris import ui
+from addin.commands.CADTris.clock import VirtualClock
+from addin.commands.CADTris.field import create_field, field_from_bytes
+from addin.commands.CADTris.highscores import HighscoreStore
+from addin.commands.CADTris.logic_model import Figure, TetrisGame
+from addin.commands.CADTris.ui import AsciisDisplay, FusionDisplay, NullDisplay
+
+_I_SHAPE_ID = 0  # index of Figure.I in Figure.rotations
+_TICK_BOARD_SIZES = ((10, 20), (25, 50), (50, 100), (100, 200), (200, 400))
+
+
+def _board_sizes() -> List[Tuple[int, int]]:
+    """Returns the board sizes on which the benchmarks are executed.
+
+    Returns:
+        List[Tuple[int, int]]: The (width, height) of the boards.
+    """
+    widths = (
+        config.CADTRIS_MIN_WIDTH,
+        config.CADTRIS_INITIAL_WIDTH,
+        config.CADTRIS_MAX_WIDTH,
+    )
+    heights = (
+        config.CADTRIS_MIN_HEIGHT,
+        config.CADTRIS_INITIAL_HEIGHT,
+        config.CADTRIS_MAX_HEIGHT,
+    )
+    return [(w, h) for w in sorted(set(widths)) for h in sorted(set(heights))]
+
+
+def _measure(
+    func: Callable, setup: Callable = None, number: int = 1000, repeat: int = 5
+) -> Dict:
+    """Measures the time of a single call of func. If a setup function is given it is executed
+    before every call of func and its time is not included.
+
+    Args:
+        func (Callable): The function to measure. Must not accept any arguments.
+        setup (Callable, optional): Function which prepares every call. Defaults to None.
+        number (int, optional): The number of calls per repetition. Defaults to 1000.
+        repeat (int, optional): The number of repetitions. Defaults to 5.
+
+    Returns:
+        Dict: The minimum and median time per call over all repetitions in microseconds and
+            the number of calls.
+    """
+    per_call = []
+    for _ in range(repeat):
+        total = 0.0
+        if setup is None:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            total = time.perf_counter() - start
+        else:
+            for _ in range(number):
+                setup()
+                start = time.perf_counter()
+                func()
+                total += time.perf_counter() - start
+        per_call.append(total / number * 1e6)
+    return {
+        "min_us": min(per_call),
+        "median_us": statistics.median(per_call),
+        "calls": number * repeat,
+    }
+
+
+def _create_fusion_display() -> FusionDisplay:
+    """Creates a FusionDisplay with mocked inputs and a mocked voxel world which executes all
+    actions directly.
+
+    Returns:
+        FusionDisplay: The display.
+    """
+    original_voxel_world = ui.vox.VoxelWorld
+    ui.vox.VoxelWorld = MagicMock()
+    try:
+        return FusionDisplay(
+            Mock(),
+            Mock(),
+            lambda to_execute, coalesce=False: to_execute(),
+            HighscoreStore(Path(__file__).parent / "benchmark_highscores.json"),
+        )
+    finally:
+        ui.vox.VoxelWorld = original_voxel_world
+
+
+def _create_pooled_fusion_display() -> FusionDisplay:
+    """Creates a FusionDisplay which uses the body pool and executes all actions directly. The
+    bodies of the mocked component are simple objects.
+
+    Returns:
+        FusionDisplay: The display.
+    """
+    component = Mock()
+    component.bRepBodies.add = lambda temporary_body: SimpleNamespace(isValid=True)
+    pool_bodies = config.CADTRIS_POOL_BODIES
+    config.CADTRIS_POOL_BODIES = True
+    try:
+        return FusionDisplay(
+            Mock(),
+            component,
+            lambda to_execute, coalesce=False: to_execute(),
+            HighscoreStore(Path(__file__).parent / "benchmark_highscores.json"),
+        )
+    finally:
+        config.CADTRIS_POOL_BODIES = pool_bodies
+
+
+def _create_game(width: int, height: int) -> TetrisGame:
+    """Creates a headless game of the given size whose lower half is filled with rows which have a
+    single gap each and which has an active figure.
+
+    Args:
+        width (int): The width of the board.
+        height (int): The height of the board.
+
+    Returns:
+        TetrisGame: The game.
+    """
+    # pylint:disable=protected-access
+    game = TetrisGame(NullDisplay(), seed=0, clock=VirtualClock())
+    game._width = width
+    game._height = height
+    game._reset_field()
+    rnd = random.Random(0)
+    for y in range(height // 2):
+        gap = rnd.randrange(width)
+        game._field.add(
+            [(x, y) for x in range(width) if x != gap],
+            1 + y % len(config.CADTRIS_TETRONIMO_COLORS),
+        )
+    game._new_figure()
+    return game
+
+
+def _freeze_field(width: int, height: int, n_clears: int) -> bytes:
+    """Creates a field in which a vertical I figure in the first column completes n_clears rows.
+    The rows above are filled with gaps so collapsing the rows has to move them.
+
+    Args:
+        width (int): The width of the board.
+        height (int): The height of the board.
+        n_clears (int): The number of rows the figure completes (0-4).
+
+    Returns:
+        bytes: The field as created by Field.to_bytes.
+    """
+    field = create_field(width, height)
+    for y in range(4):
+        # the rows which must not be completed have a second gap
+        field.add([(x, y) for x in range(1 if y < n_clears else 2, width)], 1)
+    rnd = random.Random(1)
+    for y in range(4, height // 2):
+        gap = rnd.randrange(width)
+        field.add([(x, y) for x in range(width) if x != gap], 2)
+    return field.to_bytes()
+
+
+def _top_clear_field(width: int, height: int) -> bytes:
+    """Creates a full field in which a vertical I figure in the first column completes the four
+    highest rows. All rows below have a single gap.
+
+    Args:
+        width (int): The width of the board.
+        height (int): The height of the board.
+
+    Returns:
+        bytes: The field as created by Field.to_bytes.
+    """
+    field = create_field(width, height)
+    rnd = random.Random(2)
+    for y in range(height - 8):
+        gap = rnd.randrange(width)
+        field.add([(x, y) for x in range(width) if x != gap], 1 + y % 6)
+    for y in range(height - 8, height - 4):
+        field.add([(x, y) for x in range(1, width)], 1 + y % 6)
+    return field.to_bytes()
+
+
+def bench_figure(results: Dict, number: int, repeat: int):
+    """Benchmarks moving and rotating a figure.
+
+    Args:
+        results (Dict): The dict to which the results are added.
+        number (int): The number of calls per repetition.
+        repeat (int): The number of repetitions.
+    """
+    figure = Figure.restore(_I_SHAPE_ID, 0, 5, 5, 1)
+    directions = [1, -1]
+
+    def move():
+        figure.move_horizontal(directions[0])
+        directions.reverse()
+
+    results["figure.move_horizontal"] = _measure(move, number=number, repeat=repeat)
+
+    def move_vertical():
+        figure.move_vertical(directions[0])
+        directions.reverse()
+
+    results["figure.move_vertical"] = _measure(
+        move_vertical, number=number, repeat=repeat
+    )
+    results["figure.rotate"] = _measure(
+        lambda: figure.rotate(1), number=number, repeat=repeat
+    )
+    results["figure.coords"] = _measure(
+        lambda: figure.coords, number=number, repeat=repeat
+    )
+
+
+def bench_logic(results: Dict, width: int, height: int, number: int, repeat: int):
+    """Benchmarks the collision check, freezing a figure with 0-4 cleared lines and the
+    serialization of the game.
+
+    Args:
+        results (Dict): The dict to which the results are added.
+        width (int): The width of the board.
+        height (int): The height of the board.
+        number (int): The number of calls per repetition.
+        repeat (int): The number of repetitions.
+    """
+    # pylint:disable=protected-access
+    size = f"{width}x{height}"
+    game = _create_game(width, height)
+
+    results[f"game._intersects[{size}]"] = _measure(
+        game._intersects, number=number, repeat=repeat
+    )
+    results[f"game._serialize[{size}]"] = _measure(
+        game._serialize, number=number, repeat=repeat
+    )
+
+    for n_clears in range(5):
+        data = _freeze_field(width, height, n_clears)
+
+        def setup():
+            game._field = field_from_bytes(width, height, data)
+            game._active_figure = Figure.restore(_I_SHAPE_ID, 0, -1, 0, 1)
+
+        results[f"game._freeze[{size},clears={n_clears}]"] = _measure(
+            game._freeze, setup, number=number, repeat=repeat
+        )
+
+
+def bench_displays(results: Dict, width: int, height: int, number: int, repeat: int):
+    """Benchmarks the full update of the AsciisDisplay and the creation of the voxel dict of the
+    FusionDisplay.
+
+    Args:
+        results (Dict): The dict to which the results are added.
+        width (int): The width of the board.
+        height (int): The height of the board.
+        number (int): The number of calls per repetition.
+        repeat (int): The number of repetitions.
+    """
+    # pylint:disable=protected-access
+    size = f"{width}x{height}"
+    serialized_game = _create_game(width, height)._serialize()
+
+    # the figure alternates between two positions so every update changes some lines
+    game = _create_game(width, height)
+    game._active_figure.move_vertical(-2)
+    serialized_games = [serialized_game, game._serialize()]
+    ascii_display = AsciisDisplay(headless=True)
+
+    def update_ascii_display():
+        ascii_display.update(serialized_games[0])
+        serialized_games.reverse()
+
+    results[f"AsciisDisplay.update[{size}]"] = _measure(
+        update_ascii_display, number=number, repeat=repeat
+    )
+
+    fusion_display = _create_fusion_display()
+    results[f"FusionDisplay._get_voxel_dict[{size}]"] = _measure(
+        lambda: fusion_display._get_voxel_dict(serialized_game),
+        number=number,
+        repeat=repeat,
+    )
+
+
+def bench_ticks(results: Dict, width: int, height: int, number: int, repeat: int):
+    """Benchmarks a gravity tick including the update of the display for the NullDisplay, the
+    AsciisDisplay and the FusionDisplay. The figure is moved up again before it lands so no
+    figure gets frozen.
+
+    Args:
+        results (Dict): The dict to which the results are added.
+        width (int): The width of the board.
+        height (int): The height of the board.
+        number (int): The number of calls per repetition.
+        repeat (int): The number of repetitions.
+    """
+    # pylint:disable=protected-access
+    size = f"{width}x{height}"
+    displays = {
+        "NullDisplay": NullDisplay(),
+        "AsciisDisplay": AsciisDisplay(headless=True),
+        "FusionDisplay": _create_fusion_display(),
+    }
+    for name, display in displays.items():
+        game = _create_game(width, height)
+        game._display = display
+        game._active_figure = None  # a new figure is created when the game starts
+        game._set_state("running")
+        game._update_display()
+
+        def setup():
+            # the lower half of the field is filled
+            if game._active_figure.position[1] <= height // 2 + 1:
+                game._active_figure.move_vertical(height // 2)
+
+        results[f"tick[{name},{size}]"] = _measure(
+            game.tick, setup, number=number, repeat=repeat
+        )
+
+
+def bench_line_clear(results: Dict, width: int, height: int, number: int, repeat: int):
+    """Benchmarks the update of the FusionDisplay with the body pool after a figure cleared the
+    four highest rows of a full board. The display shows the board before the figure froze.
+
+    Args:
+        results (Dict): The dict to which the results are added.
+        width (int): The width of the board.
+        height (int): The height of the board.
+        number (int): The number of calls per repetition.
+        repeat (int): The number of repetitions.
+    """
+    # pylint:disable=protected-access
+    size = f"{width}x{height}"
+    data = _top_clear_field(width, height)
+    games = []
+
+    def setup():
+        game = TetrisGame(_create_pooled_fusion_display(), seed=0, clock=VirtualClock())
+        game._width = width
+        game._height = height
+        game._field = field_from_bytes(width, height, data)
+        game._active_figure = Figure.restore(_I_SHAPE_ID, 0, -1, height - 8, 1)
+        game._update_display()
+        game._freeze()
+        games[:] = [game]
+
+    results[f"FusionDisplay.line_clear[BodyPool,{size}]"] = _measure(
+        lambda: games[0]._update_display(), setup, number=number, repeat=repeat
+    )
+
+
+def _metadata() -> Dict:
+    """Collects information about the environment in which the benchmarks were executed.
+
+    Returns:
+        Dict: The commit, the python version, the platform, the field backend and the time.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "field_backend": config.CADTRIS_FIELD_BACKEND,
+        "timestamp": int(time.time()),
+    }
+
+
+def compare(results: Dict, baseline: Dict):
+    """Prints the relative change of every benchmark compared to a baseline.
+
+    Args:
+        results (Dict): The current results.
+        baseline (Dict): The results to compare with.
+    """
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name}: {result['min_us']:.2f}us (new)")
+            continue
+        change = result["min_us"] / baseline[name]["min_us"] - 1
+        print(
+            f"{name}: {baseline[name]['min_us']:.2f}us -> {result['min_us']:.2f}us "
+            + f"({change:+.1%})"
+        )
+
+
+def main(args: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, default=Path("benchmarks.json"))
+    parser.add_argument("--compare", type=Path, default=None)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(args)
+
+    results = {}
+    bench_figure(results, args.number * 10, args.repeat)
+    for width, height in _board_sizes():
+        bench_logic(results, width, height, args.number, args.repeat)
+        bench_displays(results, width, height, args.number, args.repeat)
+        bench_line_clear(results, width, height, args.number // 20, args.repeat)
+    for width, height in _TICK_BOARD_SIZES:
+        bench_ticks(results, width, height, args.number, args.repeat)
+
+    args.output.write_text(
+        json.dumps({"metadata": _metadata(), "results": results}, indent=2)
+    )
+    print(f"Wrote {len(results)} results to {args.output}.")
+
+    if args.compare is not None:
+        compare(results, json.loads(args.compare.read_text())["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""This module tests the game clocks located in clock.py."""
+
+from unittest.mock import Mock
+import sys
+import threading
+import time
+
+# adsk modules are not needed to test the clocks
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin.commands.CADTris.clock import RealTimeClock, VirtualClock
+
+
+def _clock(interval: float = 1):
+    steps = []
+    clock = VirtualClock(interval)
+    clock.attach(lambda n: steps.append((clock.now(), n)))
+    return clock, steps
+
+
+def test_advance():
+    clock, steps = _clock()
+    clock.advance(5)
+    # a paused clock executes no steps
+    assert steps == []
+
+    clock.start()
+    clock.advance(3.5)
+    assert steps == [(6, 1), (7, 1), (8, 1)]
+    clock.advance(0.25)
+    assert len(steps) == 3
+    clock.advance(0.25)
+    assert steps[-1] == (9, 1)
+    assert clock.now() == 9
+
+
+def test_pause_start_and_reset_keep_the_remaining_time():
+    clock, steps = _clock()
+    clock.start()
+    clock.advance(0.75)
+    clock.pause()
+    clock.advance(10)
+    assert steps == []
+
+    clock.start()
+    clock.advance(0.125)
+    assert steps == []
+    clock.advance(0.125)
+    assert steps == [(11, 1)]
+
+    clock.advance(0.5)
+    clock.reset()
+    clock.advance(0.75)
+    assert len(steps) == 1
+    clock.advance(0.25)
+    assert steps[-1] == (12.5, 1)
+
+    # a reset while paused restarts the step as well
+    clock.advance(0.5)
+    clock.pause()
+    clock.reset()
+    clock.start()
+    clock.advance(0.75)
+    assert len(steps) == 2
+    clock.advance(0.25)
+    assert steps[-1] == (14, 1)
+
+
+def test_interval_change():
+    clock, steps = _clock()
+    clock.start()
+    clock.advance(1)
+    clock.interval = 0.5
+    # the already scheduled step keeps its deadline
+    clock.advance(1.5)
+    assert [now for now, _ in steps] == [1, 2, 2.5]
+
+    def callback(n_steps):
+        steps.append((clock.now(), n_steps))
+        clock.interval = 2
+
+    # a change within the callback is used after the already scheduled step
+    clock.attach(callback)
+    clock.advance(3.5)
+    assert [now for now, _ in steps] == [1, 2, 2.5, 3, 3.5, 5.5]
+
+
+def test_timer():
+    clock, steps = _clock()
+    timer_steps = []
+    clock.start_timer(lambda n: timer_steps.append((clock.now(), n)), 0.25, 0.5)
+    clock.start()
+    clock.advance(1.5)
+    assert timer_steps == [(0.25, 1), (0.75, 1), (1.25, 1)]
+
+    # the timer is paused with the clock
+    clock.pause()
+    clock.advance(3)
+    clock.start()
+    clock.advance(0.25)
+    assert timer_steps[-1] == (4.75, 1)
+
+    # a new timer replaces the running one
+    new_timer_steps = []
+    clock.start_timer(lambda n: new_timer_steps.append((clock.now(), n)), 0.5, 0.5)
+    clock.advance(0.5)
+    assert len(timer_steps) == 4
+    assert new_timer_steps == [(5.25, 1)]
+
+    clock.stop_timer()
+    clock.advance(3)
+    assert len(new_timer_steps) == 1
+    # the gravity steps are not influenced by the timer
+    assert [now for now, _ in steps] == [1, 5, 6, 7, 8]
+
+
+def test_real_time_clock_uses_deadlines():
+    interval = 0.02
+    steps = []
+    done = threading.Event()
+    clock = RealTimeClock(interval)
+
+    def callback(n_steps):
+        steps.append(n_steps)
+        if len(steps) == 1:
+            # a slow callback must not delay the following steps
+            time.sleep(2.5 * interval)
+        if sum(steps) >= 6:
+            done.set()
+
+    clock.attach(callback)
+    clock.start()
+    first_deadline = clock._deadline  # pylint:disable=protected-access
+    assert done.wait(5)
+    clock.stop()
+
+    # the missed steps are passed together and the deadlines stay on the initial schedule
+    assert steps[1] >= 2
+    assert clock._deadline == pytest.approx(  # pylint:disable=protected-access
+        first_deadline + sum(steps) * interval
+    )
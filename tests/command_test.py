@@ -0,0 +1,117 @@
+"""This module tests the coalescing of queued Fusion calls by the executer located in command.py."""
+
+from unittest.mock import Mock, call, patch
+import sys
+
+# adsk modules are mocked, the custom event is replaced in the tests
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin.commands.CADTris import command
+
+
+@pytest.fixture(name="queued_command")
+def fixture_queued_command(monkeypatch):
+    for name in ("Workspace", "Tab", "Panel", "Control"):
+        monkeypatch.setattr(command.faf, name, Mock())
+    monkeypatch.setattr(
+        command.faf.AddinCommandBase, "__init__", lambda self, *args, **kwargs: None
+    )
+    cadtris_command = command.CADTrisCommand(Mock())
+    # calls from other handlers than commandCreated and destroy are queued
+    cadtris_command.last_handler = "inputChanged"
+    with patch.object(command.adsk.core.Application, "get") as get:
+        yield cadtris_command, get.return_value.fireCustomEvent
+
+
+def test_coalesced_calls_are_dropped(queued_command):
+    cadtris_command, fire_custom_event = queued_command
+    executer = cadtris_command._executer  # pylint:disable=protected-access
+    calls = Mock()
+    render, clear = calls.render, calls.clear
+
+    executer(render, coalesce=True)
+    executer(clear)
+    executer(render, coalesce=True)
+    executer(clear)
+
+    # a single custom event executes the whole batch
+    fire_custom_event.assert_called_once()
+    assert cadtris_command.dropped_updates == 1
+    assert [(f, c) for f, c, _ in cadtris_command.execution_queue] == [
+        (render, True),
+        (clear, False),
+        (clear, False),
+    ]
+
+    cadtris_command.execute(Mock())
+    assert calls.mock_calls == [call.render(), call.clear(), call.clear()]
+    assert not cadtris_command.execution_queue
+
+    # the next batch needs a new event and accepts the coalesced callable again
+    executer(render, coalesce=True)
+    executer(render, coalesce=True)
+    assert fire_custom_event.call_count == 2
+    assert cadtris_command.dropped_updates == 2
+    assert len(cadtris_command.execution_queue) == 1
+
+
+def test_other_calls_keep_their_order(queued_command):
+    cadtris_command, fire_custom_event = queued_command
+    executer = cadtris_command._executer  # pylint:disable=protected-access
+    executed = []
+    actions = [lambda i=i: executed.append(i) for i in range(3)]
+
+    for i in range(30):
+        executer(actions[i % 3])
+    fire_custom_event.assert_called_once()
+    assert cadtris_command.dropped_updates == 0
+
+    cadtris_command.execute(Mock())
+    assert executed == [i % 3 for i in range(30)]
+
+
+def test_calls_during_the_execution_fire_a_new_event(queued_command):
+    cadtris_command, fire_custom_event = queued_command
+    executer = cadtris_command._executer  # pylint:disable=protected-access
+    render = Mock()
+
+    def enqueue_render():
+        executer(render, coalesce=True)
+
+    executer(enqueue_render)
+    cadtris_command.execute(Mock())
+    render.assert_not_called()
+    assert fire_custom_event.call_count == 2
+
+    cadtris_command.execute(Mock())
+    render.assert_called_once()
+
+
+@pytest.mark.parametrize("keep_bodies", (False, True))
+def test_destroy_renders_the_last_frame_first(queued_command, keep_bodies):
+    cadtris_command, fire_custom_event = queued_command
+    calls = Mock()
+    cadtris_command.controls = calls.controls
+    cadtris_command.game = calls.game
+    cadtris_command.display = calls.display
+    event_args = Mock()
+    event_args.command.commandInputs.itemById.return_value.value = keep_bodies
+
+    cadtris_command.destroy(event_args)
+    # the pending frame is rendered before the bodies are deleted or kept
+    assert calls.mock_calls == [
+        call.controls.stop(),
+        call.game.terminate(),
+        call.display.flush(),
+        call.display.materialize() if keep_bodies else call.display.clear_world(),
+    ]
+
+    # within the destroy handler the frame is rendered directly instead of being queued
+    render = Mock()
+    cadtris_command._executer(render, coalesce=True)  # pylint:disable=protected-access
+    render.assert_called_once()
+    fire_custom_event.assert_not_called()
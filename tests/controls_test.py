@@ -0,0 +1,124 @@
+"""This module tests the delayed auto shift and the key mapping located in controls.py on a
+virtual clock.
+"""
+
+from unittest.mock import Mock
+import sys
+
+# adsk modules are not needed to test the controls
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin import config
+from addin.commands.CADTris.clock import VirtualClock
+from addin.commands.CADTris.controls import AutoShift, KeyboardControls
+
+DELAY = 0.25
+INTERVAL = 0.125
+
+
+@pytest.fixture(name="auto_shift")
+def fixture_auto_shift(monkeypatch):
+    # exactly representable times avoid rounding issues of the virtual clock
+    monkeypatch.setattr(config, "CADTRIS_DAS_DELAY", DELAY)
+    monkeypatch.setattr(config, "CADTRIS_DAS_REPEAT_RATE", 1 / INTERVAL)
+    monkeypatch.setattr(config, "CADTRIS_DAS_TIMEOUT", 1)
+    moves = []
+    clock = VirtualClock()
+    clock.start()
+    return AutoShift(moves.append, clock), clock, moves
+
+
+def test_single_press(auto_shift):
+    shift, clock, moves = auto_shift
+    shift.press(1)
+    assert moves == [1]
+    clock.advance(DELAY / 2)
+    shift.release(1)
+    clock.advance(5)
+    assert moves == [1]
+
+
+def test_repeats(auto_shift):
+    shift, clock, moves = auto_shift
+    shift.press(-1)
+    clock.advance(DELAY - INTERVAL / 2)
+    assert moves == [-1]
+    clock.advance(INTERVAL / 2)
+    assert moves == [-1, -1]
+    # repeated key down events of the operating system do not move the figure
+    shift.press(-1)
+    clock.advance(4 * INTERVAL)
+    assert moves == [-1] * 6
+
+    shift.release(-1)
+    clock.advance(5)
+    assert moves == [-1] * 6
+
+
+def test_stop(auto_shift):
+    shift, clock, moves = auto_shift
+    shift.press(1)
+    clock.advance(DELAY)
+    shift.stop()
+    clock.advance(5)
+    assert moves == [1, 1]
+    # after a stop the key acts like a new press
+    shift.press(1)
+    assert moves == [1, 1, 1]
+
+
+def test_timeout(auto_shift):
+    shift, clock, moves = auto_shift
+    shift.press(1)
+    clock.advance(0.75)
+    # a repeated key down event restarts the timeout
+    shift.press(1)
+    clock.advance(5)
+    repeats = int((0.75 + config.CADTRIS_DAS_TIMEOUT - DELAY) / INTERVAL) + 1
+    assert moves == [1] * (1 + repeats)
+
+
+def test_opposite_direction_takes_over(auto_shift):
+    shift, clock, moves = auto_shift
+    shift.press(1)
+    clock.advance(DELAY)
+    assert moves == [1, 1]
+
+    shift.press(-1)
+    assert moves == [1, 1, -1]
+    # the old key is still held and released later
+    shift.release(1)
+    clock.advance(DELAY - INTERVAL / 2)
+    assert moves == [1, 1, -1]
+    clock.advance(INTERVAL)
+    assert moves == [1, 1, -1, -1]
+    shift.release(-1)
+    clock.advance(5)
+    assert moves == [1, 1, -1, -1]
+
+
+def test_keyboard_controls(auto_shift):
+    shift, clock, moves = auto_shift
+    action = Mock()
+    controls = KeyboardControls({1: action}, {2: -1, 3: 1}, shift)
+    controls.key_down(1)
+    controls.key_down(1)
+    controls.key_down(4)
+    assert action.call_count == 2
+
+    controls.key_down(2)
+    controls.key_up(1)
+    clock.advance(DELAY)
+    controls.key_up(2)
+    clock.advance(5)
+    assert moves == [-1, -1]
+
+    controls.key_down(3)
+    clock.advance(DELAY)
+    controls.stop()
+    clock.advance(5)
+    assert moves == [-1, -1, 1, 1]
@@ -0,0 +1,102 @@
+"""This module tests the field backends located in field.py.
+The bitboard backend must behave exactly like the dictionary backend.
+"""
+
+from unittest.mock import Mock
+import random
+import sys
+
+# adsk modules are not needed to test the field
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin.commands.CADTris.field import BitboardField, DictField
+
+
+def _random_cells(rnd: random.Random, width: int, height: int) -> dict:
+    """Creates random cells with some full rows and some cells above the height."""
+    cells = {}
+    for y in range(height + 3):
+        full = y < height and rnd.random() < 0.3
+        for x in range(width):
+            if full or rnd.random() < 0.4:
+                cells[(x, y)] = rnd.randint(1, 7)
+    return cells
+
+
+def _fill(field_class, width: int, height: int, cells: dict):
+    field = field_class(width, height)
+    for coord, color_code in cells.items():
+        field.add([coord], color_code)
+    return field
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_backends_are_equal(seed):
+    rnd = random.Random(seed)
+    width, height = rnd.randint(6, 12), rnd.randint(9, 20)
+    cells = _random_cells(rnd, width, height)
+    dict_field = _fill(DictField, width, height, cells)
+    bitboard_field = _fill(BitboardField, width, height, cells)
+    fields = (dict_field, bitboard_field)
+
+    assert bitboard_field.to_dict() == dict_field.to_dict()
+    assert bitboard_field.full_rows() == dict_field.full_rows()
+    assert bitboard_field.row_masks() == dict_field.row_masks()
+    assert bitboard_field.column_heights() == dict_field.column_heights()
+    assert bitboard_field.take_changes() == dict_field.take_changes()
+
+    full_rows = dict_field.full_rows()
+    for field in fields:
+        field.collapse_rows(full_rows)
+    assert bitboard_field.to_dict() == dict_field.to_dict()
+    assert bitboard_field.column_heights() == dict_field.column_heights()
+    assert bitboard_field.take_changes() == dict_field.take_changes()
+    assert bitboard_field.take_cleared_rows() == dict_field.take_cleared_rows()
+
+    for _ in range(50):
+        coord = (rnd.randint(-2, width + 1), rnd.randint(-2, height + 5))
+        assert bitboard_field.intersects([coord]) == dict_field.intersects([coord])
+
+
+def test_collapse_rows():
+    field = BitboardField(6, 9)
+    field.add([(x, 0) for x in range(6)], 1)
+    field.add([(0, 1), (1, 2)], 2)
+    field.take_changes()
+
+    assert field.full_rows() == [0]
+    field.collapse_rows([0])
+    assert field.to_dict() == {(0, 0): 2, (1, 1): 2}
+    assert field.column_heights() == (1, 2, 0, 0, 0, 0)
+    assert field.take_changes() == {
+        **{(x, 0): None for x in range(1, 6)},
+        (0, 0): 2,
+        (0, 1): None,
+        (1, 1): 2,
+        (1, 2): None,
+    }
+    assert field.take_cleared_rows() == [[0]]
+
+
+def test_full_rows_ignores_rows_above_height():
+    for field_class in (DictField, BitboardField):
+        field = field_class(6, 9)
+        field.add([(x, 9) for x in range(6)], 1)
+        assert field.full_rows() == []
+
+
+@pytest.mark.parametrize("field_class", (DictField, BitboardField))
+def test_bytes_round_trip(field_class):
+    rnd = random.Random(1)
+    field = _fill(field_class, 10, 15, _random_cells(rnd, 10, 15))
+
+    restored = field_class.from_bytes(10, 15, field.to_bytes())
+    assert restored.to_dict() == field.to_dict()
+    assert restored.take_changes() == {}
+    # both backends use the same binary representation
+    other_class = BitboardField if field_class is DictField else DictField
+    assert other_class.from_bytes(10, 15, field.to_bytes()).to_dict() == field.to_dict()
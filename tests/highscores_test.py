@@ -0,0 +1,134 @@
+"""This module tests the highscore file handling located in highscores.py."""
+
+from unittest.mock import Mock
+import json
+import sys
+import time
+
+# adsk modules are not needed to test the highscores
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin import config
+from addin.commands.CADTris.highscores import HighscoreEntry, HighscoreStore
+
+
+def test_missing_file(tmp_path):
+    store = HighscoreStore(tmp_path / "highscores.json")
+    assert store.board_sizes == []
+    assert store.add(HighscoreEntry(5, 10, 15)) == 0
+    reloaded = HighscoreStore(tmp_path / "highscores.json")
+    assert reloaded.leaderboard(10, 15).scores == [5]
+
+
+def test_legacy_file_is_converted(tmp_path):
+    path = tmp_path / "highscores.json"
+    path.write_text(json.dumps([9, 5, 5, 1]), encoding="utf-8")
+
+    # the legacy scores are shown on the board of the initial size
+    size = (config.CADTRIS_INITIAL_WIDTH, config.CADTRIS_INITIAL_HEIGHT)
+    store = HighscoreStore(path)
+    assert store.board_sizes == [size]
+    assert store.leaderboard(*size).scores == [9, 5, 5, 1]
+    assert store.leaderboard(*size).top(1) == [HighscoreEntry(9, *size)]
+    store.add(HighscoreEntry(7, 10, 15, 2, 3, 12.5, 0))
+    assert store.add(HighscoreEntry(6, *size)) == 1
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["version"] == 2
+    reloaded = HighscoreStore(path)
+    assert reloaded.leaderboard(*size).scores == [9, 6, 5, 5, 1]
+    assert reloaded.leaderboard(10, 15).top(1) == [
+        HighscoreEntry(7, 10, 15, 2, 3, 12.5, 0)
+    ]
+
+
+def test_entries_of_other_stores_are_kept(tmp_path):
+    path = tmp_path / "highscores.json"
+    store = HighscoreStore(path)
+    other_store = HighscoreStore(path)
+    assert store.leaderboard(10, 15).scores == []
+
+    other_store.add(HighscoreEntry(3, 10, 15))
+    store.add(HighscoreEntry(4, 10, 15))
+    assert HighscoreStore(path).leaderboard(10, 15).scores == [4, 3]
+
+
+def test_invalid_file_is_moved_aside(tmp_path):
+    path = tmp_path / "highscores.json"
+    path.write_text("{invalid", encoding="utf-8")
+
+    store = HighscoreStore(path)
+    assert store.leaderboard(10, 15).scores == []
+    # the file is only moved while holding the file lock
+    assert path.read_text(encoding="utf-8") == "{invalid"
+    assert not list(tmp_path.glob("*.corrupt"))
+    store.add(HighscoreEntry(4, 10, 15))
+
+    corrupt_files = list(tmp_path.glob("highscores.json.*.corrupt"))
+    assert len(corrupt_files) == 1
+    assert corrupt_files[0].read_text(encoding="utf-8") == "{invalid"
+    assert HighscoreStore(path).leaderboard(10, 15).scores == [4]
+
+
+def test_unreadable_file_is_not_overwritten(tmp_path):
+    # a directory can not be opened as file
+    path = tmp_path / "highscores.json"
+    path.mkdir()
+
+    store = HighscoreStore(path)
+    with pytest.raises(OSError):
+        store.add(HighscoreEntry(4, 10, 15))
+    assert path.is_dir()
+
+
+def test_truncation_per_board_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CADTRIS_MAX_SAVED_SCOES", 3)
+    store = HighscoreStore(tmp_path / "highscores.json")
+    for score in range(5):
+        store.add(HighscoreEntry(score, 10, 15))
+    store.add(HighscoreEntry(1, 12, 20))
+
+    reloaded = HighscoreStore(tmp_path / "highscores.json")
+    assert sorted(reloaded.board_sizes) == [(10, 15), (12, 20)]
+    assert reloaded.leaderboard(10, 15).scores == [4, 3, 2]
+    assert reloaded.leaderboard(12, 20).scores == [1]
+
+
+def test_daily_boards(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CADTRIS_MAX_SAVED_SCOES", 2)
+    day = 24 * 60 * 60
+    today = time.mktime((2021, 1, 2, 12, 0, 0, 0, 0, -1))
+    date = time.strftime("%Y-%m-%d", time.localtime(today))
+    yesterday = time.strftime("%Y-%m-%d", time.localtime(today - day))
+
+    store = HighscoreStore(tmp_path / "highscores.json")
+    store.add(HighscoreEntry(5, 10, 15, timestamp=int(today - day)))
+    store.add(HighscoreEntry(3, 10, 15, timestamp=int(today)))
+    store.add(HighscoreEntry(4, 10, 15, timestamp=int(today)))
+    # daily boards only contain the entries which are kept in the board of their size
+    assert store.leaderboard(10, 15).scores == [5, 4]
+    assert store.leaderboard(10, 15, date).scores == [4]
+    store.add(HighscoreEntry(6, 10, 15, timestamp=int(today)))
+
+    reloaded = HighscoreStore(tmp_path / "highscores.json")
+    for s in (store, reloaded):
+        assert s.leaderboard(10, 15).scores == [6, 5]
+        assert s.leaderboard(10, 15, date).scores == [6]
+        assert s.leaderboard(10, 15, yesterday).scores == [5]
+        assert s.leaderboard(12, 20, date).scores == []
+
+
+def test_rank_ties(tmp_path):
+    store = HighscoreStore(tmp_path / "highscores.json")
+    assert store.add(HighscoreEntry(5, 10, 15, lines=1)) == 0
+    assert store.add(HighscoreEntry(7, 10, 15, lines=2)) == 0
+    # entries with the same score are ranked below the existing ones
+    assert store.add(HighscoreEntry(5, 10, 15, lines=3)) == 2
+    board = store.leaderboard(10, 15)
+    assert board.rank(5) == 3
+    assert board.rank(6) == 1
+    assert [entry.lines for entry in board.top(3)] == [2, 1, 3]
@@ -0,0 +1,314 @@
+"""This module tests the CADTris game logic located in logic_model.py with headless games.
+The test is not related to anything of Fusion360.
+However there are some Fusion specific import statements in the related packages.
+Therefore we mock them.
+"""
+
+from unittest.mock import Mock
+import random
+import sys
+from typing import Callable, Dict
+
+# adsk modules are not needed to test headless games
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin import config
+from addin.commands.CADTris.clock import VirtualClock
+from addin.commands.CADTris.logic_model import Figure, TetrisGame
+from addin.commands.CADTris.replay import ReplayRecorder
+from addin.commands.CADTris.ui import TetrisDisplay
+
+
+class ChangesDisplay(TetrisDisplay):
+    """Display which rebuilds the game only from the passed changes."""
+
+    def __init__(self):
+        self.scalars = {}
+        self.field = {}
+        self.figure = None
+        self.ghost = None
+
+    def update(self, serialized_game: Dict) -> None:
+        pass
+
+    def apply_changes(
+        self, changes: Dict, get_serialized_game: Callable[[], Dict]
+    ) -> None:
+        if changes["field_reset"]:
+            serialized_game = get_serialized_game()
+            self.scalars = {
+                k: v
+                for k, v in serialized_game.items()
+                if k not in ("field", "figure", "ghost")
+            }
+            self.field = serialized_game["field"]
+            self.figure = serialized_game["figure"]
+            self.ghost = serialized_game["ghost"]
+            return
+        self.scalars.update(changes["scalars"])
+        for coord, color_code in changes["cells"].items():
+            # cells which were added and removed since the last update are removed as well
+            if color_code is None:
+                self.field.pop(coord, None)
+            else:
+                self.field[coord] = color_code
+        if changes["figure"] is not None:
+            assert changes["figure"][0] == self.figure
+            self.figure = changes["figure"][1]
+        if changes["ghost"] is not None:
+            assert changes["ghost"][0] == self.ghost
+            self.ghost = changes["ghost"][1]
+
+
+def _random_actions(game: TetrisGame, rnd: random.Random, n: int):
+    actions = (
+        game.move_left,
+        game.move_right,
+        game.rotate_left,
+        game.rotate_right,
+        game.drop,
+        game.tick,
+    )
+    for _ in range(n):
+        rnd.choice(actions)()
+        if game.state == "gameover":
+            game.reset()
+            game.start()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_changes_rebuild_the_game(seed):
+    display = ChangesDisplay()
+    game = TetrisGame(display, seed=seed, clock=VirtualClock())
+    game.set_width(8)
+    game.set_height(12)
+    game.start()
+
+    rnd = random.Random(seed)
+    for _ in range(20):
+        _random_actions(game, rnd, 25)
+        serialized = game._serialize()  # pylint:disable=protected-access
+        assert display.field == serialized["field"]
+        assert display.figure == serialized["figure"]
+        assert display.ghost == serialized["ghost"]
+        assert all(display.scalars[k] == serialized[k] for k in display.scalars)
+
+
+def _shape_ids(seed: int, n: int) -> list:
+    """Returns the shapes of the first n figures of a game which only drops them."""
+    game = TetrisGame(ChangesDisplay(), seed=seed, clock=VirtualClock())
+    game.start()
+    shape_ids = []
+    for _ in range(n):
+        if game.state == "gameover":
+            game.reset()
+            game.start()
+        figure = game._active_figure  # pylint:disable=protected-access
+        shape_ids.append(figure.shape_id)
+        game.drop()
+    return shape_ids
+
+
+def test_seed_determines_the_game():
+    serialized = []
+    for seed in (7, 7):
+        game = TetrisGame(ChangesDisplay(), seed=seed, clock=VirtualClock())
+        game.start()
+        _random_actions(game, random.Random(0), 500)
+        serialized.append(game._serialize())  # pylint:disable=protected-access
+    assert serialized[0] == serialized[1]
+
+    assert _shape_ids(7, 30) == _shape_ids(7, 30)
+    assert _shape_ids(7, 30) != _shape_ids(8, 30)
+
+
+def test_full_queue_keeps_state_changes():
+    game = TetrisGame(ChangesDisplay(), seed=1, clock=VirtualClock())
+    game.start()
+    # commands are only queued while another thread processes the queue
+    game._action_lock.acquire()  # pylint:disable=protected-access
+    for _ in range(config.CADTRIS_COMMAND_QUEUE_SIZE + 10):
+        game.rotate_right()
+    game.tick()
+    game.pause()
+    commands = list(game._commands)  # pylint:disable=protected-access
+    game._action_lock.release()  # pylint:disable=protected-access
+    game._process_commands()  # pylint:disable=protected-access
+
+    assert len(commands) == config.CADTRIS_COMMAND_QUEUE_SIZE + 2
+    assert [required_action for required_action, _, _ in commands[-2:]] == [
+        "move",
+        "pause",
+    ]
+    assert game.state == "pause"
+
+
+def test_fold_horizontal_moves():
+    game = TetrisGame(ChangesDisplay(), seed=2, clock=VirtualClock())
+    game.set_width(20)
+    game.start()
+    x = game._active_figure.position[0]  # pylint:disable=protected-access
+    moves = []
+    move_horizontal = game._move_horizontal  # pylint:disable=protected-access
+
+    def record_move(n):
+        moves.append(n)
+        move_horizontal(n)
+
+    game._move_horizontal = record_move  # pylint:disable=protected-access
+
+    game._action_lock.acquire()  # pylint:disable=protected-access
+    for _ in range(3):
+        game.move_left()
+    game.move_horizontal(-2)
+    game.move_right()
+    game.move_right()
+    game.rotate_left()
+    game.move_left()
+    game._action_lock.release()  # pylint:disable=protected-access
+    game._process_commands()  # pylint:disable=protected-access
+
+    # only directly following moves in the same direction are folded
+    assert moves == [-5, 2, -1]
+    assert game._active_figure.position[0] == x - 4  # pylint:disable=protected-access
+
+
+def _stepped_landing_y(game: TetrisGame) -> int:
+    """Finds the landing row by moving the active figure down until it intersects."""
+    figure = game._active_figure  # pylint:disable=protected-access
+    x, y = figure.position
+    landing_figure = Figure.restore(
+        figure.shape_id, figure.rotation_index, x, y, figure.color_code
+    )
+    game._active_figure = landing_figure  # pylint:disable=protected-access
+    while not game._intersects():  # pylint:disable=protected-access
+        landing_figure.move_vertical(-1)
+    game._active_figure = figure  # pylint:disable=protected-access
+    return landing_figure.position[1] + 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_landing_y(seed):
+    rnd = random.Random(seed)
+    game = TetrisGame(ChangesDisplay(), seed=seed, clock=VirtualClock())
+    game.set_width(10)
+    game.set_height(15)
+    game.start()
+    for _ in range(200):
+        # random fields contain holes and overhangs below which figures can be placed
+        game._reset_field()  # pylint:disable=protected-access
+        density = rnd.random() * 0.6
+        game._field.add(  # pylint:disable=protected-access
+            [(x, y) for x in range(10) for y in range(15) if rnd.random() < density], 1
+        )
+        shape_id = rnd.randrange(len(Figure.rotations))
+        game._active_figure = Figure.restore(  # pylint:disable=protected-access
+            shape_id,
+            rnd.randrange(len(Figure.rotations[shape_id])),
+            rnd.randint(-1, 8),
+            rnd.randint(-1, 15),
+            1,
+        )
+        if game._intersects():  # pylint:disable=protected-access
+            continue
+        position = game._active_figure.position  # pylint:disable=protected-access
+        assert game._landing_y() == _stepped_landing_y(
+            game
+        )  # pylint:disable=protected-access
+        assert (
+            game._active_figure.position == position
+        )  # pylint:disable=protected-access
+
+
+def test_landing_y_below_overhang():
+    game = TetrisGame(ChangesDisplay(), seed=1, clock=VirtualClock())
+    game.set_width(10)
+    game.set_height(15)
+    game.start()
+    # a roof in row 6 over an empty area and a step in row 0
+    roof = [(x, 6) for x in range(1, 9)]
+    game._field.add(roof + [(2, 0)], 1)  # pylint:disable=protected-access
+    # O figure below the roof whose cells are in the columns 3 and 4
+    figure = Figure.restore(6, 0, 2, 3, 1)
+    game._active_figure = figure  # pylint:disable=protected-access
+    assert game._landing_y() == 0  # pylint:disable=protected-access
+    assert _stepped_landing_y(game) == 0
+    figure.move_horizontal(-1)
+    assert game._landing_y() == 1  # pylint:disable=protected-access
+    assert _stepped_landing_y(game) == 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_drop_lands_at_the_ghost(seed):
+    game = TetrisGame(ChangesDisplay(), seed=seed, clock=VirtualClock())
+    game.start()
+    rnd = random.Random(seed)
+    landed = []
+    freeze = game._freeze  # pylint:disable=protected-access
+
+    def record_landing():
+        landed.append(sorted(game._active_figure.coords))
+        freeze()
+
+    game._freeze = record_landing  # pylint:disable=protected-access
+    for _ in range(30):
+        _random_actions(game, rnd, 5)
+        if game.state != "running":
+            continue
+        ghost = game._serialize()["ghost"]  # pylint:disable=protected-access
+        n_landed = len(landed)
+        game.drop()
+        assert len(landed) == n_landed + 1
+        assert landed[-1] == sorted(ghost)
+
+
+@pytest.mark.parametrize("backend", ("dict", "bitboard"))
+def test_snapshot_round_trip(backend, monkeypatch):
+    monkeypatch.setattr(config, "CADTRIS_FIELD_BACKEND", backend)
+    game = TetrisGame(ChangesDisplay(), seed=3, clock=VirtualClock())
+    game.set_width(10)
+    game.set_height(15)
+    game.start()
+    _random_actions(game, random.Random(3), 300)
+    game.pause()
+
+    snapshot = game.snapshot()
+    snapshot_size = game._SNAPSHOT.size  # pylint:disable=protected-access
+    field_bytes = game._field.to_bytes()  # pylint:disable=protected-access
+    assert len(snapshot) == snapshot_size + len(field_bytes)
+    display = ChangesDisplay()
+    restored = TetrisGame(display, clock=VirtualClock())
+    restored.restore(snapshot)
+    assert restored.snapshot() == snapshot
+    serialized = game._serialize()  # pylint:disable=protected-access
+    assert restored._serialize() == serialized  # pylint:disable=protected-access
+    assert display.field == serialized["field"]
+
+    # the random generator is restored as well so both games continue identically
+    for g in (game, restored):
+        g.start()
+        _random_actions(g, random.Random(4), 300)
+    assert restored._serialize() == game._serialize()  # pylint:disable=protected-access
+
+
+def test_restore_invalid_snapshot():
+    game = TetrisGame(ChangesDisplay(), seed=3, clock=VirtualClock())
+    snapshot = game.snapshot()
+    with pytest.raises(ValueError):
+        game.restore(snapshot[:10])
+    with pytest.raises(ValueError):
+        game.restore(b"\xff" + snapshot[1:])
+
+
+def test_restore_recorded_game():
+    game = TetrisGame(ChangesDisplay(), seed=3, clock=VirtualClock())
+    snapshot = game.snapshot()
+    recorded_game = TetrisGame(
+        ChangesDisplay(), seed=3, clock=VirtualClock(), recorder=ReplayRecorder()
+    )
+    with pytest.raises(ValueError):
+        recorded_game.restore(snapshot)
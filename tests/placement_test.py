@@ -0,0 +1,87 @@
+"""This module tests the enumeration of reachable placements located in placement.py by executing
+the actions of the placements in headless games.
+"""
+
+from unittest.mock import Mock
+import random
+import sys
+
+# adsk modules are not needed to test headless games
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin.commands.CADTris import placement
+from addin.commands.CADTris.clock import VirtualClock
+from addin.commands.CADTris.logic_model import TetrisGame
+from addin.commands.CADTris.ui import NullDisplay
+
+WIDTH = 6
+HEIGHT = 10
+
+
+def _new_game(seed: int, actions) -> TetrisGame:
+    game = TetrisGame(NullDisplay(), seed=seed, clock=VirtualClock())
+    game.set_width(WIDTH)
+    game.set_height(HEIGHT)
+    game.start()
+    for action in actions:
+        getattr(game, action)()
+    return game
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_placements_are_reached_by_their_actions(seed):
+    rnd = random.Random(seed)
+    played = []
+    game = _new_game(seed, played)
+    for _ in range(15):
+        if game.state != "running":
+            break
+        placements = placement.game_placements(game)
+        assert placements
+        # every placement is distinct
+        assert len({p.coords for p in placements}) == len(placements)
+
+        for p in rnd.sample(placements, min(3, len(placements))):
+            check_game = _new_game(seed, played)
+            score = check_game.score
+            for action in p.actions:
+                getattr(check_game, action)()
+            assert (
+                placement._strip_rows(  # pylint:disable=protected-access
+                    check_game._field.row_masks(),  # pylint:disable=protected-access
+                    HEIGHT,
+                )
+                == p.rows
+            )
+            assert check_game.score - score == p.score_delta
+            assert check_game.lines == p.cleared_lines + game.lines
+
+        # follow the placement which clears the most lines and is the lowest
+        best = max(
+            placements,
+            key=lambda p: (p.cleared_lines, -max(c[1] for c in p.coords)),
+        )
+        for action in best.actions:
+            getattr(game, action)()
+        played.extend(best.actions)
+
+
+@pytest.mark.parametrize("shape_id, n_placements", ((6, WIDTH - 1), (0, 2 * WIDTH - 3)))
+def test_placements_on_empty_board(shape_id, n_placements):
+    # the O figure (shape 6) fits into every pair of columns, the I figure (shape 0) into every
+    # column vertically and every 4 columns horizontally
+    placements = placement.enumerate_placements((), WIDTH, HEIGHT, shape_id, 0, 2, 6)
+    assert len(placements) == n_placements
+    assert len({p.coords for p in placements}) == n_placements
+    assert all(min(y for _, y in p.coords) == 0 for p in placements)
+    assert all(p.actions[-1] == "drop" for p in placements)
+    assert all(p.cleared_lines == 0 and p.score_delta == 0 for p in placements)
+
+
+def test_blocked_start_has_no_placements():
+    full_rows = ((1 << WIDTH) - 1,) * HEIGHT
+    assert placement.enumerate_placements(full_rows, WIDTH, HEIGHT, 0, 0, 2, 8) == ()
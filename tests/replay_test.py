@@ -0,0 +1,135 @@
+"""This module tests the recording and replaying of games located in replay.py."""
+
+from unittest.mock import Mock
+import random
+import struct
+import sys
+
+# adsk modules are not needed to test headless games
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin.commands.CADTris.clock import VirtualClock
+from addin.commands.CADTris.logic_model import TetrisGame
+from addin.commands.CADTris.replay import ReplayEngine, ReplayRecorder, parse_replay
+from addin.commands.CADTris.ui import NullDisplay
+
+WIDTH = 8
+HEIGHT = 12
+KEYS = ("field", "figure", "score", "lines", "level", "state", "width", "height")
+
+
+def _state(game: TetrisGame) -> dict:
+    serialized = game._serialize()  # pylint:disable=protected-access
+    return {k: serialized[k] for k in KEYS}
+
+
+def _random_plan(seed: int, n_steps: int, max_ticks: int) -> list:
+    """Creates random steps of an action (or None) followed by a number of gravity ticks."""
+    rnd = random.Random(seed)
+    actions = (None, "move_left", "move_right", "rotate_right", "drop")
+    return [(rnd.choice(actions), rnd.randint(1, max_ticks)) for _ in range(n_steps)]
+
+
+def _play(seed: int, plan: list, recorder=None, single_ticks: bool = False):
+    """Plays the plan and returns the game and its state after every gravity tick."""
+    game = TetrisGame(NullDisplay(), seed=seed, clock=VirtualClock(), recorder=recorder)
+    game.set_width(WIDTH)
+    game.set_height(HEIGHT)
+    game.start()
+    states = [_state(game)]
+    for action, n_ticks in plan:
+        if action is not None:
+            getattr(game, action)()
+        if game.state == "gameover":
+            game.reset()
+            game.start()
+        if single_ticks:
+            for _ in range(n_ticks):
+                game.tick()
+                states.append(_state(game))
+        else:
+            game.tick(n_ticks)
+    return game, states
+
+
+@pytest.mark.parametrize("max_ticks", (1, 4))
+def test_play_rebuilds_the_game(max_ticks):
+    plan = _random_plan(1, 500, max_ticks)
+    recorder = ReplayRecorder()
+    game, _ = _play(1, plan, recorder)
+
+    seed, _, _, records = parse_replay(recorder.to_bytes())
+    assert len(records) >= len(plan)
+
+    engine = ReplayEngine(recorder.to_bytes(), snapshot_interval=50)
+    assert engine.seed == seed
+    assert engine.n_ticks == sum(n_ticks for _, n_ticks in plan)
+    assert _state(engine.play()) == _state(game)
+
+
+@pytest.mark.parametrize("max_ticks", (1, 4))
+def test_seek(max_ticks):
+    plan = _random_plan(2, 300, max_ticks)
+    recorder = ReplayRecorder()
+    _play(2, plan, recorder)
+    # the reference executes every tick separately, a record of the replay can hold multiple ticks
+    _, states = _play(2, plan, single_ticks=True)
+
+    engine = ReplayEngine(recorder.to_bytes(), snapshot_interval=20)
+    engine.play()  # creates the snapshots
+    for tick in random.Random(3).sample(range(1, len(states)), 40):
+        assert _state(engine.seek(tick)) == states[tick]
+
+
+def test_seek_to_the_first_tick():
+    plan = [("move_left", 3)] + _random_plan(5, 50, 2)
+    recorder = ReplayRecorder()
+    _play(5, plan, recorder)
+    # the records before the first tick are replayed
+    reference = TetrisGame(NullDisplay(), seed=5, clock=VirtualClock())
+    reference.set_width(WIDTH)
+    reference.set_height(HEIGHT)
+    reference.start()
+    reference.move_left()
+
+    engine = ReplayEngine(recorder.to_bytes())
+    assert _state(engine.seek(0)) == _state(reference)
+    assert _state(engine.seek(0)) != _state(engine.seek(1))
+
+
+def test_invalid_replay():
+    recorder = ReplayRecorder()
+    _play(1, _random_plan(1, 10, 1), recorder)
+    data = recorder.to_bytes()
+
+    with pytest.raises(ValueError):
+        parse_replay(data[:-1])
+    with pytest.raises(ValueError):
+        parse_replay(b"XXXX" + data[4:])
+
+
+def test_large_arguments():
+    recorder = ReplayRecorder()
+    game = TetrisGame(NullDisplay(), seed=4, clock=VirtualClock(), recorder=recorder)
+    game.start()
+    game.tick(40000)
+    recorder.record(0.0, "_move_horizontal", (-70000,))
+
+    _, _, _, records = parse_replay(recorder.to_bytes())
+    assert [r.argument for r in records[1:]] == [40000, -70000]
+    assert ReplayEngine(recorder.to_bytes()).n_ticks == 40000
+
+
+def test_version_1_replay():
+    header = struct.pack("<4sBQHH", b"CTRP", 1, 5, WIDTH, HEIGHT)
+    records = struct.pack("<IBh", 0, 0, 0) + struct.pack("<IBh", 1000, 4, -3)
+    assert parse_replay(header + records) == (
+        5,
+        WIDTH,
+        HEIGHT,
+        [(0, 0, 0), (1000, 4, -3)],
+    )
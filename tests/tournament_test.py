@@ -0,0 +1,62 @@
+"""This module tests the tournament runner located in tournament.py with a simple policy."""
+
+from unittest.mock import Mock
+import sys
+
+# adsk modules are not needed to test headless games, the worker processes inherit the mocks
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin import config
+from addin.commands.CADTris import tournament
+
+
+def _policy(serialized_game):
+    # spreads the figures over the board, the decision only depends on the passed game
+    n_cells = len(serialized_game["field"])
+    shift = n_cells * 7 % serialized_game["width"] - serialized_game["width"] // 2
+    actions = ["rotate_right"] * (n_cells % 4)
+    actions += ["move_right" if shift > 0 else "move_left"] * abs(shift)
+    return actions + ["drop"]
+
+
+def test_results_are_independent_of_the_workers():
+    seeds = list(range(6))
+    single = tournament.run_tournament(
+        _policy, seeds, 6, 20, max_pieces=40, max_workers=1
+    )
+    multiple = tournament.run_tournament(
+        _policy, seeds, 6, 20, max_pieces=40, max_workers=2
+    )
+
+    assert single == multiple
+    assert [r["seed"] for r in single["results"]] == seeds
+    assert single["results"] == [
+        tournament.play_game(_policy, seed, 6, 20, max_pieces=40) for seed in seeds
+    ]
+    assert single["games"] == len(seeds)
+    assert single["pieces"]["max"] <= 40
+
+
+@pytest.mark.parametrize(
+    "width, height",
+    (
+        (config.CADTRIS_MIN_WIDTH - 1, None),
+        (config.CADTRIS_MAX_WIDTH + 1, None),
+        (None, config.CADTRIS_MIN_HEIGHT - 1),
+        (None, config.CADTRIS_MAX_HEIGHT + 1),
+    ),
+)
+def test_invalid_size(width, height):
+    with pytest.raises(ValueError):
+        tournament.run_tournament(_policy, [1], width, height, max_workers=1)
+    with pytest.raises(ValueError):
+        tournament.play_game(_policy, 1, width, height)
+
+
+def test_no_seeds():
+    with pytest.raises(ValueError):
+        tournament.run_tournament(_policy, [], max_workers=1)
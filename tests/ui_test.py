@@ -0,0 +1,212 @@
+"""This module tests the incremental rendering of the displays located in ui.py. The terminal output
+of the AsciisDisplay is replayed and the voxel world of the FusionDisplay is replaced by a stub.
+"""
+
+from unittest.mock import Mock
+import random
+import re
+import sys
+
+# adsk modules are not needed to test headless games
+sys.modules["adsk"] = Mock()
+sys.modules["adsk.fusion"] = Mock()
+sys.modules["adsk.core"] = Mock()
+
+import pytest
+
+from addin import config
+from addin.commands.CADTris import placement, ui
+from addin.commands.CADTris.clock import VirtualClock
+from addin.commands.CADTris.highscores import HighscoreStore
+from addin.commands.CADTris.logic_model import Figure, TetrisGame
+from addin.commands.CADTris.ui import AsciisDisplay, FusionDisplay
+
+_ANSI_TOKEN = re.compile(r"\x1b\[2J|\x1b\[H|\x1b\[(\d+);1H|\x1b\[K|\n|[^\x1b\n]+")
+
+
+class Terminal:
+    """Minimal terminal which supports the escape sequences used by the AsciisDisplay."""
+
+    def __init__(self):
+        self.lines = {}
+        self.row = 0
+        self.column = 0
+
+    def write(self, output: str):
+        for match in _ANSI_TOKEN.finditer(output):
+            token = match.group(0)
+            if token == "\x1b[2J":
+                self.lines = {}
+            elif token == "\x1b[H":
+                self.row, self.column = 0, 0
+            elif match.group(1) is not None:
+                self.row, self.column = int(match.group(1)) - 1, 0
+            elif token == "\x1b[K":
+                self.lines[self.row] = self.lines.get(self.row, "")[: self.column]
+            elif token == "\n":
+                self.row, self.column = self.row + 1, 0
+            else:
+                line = self.lines.get(self.row, "").ljust(self.column)
+                end = self.column + len(token)
+                self.lines[self.row] = line[: self.column] + token + line[end:]
+                self.column = end
+
+    @property
+    def screen(self) -> list:
+        return [self.lines.get(i, "") for i in range(max(self.lines) + 1)]
+
+
+def _random_actions(game: TetrisGame, rnd: random.Random, n: int):
+    actions = (
+        game.move_left,
+        game.move_right,
+        game.rotate_left,
+        game.rotate_right,
+        game.drop,
+        game.tick,
+    )
+    for _ in range(n):
+        if game.state == "running":
+            rnd.choice(actions)()
+
+
+def _full_render(serialized_game: dict) -> list:
+    display = AsciisDisplay(headless=True)
+    display.update(serialized_game)
+    terminal = Terminal()
+    terminal.write(display.buffer.getvalue())
+    return terminal.screen
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_frames_equal_full_renders(seed):
+    display = AsciisDisplay(headless=True)
+    terminal = Terminal()
+    game = TetrisGame(display, seed=seed, clock=VirtualClock())
+    # the headless buffer only contains the output of the last frame
+    terminal.write(display.buffer.getvalue())
+    for setup in (lambda: game.set_width(8), lambda: game.set_height(12), game.start):
+        setup()
+        terminal.write(display.buffer.getvalue())
+
+    rnd = random.Random(seed)
+    for step in range(400):
+        if game.state == "gameover":
+            game.reset()
+            terminal.write(display.buffer.getvalue())
+            game.start()
+        elif step == 200:
+            game.set_width(7)
+        else:
+            _random_actions(game, rnd, 1)
+        terminal.write(display.buffer.getvalue())
+        assert terminal.screen == _full_render(
+            game._serialize()  # pylint:disable=protected-access
+        )
+        assert display.frame == "\n".join(terminal.screen)
+
+
+class VoxelWorldStub:
+    """Voxel world which only keeps the descriptions of its voxels."""
+
+    def __init__(self, grid_size, component, offset=(0, 0, 0)):
+        self.grid_size = grid_size
+        self.component = component
+        self.offset = offset
+        self.voxels = {}
+
+    def add_voxel(self, coord, **description):
+        assert coord not in self.voxels
+        self.voxels[coord] = description
+
+    def remove_voxel(self, coord):
+        del self.voxels[coord]
+
+    def clear(self):
+        self.voxels = {}
+
+
+@pytest.fixture(name="create_fusion_display")
+def fixture_create_fusion_display(monkeypatch, tmp_path):
+    monkeypatch.setattr(ui.vox, "VoxelWorld", VoxelWorldStub)
+    monkeypatch.setattr(ui.faf, "utils", Mock())
+    monkeypatch.setattr(config, "CADTRIS_POOL_BODIES", False)
+    monkeypatch.setattr(config, "CADTRIS_MERGE_BODIES", False)
+    monkeypatch.setattr(config, "CADTRIS_SHOW_GHOST", True)
+
+    def create_fusion_display():
+        return FusionDisplay(
+            Mock(),
+            Mock(),
+            lambda to_execute, coalesce=False: to_execute(),
+            HighscoreStore(tmp_path / "highscores.json"),
+        )
+
+    return create_fusion_display
+
+
+def test_flush_renders_the_deferred_frame(create_fusion_display, monkeypatch):
+    # every frame after the first one is deferred until the end of the test
+    monkeypatch.setattr(config, "CADTRIS_MAX_FPS", 0.01)
+    display = create_fusion_display()
+    game = TetrisGame(display, seed=1, clock=VirtualClock())
+    game.start()
+    rnd = random.Random(1)
+    for _ in range(60):
+        if game.state == "gameover":
+            game.reset()
+            game.start()
+        _random_actions(game, rnd, 3)
+        if game.state != "running":
+            continue
+        # placements which clear lines change large parts of the field
+        best = max(
+            placement.game_placements(game),
+            key=lambda p: (p.cleared_lines, -max(y for _, y in p.coords)),
+        )
+        for action in best.actions:
+            getattr(game, action)()
+
+    assert display._frame_timer is not None  # pylint:disable=protected-access
+    display.flush()
+    assert display._frame_timer is None  # pylint:disable=protected-access
+
+    reference = create_fusion_display()
+    reference.update(game._serialize())  # pylint:disable=protected-access
+    world = display._voxel_world.voxels  # pylint:disable=protected-access
+    assert world == reference._voxel_world.voxels  # pylint:disable=protected-access
+    assert world == display._voxels  # pylint:disable=protected-access
+
+
+def test_large_diff_shows_a_progressbar(create_fusion_display, monkeypatch):
+    # pylint:disable=protected-access
+    monkeypatch.setattr(config, "CADTRIS_MAX_FPS", None)
+    display = create_fusion_display()
+    game = TetrisGame(display, seed=2, clock=VirtualClock())
+    game.set_width(10)
+    game.set_height(15)
+    game.start()
+    # the four lowest rows are completed by a vertical I figure in the first column, the rows
+    # above are lowered which changes most of the field
+    rnd = random.Random(2)
+    game._field.add([(x, y) for x in range(1, 10) for y in range(4)], 1)
+    for y in range(4, 10):
+        game._field.add([(x, y) for x in range(1, 10) if rnd.random() < 0.6], 2 + y % 5)
+    game._active_figure = Figure.restore(0, 0, -1, 10, 1)
+    game._update_display()
+
+    progress_dialog = ui.faf.utils.create_progress_dialog.return_value
+    progress_dialog.reset_mock()
+    game.drop()
+    assert game.lines == 4
+
+    _, _, _, n_voxels = progress_dialog.show.call_args[0]
+    assert n_voxels >= config.MIN_VOXELS_FOR_PROGRESSBAR
+    assert progress_dialog.progressValue == n_voxels
+    progress_dialog.hide.assert_called_once()
+
+    reference = create_fusion_display()
+    reference.update(game._serialize())
+    world = display._voxel_world.voxels
+    assert world == reference._voxel_world.voxels
+    assert world == display._voxels